@@ -0,0 +1,102 @@
+"""Freshness lag of fixed and adaptive polling intervals, for one budget.
+
+The polling of many alerts is simulated on a virtual clock: the mentions of
+each alert arrive as a Poisson process, with rates following a Zipf law so
+that a few alerts are busy and most are quiet. Every alert is polled with a
+fixed interval spending the whole budget, then with
+:class:`mention.scheduler.AdaptiveInterval` and the same budget.
+
+The benchmark reports the polls spent and the mean and p99 lag of the
+mentions, the time between their arrival and the poll fetching them.
+
+:Example:
+
+    $ python bench_adaptive.py --alerts 1000 --budget 2 --hours 24
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.scheduler import AdaptiveInterval, FixedInterval, Target
+
+from bench_client import percentile
+
+
+def simulate(policy, rates, duration, limit, seed):
+    rng = random.Random(seed)
+    targets = [Target("t", "account", str(index))
+               for index in range(len(rates))]
+    arrivals = [[] for _ in rates]
+    for index, rate in enumerate(rates):
+        moment = rng.expovariate(rate) if rate else duration
+        while moment < duration:
+            arrivals[index].append(moment)
+            moment += rng.expovariate(rate)
+    # Polls start spread over the first interval.
+    due = [(rng.uniform(0, policy.update(target, None, None, False)), index)
+           for index, target in enumerate(targets)]
+    heapq.heapify(due)
+    fetched = [0] * len(rates)
+    polled_at = [None] * len(rates)
+    lags = []
+    polls = 0
+    while due:
+        now, index = heapq.heappop(due)
+        if now >= duration:
+            continue
+        polls += 1
+        pending = arrivals[index]
+        new = fetched[index]
+        while new < len(pending) and pending[new] <= now and \
+                new - fetched[index] < limit:
+            lags.append(now - pending[new])
+            new += 1
+        count = new - fetched[index]
+        fetched[index] = new
+        seconds = None if polled_at[index] is None else now - polled_at[index]
+        polled_at[index] = now
+        interval = policy.update(targets[index], count, seconds,
+                                 count >= limit)
+        heapq.heappush(due, (now + interval, index))
+    lags.sort()
+    return polls, sum(lags) / len(lags), percentile(lags, 99)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=1000)
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="polls per second")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--mentions", type=float, default=20000.0,
+                        help="mentions per hour, over all the alerts")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    weights = [1.0 / (rank + 1) ** 1.1 for rank in range(args.alerts)]
+    scale = args.mentions / 3600.0 / sum(weights)
+    rates = [weight * scale for weight in weights]
+    duration = args.hours * 3600.0
+    policies = [
+        ("fixed", FixedInterval(args.alerts / args.budget)),
+        ("adaptive", AdaptiveInterval(args.budget, min_interval=10.0,
+                                      max_interval=3600.0,
+                                      initial_interval=args.alerts /
+                                      args.budget)),
+    ]
+    for name, policy in policies:
+        polls, mean, p99 = simulate(policy, rates, duration, args.limit,
+                                    args.seed)
+        print("{0:<9} {1:8d} polls ({2:.2f}/s)  lag mean {3:7.1f}s  "
+              "p99 {4:7.1f}s".format(name, polls, polls / duration, mean,
+                                     p99))
+
+
+if __name__ == "__main__":
+    main()
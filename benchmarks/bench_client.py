@@ -0,0 +1,214 @@
+"""Throughput and latency benchmarks of the endpoint classes.
+
+Every endpoint class is run against the in-process fake Mention API of
+:mod:`mention.fakeserver` at
+several page sizes and concurrency levels. For each combination the
+benchmark records requests per second, p50 and p99 latency, client CPU time
+per request and the peak memory allocated while fetching one page.
+
+:Example:
+
+    $ python bench_client.py --output before.json
+    $ python bench_client.py --output after.json
+    $ python bench_client.py --compare before.json after.json
+"""
+import argparse
+import functools
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.fakeserver import FakeMentionServer
+
+QUERYD = {"type": "basic", "included_keywords": ["NASA"]}
+
+ENDPOINTS = [
+    ("AppDataAPI", lambda ids, size: mention.AppDataAPI("a")),
+    ("FetchAnAlertAPI",
+     lambda ids, size: mention.FetchAnAlertAPI("a", ids.account, ids.alert)),
+    ("FetchAlertsAPI",
+     lambda ids, size: mention.FetchAlertsAPI("a", ids.account)),
+    ("CreateAnAlertAPI",
+     lambda ids, size: mention.CreateAnAlertAPI("a", ids.account, "n",
+                                                QUERYD, ["en"])),
+    ("UpdateAnAlertAPI",
+     lambda ids, size: mention.UpdateAnAlertAPI("a", ids.account, ids.alert,
+                                                "n", QUERYD, ["en"])),
+    ("FetchAMentionAPI",
+     lambda ids, size: mention.FetchAMentionAPI("a", ids.account, ids.alert,
+                                                ids.mention)),
+    ("FetchAllMentionsAPI",
+     lambda ids, size: mention.FetchAllMentionsAPI("a", ids.account,
+                                                   ids.alert,
+                                                   limit=str(size))),
+    ("FetchMentionChildrenAPI",
+     lambda ids, size: mention.FetchMentionChildrenAPI("a", ids.account,
+                                                       ids.alert,
+                                                       ids.mention,
+                                                       limit=str(size))),
+    ("CurateAMentionAPI",
+     lambda ids, size: mention.CurateAMentionAPI("a", ids.account, ids.alert,
+                                                 ids.mention, favorite=True)),
+    ("MarkAllMentionsAsReadAPI",
+     lambda ids, size: mention.MarkAllMentionsAsReadAPI("a", ids.account,
+                                                        ids.alert)),
+]
+
+#: Endpoints whose response size depends on the requested page size.
+PAGED = {"FetchAllMentionsAPI", "FetchMentionChildrenAPI"}
+
+
+def percentile(values, percent):
+    """Returns the nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(ordered))) - 1
+    return ordered[max(0, min(rank, len(ordered) - 1))]
+
+
+class _Ids(object):
+    """Ids of an account, alert and mention of the fake server's data."""
+
+    def __init__(self, data):
+        self.account = data.account_ids[0]
+        self.alert = data.alert_ids(self.account)[0]
+        self.mention = str(data.alerts[self.alert].ids[-1])
+
+
+def _worker(factory, size, count, latencies):
+    start_cpu = time.thread_time()
+    for _ in range(count):
+        started = time.perf_counter()
+        factory(size).query()
+        latencies.append(time.perf_counter() - started)
+    return time.thread_time() - start_cpu
+
+
+def measure_throughput(factory, size, requests, concurrency):
+    """Runs `requests` queries spread over `concurrency` threads."""
+    latencies = []
+    per_worker = max(1, requests // concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = [executor.submit(_worker, factory, size, per_worker,
+                                   latencies)
+                   for _ in range(concurrency)]
+        cpu = sum(future.result() for future in futures)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "cpu_ms_per_request": cpu / len(latencies) * 1000,
+    }
+
+
+def measure_memory(factory, size):
+    """Returns the peak memory in KiB allocated while fetching one page."""
+    client = factory(size)
+    tracemalloc.start()
+    try:
+        client.query()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return peak / 1024.0
+
+
+def run(page_sizes, concurrency_levels, requests, only=None, seed=0):
+    results = []
+    with FakeMentionServer(seed=seed) as server, server.redirect():
+        ids = _Ids(server.data)
+        for name, endpoint in ENDPOINTS:
+            if only and name not in only:
+                continue
+            factory = functools.partial(endpoint, ids)
+            sizes = page_sizes if name in PAGED else [None]
+            for size in sizes:
+                factory(size).query()  # warm up
+                memory = measure_memory(factory, size)
+                for concurrency in concurrency_levels:
+                    result = {"endpoint": name,
+                              "page_size": size,
+                              "concurrency": concurrency,
+                              "peak_memory_kib": memory}
+                    result.update(measure_throughput(factory, size, requests,
+                                                     concurrency))
+                    results.append(result)
+                    print("{endpoint:<26} size={page_size!s:<5} "
+                          "conc={concurrency:<3} {requests_per_sec:8.1f} "
+                          "req/s p50={p50_ms:7.2f}ms p99={p99_ms:7.2f}ms "
+                          "cpu={cpu_ms_per_request:6.2f}ms "
+                          "mem={peak_memory_kib:8.1f}KiB".format(**result))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def _key(result):
+    return result["endpoint"], result["page_size"], result["concurrency"]
+
+
+def compare(before, after):
+    """Prints the relative change of every result present in both runs."""
+    baseline = dict((_key(result), result) for result in before["results"])
+    for result in after["results"]:
+        old = baseline.get(_key(result))
+        if old is None:
+            continue
+        print("{0:<26} size={1!s:<5} conc={2:<3} req/s {3:+7.1%} "
+              "p99 {4:+7.1%} cpu {5:+7.1%} mem {6:+7.1%}".format(
+                  result["endpoint"], result["page_size"],
+                  result["concurrency"],
+                  result["requests_per_sec"] / old["requests_per_sec"] - 1,
+                  result["p99_ms"] / old["p99_ms"] - 1,
+                  result["cpu_ms_per_request"] /
+                  old["cpu_ms_per_request"] - 1,
+                  result["peak_memory_kib"] / old["peak_memory_kib"] - 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--page-sizes", type=int, nargs="+",
+                        default=[20, 100, 1000])
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200,
+                        help="number of requests per combination")
+    parser.add_argument("--endpoint", action="append",
+                        help="only run the given endpoint class")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the fake server's data")
+    parser.add_argument("--output", help="write the results to a JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two JSON result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as before, open(args.compare[1]) as after:
+            compare(json.load(before), json.load(after))
+        return
+
+    report = run(args.page_sizes, args.concurrency, args.requests,
+                 args.endpoint, args.seed)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
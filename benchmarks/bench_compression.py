@@ -0,0 +1,75 @@
+"""Bandwidth and latency of FetchAllMentionsAPI pages per content coding.
+
+Pages of several sizes are fetched from the in-process fake Mention API
+with each content coding, and the byte counts of
+:data:`mention.compression.stats` are reported next to the time and client
+CPU spent per page. This shows the bandwidth saved by each coding and which
+`limit` gives the best balance between bandwidth and latency.
+
+:Example:
+
+    $ python bench_compression.py --limits 100 1000 --pages 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import compression, transport
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+
+def measure(server, coding, limit, pages):
+    account_id = server.data.account_ids[0]
+    alert_id = server.data.alert_ids(account_id)[0]
+    compression.stats.reset()
+    with transport.RequestsTransport(compression=coding) as transport_:
+        wall = cpu = 0.0
+        mentions = 0
+        for _ in range(pages):
+            client = mention.FetchAllMentionsAPI("a", account_id, alert_id,
+                                                 limit=str(limit))
+            client.transport = transport_
+            started, started_cpu = time.perf_counter(), time.thread_time()
+            mentions += len(client.query()["mentions"])
+            cpu += time.thread_time() - started_cpu
+            wall += time.perf_counter() - started
+    counters = compression.stats.snapshot()[("FetchAllMentionsAPI",
+                                             str(limit))]
+    return {
+        "coding": coding,
+        "limit": limit,
+        "wire_kib": counters["wire_bytes"] / 1024.0 / pages,
+        "ratio": counters["ratio"],
+        "ms": wall / pages * 1000,
+        "cpu_ms": cpu / pages * 1000,
+        "us_per_mention": wall / mentions * 1e6,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limits", type=int, nargs="+",
+                        default=[20, 100, 500, 1000])
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, mentions_per_alert=1000)
+    with FakeMentionServer(data, seed=args.seed) as server, \
+            server.redirect():
+        for limit in args.limits:
+            for coding in ("identity",) + compression.codecs():
+                result = measure(server, coding, limit, args.pages)
+                print("{coding:<9} limit={limit:<5} {wire_kib:9.1f} KiB/page "
+                      "ratio {ratio:5.2f}  {ms:7.2f} ms/page  client cpu "
+                      "{cpu_ms:6.2f} ms/page  {us_per_mention:6.1f} "
+                      "us/mention".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Near-duplicate detection: comparing every pair of mentions against
+:class:`mention.duplicates.NearDuplicates`.
+
+Synthetic mentions, some of which copy an earlier mention with a word
+changed, are added one at a time. The exact method compares the shingles of
+each new mention with those of every mention before it; the detector only
+compares its signature with the candidates sharing one of its bands.
+
+The benchmark reports the mentions added per second by each method and the
+duplicates the detector finds and misses, taking the exact method as the
+reference.
+
+:Example:
+
+    $ python bench_duplicates.py --mentions 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.duplicates import NearDuplicates, shingles
+from mention.fakeserver import SyntheticData
+
+
+def exact(mentions, threshold):
+    seen = []
+    duplicates = set()
+    for mention in mentions:
+        current = shingles(mention)
+        for other in seen:
+            if len(current & other) >= threshold * len(current | other):
+                duplicates.add(mention["id"])
+                break
+        seen.append(current)
+    return duplicates
+
+
+def detector(mentions, threshold):
+    near_duplicates = NearDuplicates(threshold=threshold)
+    return set(mention["id"] for mention in mentions
+               if near_duplicates.add(mention) is not None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mentions", type=int, default=5000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, alerts_per_account=1,
+                         mentions_per_alert=0)
+    account_id = data.account_ids[0]
+    alert_id = data.alert_ids(account_id)[0]
+    mentions = [data.generate_mention(alert_id)
+                for _ in range(args.mentions)]
+
+    results = {}
+    for name, run in (("exact", exact), ("lsh", detector)):
+        started = time.perf_counter()
+        results[name] = run(mentions, args.threshold)
+        elapsed = time.perf_counter() - started
+        print("{0:<6} {1:10.0f} mentions/s  {2} duplicates".format(
+            name, len(mentions) / elapsed, len(results[name])))
+    print("lsh missed {0}, wrongly found {1}".format(
+        len(results["exact"] - results["lsh"]),
+        len(results["lsh"] - results["exact"])))
+
+
+if __name__ == "__main__":
+    main()
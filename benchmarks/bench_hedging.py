@@ -0,0 +1,92 @@
+"""Tail latency of FetchAMentionAPI with and without hedged requests.
+
+Mentions are fetched from threads against the in-process fake Mention API,
+where a small fraction of the responses is much slower than the others.
+The benchmark reports p50, p99 and p99.9 latency with the default transport
+and with :class:`mention.hedging.HedgingTransport`, along with the number
+of hedges sent, which is capped by a token bucket.
+
+:Example:
+
+    $ python bench_hedging.py --requests 2000 --slow-rate 0.02
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import hedging, ratelimit, transport
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+from bench_client import percentile
+
+
+def measure(server, name, requests, concurrency, hedge_rate):
+    account_id = server.data.account_ids[0]
+    alert_id = server.data.alert_ids(account_id)[0]
+    mention_ids = [mention_["id"] for mention_ in mention.FetchAllMentionsAPI(
+        "a", account_id, alert_id, limit="100").query()["mentions"]]
+    transport_ = transport.RequestsTransport()
+    if name == "hedged":
+        transport_ = hedging.HedgingTransport(
+            transport_, budget=ratelimit.TokenBucket(hedge_rate, hedge_rate))
+
+    def timed(index):
+        client = mention.FetchAMentionAPI(
+            "a", account_id, alert_id, mention_ids[index % len(mention_ids)])
+        client.transport = transport_
+        started = time.perf_counter()
+        client.query()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    hedged = 0
+    if name == "hedged":
+        hedged = sum(counters["hedged"]
+                     for counters in transport_.snapshot().values())
+    transport_.close()
+    return {
+        "client": name,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "p999_ms": percentile(latencies, 99.9) * 1000,
+        "hedged": hedged,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--slow-rate", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=0.1)
+    parser.add_argument("--hedge-rate", type=float, default=50.0,
+                        help="hedges per second allowed by the budget")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, mentions_per_alert=200)
+    with FakeMentionServer(data, seed=args.seed, latency=args.latency,
+                           slow_rate=args.slow_rate,
+                           slow_latency=args.slow_latency) as server, \
+            server.redirect():
+        for name in ("plain", "hedged"):
+            result = measure(server, name, args.requests, args.concurrency,
+                             args.hedge_rate)
+            print("{client:<7} {rps:8.1f} req/s p50={p50_ms:7.2f}ms "
+                  "p99={p99_ms:7.2f}ms p99.9={p999_ms:7.2f}ms "
+                  "hedges={hedged}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""HTTP/1.1 connection pooling compared with HTTP/2 multiplexing.
+
+FetchAllMentionsAPI pages are fetched at high concurrency from the
+in-process fake Mention API, with added latency standing in for the network
+round trip. Three clients are measured:
+
+* ``http1``: the default :class:`mention.transport.RequestsTransport`, one
+  pooled HTTP/1.1 connection per request in flight, from threads.
+* ``http2``: :class:`mention.transport.HTTP2Transport` from threads.
+* ``http2-async``: the same transport from coroutines with
+  :meth:`mention.base.Mention.aquery`.
+
+For each client the benchmark reports requests per second, p50 and p99
+latency and the number of connections the server accepted. It needs the
+optional `httpx` and `h2` packages.
+
+:Example:
+
+    $ python bench_http2.py --concurrency 16 64 --latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import transport
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+from bench_client import percentile
+
+
+def _clients(data, transport_, count, size):
+    account_id = data.account_ids[0]
+    alert_ids = data.alert_ids(account_id)
+    clients = []
+    for i in range(count):
+        client = mention.FetchAllMentionsAPI(
+            "a", account_id, alert_ids[i % len(alert_ids)], limit=str(size))
+        client.transport = transport_
+        clients.append(client)
+    return clients
+
+
+def _timed(client):
+    started = time.perf_counter()
+    client.query()
+    return time.perf_counter() - started
+
+
+def run_threads(clients, concurrency):
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(_timed, clients))
+
+
+def run_async(clients, concurrency):
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed(client):
+            async with semaphore:
+                started = time.perf_counter()
+                await client.aquery()
+                return time.perf_counter() - started
+
+        try:
+            return await asyncio.gather(*[timed(client)
+                                          for client in clients])
+        finally:
+            await clients[0].transport.aclose()
+
+    return asyncio.run(main())
+
+
+def measure(server, name, concurrency, requests, size):
+    if name == "http1":
+        transport_ = transport.RequestsTransport()
+    else:
+        transport_ = transport.HTTP2Transport(prior_knowledge=True)
+    clients = _clients(server.data, transport_, requests, size)
+    connections = server.connections
+    started = time.perf_counter()
+    if name == "http2-async":
+        latencies = run_async(clients, concurrency)
+    else:
+        latencies = run_threads(clients, concurrency)
+        transport_.close()
+    elapsed = time.perf_counter() - started
+    return {
+        "client": name,
+        "concurrency": concurrency,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "connections": server.connections - connections,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[16, 64])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, mentions_per_alert=500)
+    with FakeMentionServer(data, seed=args.seed,
+                           latency=args.latency) as server, \
+            server.redirect():
+        for concurrency in args.concurrency:
+            for name in ("http1", "http2", "http2-async"):
+                result = measure(server, name, concurrency, args.requests,
+                                 args.page_size)
+                print("{client:<12} conc={concurrency:<4} {rps:8.1f} req/s "
+                      "p50={p50_ms:7.2f}ms p99={p99_ms:7.2f}ms "
+                      "connections={connections}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
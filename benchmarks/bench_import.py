@@ -0,0 +1,78 @@
+"""Import time of the package, checked against a budget.
+
+Each statement is timed in fresh interpreters, and its median is compared
+with a budget relative to the median of ``import requests``, which the lazy
+imports avoid: an absolute time would depend on the machine and its load.
+The script exits with a non-zero status if a budget is exceeded or if
+`requests` gets imported, so it can run in CI.
+
+:Example:
+
+    $ python bench_import.py --runs 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, "mention")
+
+#: Statement whose import time is the unit of the budgets.
+REFERENCE = "import requests"
+
+#: Statements to time and their budgets, as fractions of the import time
+#: of the reference.
+BUDGETS = [
+    ("import mention", 0.05),
+    ("from mention import FetchAllMentionsAPI", 0.5),
+]
+
+_TIMER = """
+import sys, time
+started = time.perf_counter()
+{0}
+elapsed = time.perf_counter() - started
+print(elapsed * 1000, 'requests' in sys.modules)
+"""
+
+
+def measure(statement, runs):
+    """Returns the import times in ms and whether `requests` was loaded."""
+    times = []
+    loaded = False
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _TIMER.format(statement)], cwd=PACKAGE,
+            universal_newlines=True)
+        elapsed, requests_loaded = output.split()
+        times.append(float(elapsed))
+        loaded = loaded or requests_loaded == "True"
+    return sorted(times), loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    times, _ = measure(REFERENCE, args.runs)
+    reference = times[len(times) // 2]
+    print("{0:<45} median {1:6.2f}ms min {2:6.2f}ms".format(
+        REFERENCE, reference, times[0]))
+    failed = False
+    for statement, fraction in BUDGETS:
+        times, loaded = measure(statement, args.runs)
+        median = times[len(times) // 2]
+        budget = fraction * reference
+        over = median > budget
+        failed = failed or over or loaded
+        print("{0:<45} median {1:6.2f}ms min {2:6.2f}ms budget {3:5.1f}ms"
+              "{4}{5}".format(statement, median, times[0], budget,
+                              "  OVER BUDGET" if over else "",
+                              "  imports requests" if loaded else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Random access to stored mentions: JSON lines file against the journal.
+
+Synthetic mentions are written to a JSON lines file and to a
+:class:`mention.journal.JournalWriter`, then read back by id in random
+order. The JSON lines file needs a full scan to build an index of the
+offsets before the first read; the journal is searched in its memory maps.
+
+The benchmark reports the write throughput, the time to open each store and
+the random reads per second.
+
+:Example:
+
+    $ python bench_journal.py --mentions 200000 --reads 20000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.fakeserver import SyntheticData
+from mention.journal import JournalReader, JournalWriter
+
+
+def jsonl(path, mentions, ids):
+    started = time.perf_counter()
+    with open(path, "wb") as output:
+        for mention in mentions:
+            output.write(json.dumps(mention).encode("utf-8") + b"\n")
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    offsets = {}
+    with open(path, "rb") as source:
+        position = 0
+        for line in source:
+            offsets[json.loads(line)["id"]] = position
+            position += len(line)
+    opened = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with open(path, "rb") as source:
+        for mention_id in ids:
+            source.seek(offsets[mention_id])
+            json.loads(source.readline())
+    read = time.perf_counter() - started
+    return written, opened, read
+
+
+def journal(directory, mentions, ids):
+    started = time.perf_counter()
+    with JournalWriter(directory) as writer:
+        for mention in mentions:
+            writer.append(mention)
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reader = JournalReader(directory)
+    opened = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for mention_id in ids:
+        json.loads(bytes(reader.get(reader.lookup(mention_id))))
+    read = time.perf_counter() - started
+    reader.close()
+    return written, opened, read
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mentions", type=int, default=200000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, alerts_per_account=1,
+                         mentions_per_alert=args.mentions)
+    account_id = data.account_ids[0]
+    alert_id = data.alert_ids(account_id)[0]
+    store = data.alert(account_id, alert_id)
+    mentions = [store.mentions[mention_id] for mention_id in store.ids]
+    rng = random.Random(args.seed)
+    ids = [rng.choice(mentions)["id"] for _ in range(args.reads)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        for name, run in (("jsonl", jsonl), ("journal", journal)):
+            path = os.path.join(directory, name)
+            written, opened, read = run(path, mentions, ids)
+            print("{0:<8} write {1:9.0f}/s  open {2:7.3f}s  "
+                  "read {3:9.0f}/s".format(name, len(mentions) / written,
+                                           opened, len(ids) / read))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
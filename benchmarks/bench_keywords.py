@@ -0,0 +1,88 @@
+"""Local keyword matching: one regular expression per keyword against a
+:class:`mention.keywords.KeywordFilter`.
+
+The basic queries of many synthetic alerts are run on synthetic mentions,
+first by searching every keyword of every alert with its own regular
+expression, then with a single automaton for all the alerts.
+
+The benchmark reports the mentions matched per minute by each method and
+checks that both find the same alerts.
+
+:Example:
+
+    $ python bench_keywords.py --alerts 500 --mentions 20000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.fakeserver import SyntheticData
+from mention.keywords import KeywordFilter
+
+
+def _pattern(keyword):
+    return re.compile(r"\b{0}\b".format(re.escape(keyword)), re.IGNORECASE)
+
+
+def regexes(queries, mentions):
+    compiled = dict((alert_id, [[_pattern(keyword) for keyword in
+                                 query.get(name) or ()]
+                                for name in ("included_keywords",
+                                             "required_keywords",
+                                             "excluded_keywords")])
+                    for alert_id, query in queries.items())
+    results = []
+    for mention in mentions:
+        texts = (mention["title"], mention["description"])
+        matches = set()
+        for alert_id, (included, required, excluded) in compiled.items():
+            def found(pattern):
+                return any(pattern.search(text) for text in texts)
+            if (not included or any(map(found, included))) and \
+                    all(map(found, required)) and \
+                    not any(map(found, excluded)):
+                matches.add(alert_id)
+        results.append(matches)
+    return results
+
+
+def automaton(queries, mentions):
+    keyword_filter = KeywordFilter(queries)
+    return [set(keyword_filter.match(mention)) for mention in mentions]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=500)
+    parser.add_argument("--mentions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, alerts_per_account=args.alerts,
+                         mentions_per_alert=0)
+    account_id = data.account_ids[0]
+    queries = dict((alert_id, data.alert(account_id, alert_id)
+                    .alert["query"])
+                   for alert_id in data.alert_ids(account_id))
+    alert_id = data.alert_ids(account_id)[0]
+    mentions = [data.generate_mention(alert_id)
+                for _ in range(args.mentions)]
+
+    results = []
+    for name, run in (("regex", regexes), ("automaton", automaton)):
+        started = time.perf_counter()
+        results.append(run(queries, mentions))
+        elapsed = time.perf_counter() - started
+        print("{0:<10} {1:12.0f} mentions/min  {2} matches".format(
+            name, len(mentions) * 60 / elapsed,
+            sum(len(matches) for matches in results[-1])))
+    assert results[0] == results[1]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Backfill throughput of the process-pool decode pipeline.
+
+Every page of several alerts is fetched from the fake Mention API with
+`limit=1000` and written to a file as JSON lines, first with the decoding
+and transformation done by the fetching threads, then with
+:class:`mention.pipeline.DecodePipeline` and an increasing number of worker
+processes. The fake server runs in a separate process, so that it does not
+compete with the client for the GIL.
+
+The benchmark reports mentions per second and the speedup over the
+threaded backfill; it scales with the number of processes up to the number
+of cores.
+
+:Example:
+
+    $ python bench_pipeline.py --alerts 8 --processes 1 2 4 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import operations
+from mention.fakeserver import FakeMentionServer, Redirect, SyntheticData
+from mention.pipeline import DecodePipeline, Fields
+
+FIELDS = ("id", "title", "description", "published_at", "source_url",
+          "language_code", "tone")
+
+
+def serve(args, ready):
+    data = SyntheticData(seed=args.seed, alerts_per_account=args.alerts,
+                         mentions_per_alert=args.mentions)
+    with FakeMentionServer(data, seed=args.seed) as server:
+        ready.send((server.base_url, data.account_ids[0],
+                    data.alert_ids(data.account_ids[0])))
+        ready.recv()
+
+
+def threaded(clients, sink, transform, workers):
+    """Fetches, decodes and transforms in threads."""
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def backfill(client):
+        mentions = operations.fetch_all_mentions(client).items
+        return "".join(dumps(transform(m)) + "\n"
+                       for m in mentions).encode("utf-8"), len(mentions)
+
+    total = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for data, count in pool.map(backfill, clients):
+            sink.write(data)
+            total += count
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=8)
+    parser.add_argument("--mentions", type=int, default=5000)
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=[1, 2, 4])
+    parser.add_argument("--io-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(args, child))
+    server.start()
+    base_url, account_id, alert_ids = parent.recv()
+    clients = [mention.FetchAllMentionsAPI("a", account_id, alert_id,
+                                           limit="1000")
+               for alert_id in alert_ids]
+    transform = Fields(FIELDS)
+    print("{0} cores".format(os.cpu_count()))
+    redirect = Redirect(base_url).start()
+    try:
+        with tempfile.TemporaryFile() as sink:
+            started = time.perf_counter()
+            count = threaded(clients, sink, transform, args.io_workers)
+            baseline = count / (time.perf_counter() - started)
+            print("threads      {0:10.0f} mentions/s".format(baseline))
+            for processes in args.processes:
+                sink.seek(0)
+                with DecodePipeline(transform, processes=processes,
+                                    io_workers=args.io_workers) as pipeline:
+                    stats = pipeline.backfill(clients, sink)
+                rate = stats["mentions"] / stats["seconds"]
+                print("processes={0:<2} {1:10.0f} mentions/s  x{2:.2f}".format(
+                    processes, rate, rate / baseline))
+    finally:
+        redirect.stop()
+        parent.send(None)
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
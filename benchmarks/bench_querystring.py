@@ -0,0 +1,75 @@
+"""Advanced queries on stored mentions: scanning every mention against an
+:class:`mention.querystring.InvertedIndex`.
+
+Synthetic mentions are indexed, then a few advanced queries are run on all
+of them, first by matching every mention with the compiled predicate, in
+the written order of the operands and in the order of their selectivity,
+then by searching the index.
+
+The benchmark reports the time to build the index and the mentions
+evaluated per second by each method, and checks that they agree.
+
+:Example:
+
+    $ python bench_querystring.py --mentions 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.fakeserver import SyntheticData
+from mention.querystring import AdvancedQuery, InvertedIndex
+
+QUERIES = (
+    "(nasa AND discovery) OR (arianespace AND ariane)",
+    "the AND nike AND NOT store AND limited",
+    '"latest update" OR ("first launch" AND NOT crew)',
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mentions", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed, alerts_per_account=1,
+                         mentions_per_alert=0)
+    account_id = data.account_ids[0]
+    alert_id = data.alert_ids(account_id)[0]
+    mentions = [data.generate_mention(alert_id)
+                for _ in range(args.mentions)]
+
+    started = time.perf_counter()
+    index = InvertedIndex(documents=mentions.__getitem__)
+    for mention in mentions:
+        index.add(mention)
+    print("index built in {0:.2f}s".format(time.perf_counter() - started))
+
+    for query_string in QUERIES:
+        print(query_string)
+        results = []
+        for name, query in (
+                ("scan", AdvancedQuery(query_string)),
+                ("scan-ordered", AdvancedQuery(query_string,
+                                               frequency=index.frequency))):
+            started = time.perf_counter()
+            results.append([doc for doc, mention in enumerate(mentions)
+                            if query.match(mention)])
+            elapsed = time.perf_counter() - started
+            print("  {0:<13} {1:12.0f} mentions/s".format(
+                name, len(mentions) / elapsed))
+        started = time.perf_counter()
+        results.append(index.search(query_string))
+        elapsed = time.perf_counter() - started
+        print("  {0:<13} {1:12.0f} mentions/s  {2} matches".format(
+            "index", len(mentions) / elapsed, len(results[-1])))
+        assert results[0] == results[1] == results[2]
+
+
+if __name__ == "__main__":
+    main()
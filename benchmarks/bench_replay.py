@@ -0,0 +1,92 @@
+"""Decode and processing cost of FetchAllMentionsAPI without the network.
+
+Pages of the in-process fake Mention API are recorded to a cassette once
+and then replayed as fast as possible, so the timings only contain the
+client's own work.
+
+:Example:
+
+    $ python bench_replay.py --limit 1000 --pages 50
+    $ python bench_replay.py --profile
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import transport
+from mention.fakeserver import FakeMentionServer
+
+
+def record(path, limit, pages):
+    """Records `pages` consecutive pages of one alert of the fake API."""
+    with FakeMentionServer() as server, server.redirect():
+        account_id = server.data.account_ids[0]
+        alert_id = server.data.alert_ids(account_id)[0]
+        requests = []
+        with transport.RecordingTransport(path) as recorder:
+            cursor = None
+            for _ in range(pages):
+                client = mention.FetchAllMentionsAPI(
+                    "a", account_id, alert_id, limit=str(limit),
+                    cursor=cursor)
+                client.transport = recorder
+                data = client.query()
+                requests.append(client)
+                more = data["_links"].get("more")
+                if more is None:
+                    break
+                cursor = more["params"]["cursor"]
+    return requests
+
+
+def replay(clients, rounds):
+    mentions = 0
+    for _ in range(rounds):
+        for client in clients:
+            mentions += len(client.query()["mentions"])
+    return mentions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--profile", action="store_true",
+                        help="print the top functions by cumulative time")
+    args = parser.parse_args(argv)
+
+    path = os.path.join(tempfile.mkdtemp(), "replay.cassette")
+    clients = record(path, args.limit, args.pages)
+    replayer = transport.ReplayTransport(path)
+    for client in clients:
+        client.transport = replayer
+
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    mentions = replay(clients, args.rounds)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    print("{0} pages, {1} mentions in {2:.3f}s: {3:.1f} pages/s, "
+          "{4:.1f} us/mention".format(len(clients) * args.rounds, mentions,
+                                      elapsed,
+                                      len(clients) * args.rounds / elapsed,
+                                      elapsed / mentions * 1e6))
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
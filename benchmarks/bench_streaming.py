@@ -0,0 +1,80 @@
+"""Peak memory and time to first mention of query() and query_stream().
+
+Both modes fetch the same page of the fake Mention API and hand each
+mention to a consumer that keeps nothing, as a pipeline would. The server
+runs in a subprocess so that its allocations are not measured.
+
+:Example:
+
+    $ python bench_streaming.py --limit 1000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.fakeserver import Redirect, SyntheticData
+
+
+def buffered(client):
+    for item in client.query()["mentions"]:
+        yield item
+
+
+def streamed(client):
+    return client.query_stream()
+
+
+def measure(mode, client):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for _ in mode(client):
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, first, total, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(mentions_per_alert=args.limit * 2)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "mention.fakeserver", "--port", "0",
+         "--mentions-per-alert", str(args.limit * 2)],
+        stdout=subprocess.PIPE, universal_newlines=True,
+        cwd=os.path.dirname(os.path.dirname(mention.__file__)))
+    try:
+        with Redirect(server.stdout.readline().split()[1]):
+            account_id = data.account_ids[0]
+            alert_id = data.alert_ids(account_id)[0]
+            client = mention.FetchAllMentionsAPI("a", account_id, alert_id,
+                                                 limit=str(args.limit))
+            client.query()  # warm up the connection and the server's cache
+
+            for name, mode in (("query", buffered),
+                               ("query_stream", streamed)):
+                count, first, total, peak = measure(mode, client)
+                print("{0:<13} {1} mentions, first after {2:7.2f}ms, all "
+                      "after {3:7.2f}ms, peak memory {4:8.1f}KiB".format(
+                          name, count, first * 1000, total * 1000,
+                          peak / 1024.0))
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
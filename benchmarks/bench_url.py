@@ -0,0 +1,76 @@
+"""Cost of building endpoint urls, compared with the previous builder.
+
+The previous builder rebuilt the `params` dict twice per url, filtered it
+with a nested function, grew a format string with `+=` and formatted it. It
+is kept here as the baseline the compiled routes are measured against.
+
+:Example:
+
+    $ python bench_url.py --number 100000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+
+
+def legacy_url(client, path):
+    """The url builder of the endpoint classes before the route table."""
+    end_url = path + "?"
+
+    def without_keys(d, keys):
+        return {x: d[x] for x in d if x not in keys}
+
+    params = {k: v for k, v in client.params.items() if v not in (None, "")}
+    keys = {"access_token", "account_id", "alert_id"}
+    parameters = without_keys(
+        {k: v for k, v in client.params.items() if v not in (None, "")},
+        keys)
+
+    for key, value in list(parameters.items()):
+        if value != '':
+            end_url += '&' + key + '={' + key + '}'
+
+    return client.base_url + end_url.format(**params)
+
+
+CASES = [
+    ("FetchAllMentionsAPI",
+     lambda: mention.FetchAllMentionsAPI(
+         "a", "240891_c386bbc4cd613e30d8f16adf91b7584a", "1849001",
+         limit="100", not_before_date="2018-11-25 12:00", tone="negative",
+         include_children=True, languages="en,fr"),
+     "/accounts/{account_id}/alerts/{alert_id}/mentions"),
+    ("FetchMentionChildrenAPI",
+     lambda: mention.FetchMentionChildrenAPI(
+         "a", "240891_c386bbc4cd613e30d8f16adf91b7584a", "1849001",
+         "128000003676", limit="20", before_date="2018-11-25 12:00"),
+     "/accounts/{account_id}/alerts/{alert_id}/mentions/{mention_id}"
+     "/children"),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    for name, factory, path in CASES:
+        client = factory()
+        legacy = min(timeit.repeat(lambda: legacy_url(client, path),
+                                   number=args.number, repeat=3))
+        compiled = min(timeit.repeat(lambda: client.url,
+                                     number=args.number, repeat=3))
+        print("{0:<25} legacy {1:6.2f}us  compiled {2:6.2f}us  "
+              "speedup {3:4.1f}x".format(
+                  name, legacy / args.number * 1e6,
+                  compiled / args.number * 1e6, legacy / compiled))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,67 @@
-from .base import AppDataAPI
-
-from .base import FetchAnAlertAPI
-from .base import FetchAlertsAPI
-from .base import CreateAnAlertAPI
-from .base import UpdateAnAlertAPI
-
-from .base import FetchAMentionAPI
-from .base import FetchAllMentionsAPI
-from .base import FetchMentionChildrenAPI
-from .base import CurateAMentionAPI
-from .base import MarkAllMentionsAsReadAPI
+"""A Python wrapper around the Mention API.
+
+The endpoint classes and submodules are imported on first access, so
+``import mention`` stays cheap for short-lived processes. `requests` is only
+imported when the first request is sent.
+"""
+#: Endpoint classes exported by the package, by the module defining them.
+_EXPORTS = {
+    "AppDataAPI": "base",
+    "FetchAnAlertAPI": "base",
+    "FetchAlertsAPI": "base",
+    "CreateAnAlertAPI": "base",
+    "UpdateAnAlertAPI": "base",
+    "FetchAMentionAPI": "base",
+    "FetchAllMentionsAPI": "base",
+    "FetchMentionChildrenAPI": "base",
+    "CurateAMentionAPI": "base",
+    "MarkAllMentionsAsReadAPI": "base",
+    "StreamMentionsAPI": "base",
+}
+
+_SUBMODULES = {
+    "accountstream",
+    "base",
+    "breaker",
+    "checkpoint",
+    "compression",
+    "deadline",
+    "dedupe",
+    "duplicates",
+    "exceptions",
+    "fakeserver",
+    "hedging",
+    "hub",
+    "journal",
+    "keywords",
+    "operations",
+    "pipeline",
+    "querystring",
+    "ratelimit",
+    "routes",
+    "scheduler",
+    "streaming",
+    "tracing",
+    "transport",
+    "utils",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    from importlib import import_module
+
+    if name in _EXPORTS:
+        value = getattr(import_module("." + _EXPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = import_module("." + name, __name__)
+    else:
+        raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
@@ -0,0 +1,212 @@
+"""One stream connection for all the alerts of an account.
+
+An :class:`AccountStream` opens a single
+:class:`mention.base.StreamMentionsAPI` connection for the alerts of an
+account, routes each mention to its alert and keeps the `since_id` of every
+alert: the id of the newest mention handed to the consumer.
+
+When the connection is lost, times out or is closed by the server, the
+stream reconnects after an exponential backoff with jitter, resubscribing
+with the `since_id` of each alert, so the server replays the mentions sent
+in the meantime and none is missed. The `since_ids` can be saved to a
+:class:`mention.checkpoint.Checkpoint`, to resume from them after a
+restart.
+
+A mention is recorded in the `since_ids` once the consumer asks for the
+next one, so a mention is delivered at least once.
+
+:Example:
+
+>>> stream = AccountStream(access_token, account_id, alert_ids,
+...                        checkpoint="stream-1234.json")
+>>> stream.on(alert_ids[0], alerting.handle)
+>>> stream.on(alert_ids[1], indexing.handle)
+>>> stream.run()
+"""
+import random
+import threading
+
+from mention.base import StreamMentionsAPI
+from mention.checkpoint import Checkpoint
+from mention.exceptions import (InvalidCheckpointException,
+                                InvalidResponseException,
+                                RequestTimeoutException)
+
+#: Statuses after which the stream reconnects; it stops on the others.
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+
+def _newer(mention_id, since_id):
+    if since_id is None:
+        return True
+    try:
+        return int(mention_id) > int(since_id)
+    except (TypeError, ValueError):
+        return True
+
+
+class AccountStream(object):
+    """Streams the mentions of several alerts of an account, reconnecting
+    from the last mention of each alert.
+
+    :param access_token: Mention API `access_token`.
+    :param account_id: ID of the account.
+    :param alerts: IDs of the alerts to stream.
+    :param since_ids: ID of the newest mention already received, by alert
+     ID. The ids of the checkpoint, if any, take precedence.
+    :param checkpoint: path of the file the `since_ids` are saved to.
+    :param checkpoint_every: number of mentions between two saves of the
+     checkpoint. It is also saved on every reconnection and when the stream
+     stops.
+    :param time_open: seconds without data after which the connection is
+     considered lost.
+    :param backoff: first delay before reconnecting, in seconds.
+    :param max_backoff: longest delay before reconnecting, in seconds.
+    :param transport: transport of the requests, the default one if
+     omitted.
+    :type access_token: str
+    :type account_id: str
+    :type alerts: list
+    :type since_ids: dict
+    :type checkpoint: str
+    :type checkpoint_every: int
+    :type time_open: float
+    :type backoff: float
+    :type max_backoff: float
+    :type transport: :class:`mention.transport.Transport`
+    """
+
+    def __init__(self, access_token, account_id, alerts, since_ids=None,
+                 checkpoint=None, checkpoint_every=100, time_open=20,
+                 backoff=0.5, max_backoff=60.0, transport=None):
+        self.access_token = access_token
+        self.account_id = str(account_id)
+        self.alerts = [str(alert) for alert in alerts]
+        self.since_ids = dict.fromkeys(self.alerts)
+        for alert, since_id in (since_ids or {}).items():
+            self.since_ids[str(alert)] = since_id
+        self.checkpoint = None if checkpoint is None else \
+            Checkpoint(checkpoint)
+        self.checkpoint_every = checkpoint_every
+        self.time_open = time_open
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.transport = transport
+        self._handlers = {}
+        self._stopped = threading.Event()
+        self._unsaved = 0
+        #: Number of connections opened.
+        self.connections = 0
+        #: Number of mentions delivered.
+        self.mentions = 0
+        #: Number of mentions of other alerts, ignored.
+        self.unrouted = 0
+        #: Exception that closed the last connection, if any.
+        self.last_error = None
+        if self.checkpoint is not None:
+            self._load()
+
+    def _load(self):
+        state = self.checkpoint.load()
+        if state is None:
+            return
+        if state.get("account_id") != self.account_id:
+            raise InvalidCheckpointException(
+                "{0} is not a checkpoint of account {1}".format(
+                    self.checkpoint.path, self.account_id))
+        for alert, since_id in state["since_ids"].items():
+            if alert in self.since_ids and since_id is not None:
+                self.since_ids[alert] = since_id
+
+    def save(self):
+        """Saves the `since_ids` to the checkpoint, if any."""
+        if self.checkpoint is not None:
+            self.checkpoint.save({"account_id": self.account_id,
+                                  "since_ids": self.since_ids})
+        self._unsaved = 0
+
+    def on(self, alert_id, handler):
+        """Routes the mentions of an alert to a handler, see :meth:`run`.
+
+        :param alert_id: ID of the alert.
+        :param handler: called with each mention of the alert.
+        :type alert_id: str
+        :type handler: callable
+        """
+        self._handlers[str(alert_id)] = handler
+
+    def _connect(self, attempt):
+        client = StreamMentionsAPI(self.access_token, self.account_id,
+                                   self.alerts, self.since_ids,
+                                   self.time_open)
+        client.attempt = attempt
+        if self.transport is not None:
+            client.transport = self.transport
+        self.connections += 1
+        return client.query_stream()
+
+    def __iter__(self):
+        """Yields the `(alert_id, mention)` pairs of the stream, until
+        :meth:`stop` is called.
+
+        :raises mention.exceptions.InvalidResponseException: if the server
+         refuses the stream for a reason that reconnecting does not fix,
+         e.g. an invalid token or an unknown alert. The stream reconnects
+         only after the errors of the connection, timeouts included; the
+         other errors are raised.
+        """
+        import requests
+
+        # Errors of the connection, after which the stream reconnects.
+        lost = (requests.ConnectionError, requests.Timeout, OSError,
+                RequestTimeoutException)
+        attempt = 0
+        try:
+            while not self._stopped.is_set():
+                try:
+                    for mention in self._connect(attempt + 1):
+                        attempt = 0
+                        alert = str(mention.get("alert_id"))
+                        if alert not in self.since_ids:
+                            self.unrouted += 1
+                            continue
+                        if not _newer(mention["id"], self.since_ids[alert]):
+                            # Replayed by a reconnection.
+                            continue
+                        yield alert, mention
+                        self.since_ids[alert] = mention["id"]
+                        self.mentions += 1
+                        self._unsaved += 1
+                        if self._unsaved >= self.checkpoint_every:
+                            self.save()
+                        if self._stopped.is_set():
+                            break
+                    self.last_error = None
+                except InvalidResponseException as error:
+                    if error.status_code not in RETRY_STATUSES:
+                        raise
+                    self.last_error = error
+                except lost as error:
+                    self.last_error = error
+                self.save()
+                if self._stopped.is_set():
+                    break
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                attempt += 1
+                self._stopped.wait(random.uniform(0, delay))
+        finally:
+            self.save()
+
+    def run(self):
+        """Hands each mention to the handler of its alert, see :meth:`on`,
+        until :meth:`stop` is called. The mentions of the alerts without a
+        handler are skipped."""
+        for alert, mention in self:
+            handler = self._handlers.get(alert)
+            if handler is not None:
+                handler(mention)
+
+    def stop(self):
+        """Stops the stream after the current mention; a stream waiting for
+        data stops within `time_open` seconds."""
+        self._stopped.set()
@@ -1,24 +1,58 @@
-import requests
-from requests_oauth2 import OAuth2BearerToken
 import json
-from abc import ABCMeta, abstractmethod
-from requests.exceptions import HTTPError
-from mention import utils
+from mention import (compression, routes, streaming, tracing, transport,
+                     utils)
+from mention.exceptions import InvalidResponseException
 
 
 class Mention(object):
     """The base class for all of the Mention API calls.
 
+    Subclasses describe their request with a :class:`mention.routes.Route`;
+    the url, the body and the request itself are derived from it, so every
+    endpoint runs through the same code path.
 
     :param access_token: Mention API `access_token`
     :type access_token: str
 
     """
-    __metaclass__ = ABCMeta
+
+    #: Root url of the Mention API. Can be overridden on the class or an
+    #: instance to point the client at another server, e.g. a local fake.
+    base_url = "https://api.mention.net/api"
+
+    #: Transport that sends the requests. Can be overridden on the class or
+    #: an instance; if None, :func:`mention.transport.default_transport` is
+    #: used.
+    transport = None
+
+    #: Route of the API call, see :mod:`mention.routes`.
+    route = None
+
+    #: Seconds to wait for a connection and for each read of the response,
+    #: as a `(connect, read)` tuple, or None to wait forever. A deadline
+    #: given to :meth:`query` shortens them to the time it has left.
+    timeout = (10.0, 60.0)
+
+    #: Index of the page, or of the call, within the operation sending it,
+    #: recorded on the span of the call, see :mod:`mention.tracing`.
+    page = None
+
+    #: Number of the attempt of the call, e.g. the reconnections of a
+    #: stream, recorded on the span of the call.
+    attempt = None
 
     def __init__(self, access_token):
         self.access_token = access_token
 
+    @property
+    def _transport(self):
+        """Transport used to send the request of the API call.
+
+        :return: the transport.
+        :rtype: :class:`mention.transport.Transport`
+        """
+        return self.transport or transport.default_transport()
+
     @property
     def _base_url(self):
         """Base url.
@@ -26,69 +60,229 @@ class Mention(object):
         :return: the base url
         :rtype: str
         """
-        return "https://api.mention.net/api"
+        return self.base_url
 
-    @abstractmethod
+    @property
     def params(self):
-        """Parameters used in the url of the API call.
+        """Parameters used in the url of the API call and for authentication.
+
+        :return: parameters used in the url.
+        :rtype: dict
         """
-        return
+        params = self.route.params(self)
+        params["access_token"] = self.access_token
+        return params
 
-    @abstractmethod
+    @property
     def url(self):
-        """The concatenation of the `base_url` and parameters that make up the
-        resultant url.
+        """The concatenation of the `base_url`, the path of the route and the
+        query string that make up the resultant url.
+
+        :return: the url.
+        :rtype: str
         """
-        return
+        return self.route.build_url(self._base_url, self.params)
 
-    @abstractmethod
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
+    @property
+    def data(self):
+        """JSON body of the API call, from the fields of the route that have
+        a value.
+
+        :return: the encoded body, or None if the route has no body.
+        :rtype: str
         """
-        return
+        if self.route.body is None:
+            return None
+        return json.dumps(routes.body_fields(self.route, self))
 
+    def query(self, deadline=None):
+        """The request that returns a JSON file of the API call given a url.
 
-class AppDataAPI(Mention):
-    """Retrieves useful details about the application.
+        :param deadline: budget of the operation the call is part of. The
+         response is abandoned once it has passed.
+        :type deadline: :class:`mention.deadline.Deadline`
 
-    :param access_token: Mention API `access_token`
-    :type access_token: str
+        :return: the decoded response.
+        :rtype: :class: `json`
 
-    """
+        :raises mention.exceptions.RequestTimeoutException: if the server
+         does not answer within the timeouts.
+        :raises mention.exceptions.DeadlineExceededException: if the
+         deadline passes first.
+        """
+        with tracing.query_span(self) as span:
+            if deadline is None:
+                response = self._send()
+                data = response.json()
+                self._record(span, response)
+            else:
+                data = json.loads(self._read(span, deadline))
 
-    def __init__(self, access_token):
-        self.access_token = access_token
-        super(AppDataAPI, self).__init__(access_token)
+        return data
 
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
+    def query_raw(self, deadline=None):
+        """The request that returns the body of the API call, not decoded,
+        e.g. to decode it in another process, see :mod:`mention.pipeline`.
 
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
+        :param deadline: budget of the operation the call is part of.
+        :type deadline: :class:`mention.deadline.Deadline`
+
+        :return: the JSON body, decompressed.
+        :rtype: bytes
         """
-        end_url = "/app/data"
+        with tracing.query_span(self) as span:
+            return self._read(span, deadline)
 
-        return self._base_url + end_url
+    async def aquery(self, deadline=None):
+        """Coroutine version of :meth:`query`.
 
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
+        The request is sent with the `arequest` method of the transport, so
+        an :class:`mention.transport.HTTP2Transport` multiplexes the requests
+        of concurrent coroutines; other transports send it from a thread.
+        With a deadline, the request is cancelled once it has passed.
 
-        :return: the `base_url` and the `end_url`.
+        :param deadline: budget of the operation the call is part of.
+        :type deadline: :class:`mention.deadline.Deadline`
+
+        :return: the decoded response.
         :rtype: :class: `json`
         """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
+        with tracing.query_span(self) as span:
+            request = self._transport.arequest(
+                self.route.method, self.url, self.access_token, self.data,
+                timeout=self._timeout(deadline))
+            if deadline is None:
+                response = await request
+            else:
+                response = await deadline.wait_for(request)
+            data = response.json()
+            self._record(span, response)
+
+        return data
+
+    def query_stream(self, deadline=None):
+        """The request that streams the items of the API call.
+
+        The body is parsed incrementally while it is downloaded, and each
+        item, e.g. each mention, is yielded as soon as it has arrived. The
+        other members of the response, such as `_links`, are available in
+        the `metadata` of the stream once it is exhausted.
+
+        :param deadline: budget of the operation the call is part of. The
+         stream raises :class:`mention.exceptions.DeadlineExceededException`
+         once it has passed, after yielding the items received so far.
+        :type deadline: :class:`mention.deadline.Deadline`
+
+        :return: an iterator over the items.
+        :rtype: :class:`mention.streaming.JSONArrayStream`
+        """
+        if self.route.items is None:
+            raise TypeError(
+                "{0} can not be streamed".format(type(self).__name__))
+        return streaming.JSONArrayStream(self._stream_chunks(deadline),
+                                         self.route.items)
+
+    def _record(self, span, response):
+        tracing.record_response(span, response)
+        compression.stats.record(self, response)
+
+    def _record_stream(self, span, response, size):
+        # The body of a streamed response is not kept, its size is counted
+        # while it is read.
+        tracing.set_attributes(span, status_code=response.status_code,
+                               response_size=size,
+                               wire_size=getattr(response, "wire_size", None),
+                               attempts=getattr(response, "attempts", None),
+                               circuit_probe=getattr(response,
+                                                     "circuit_probe", None))
+        compression.stats.record(self, response)
+
+    def _read(self, span, deadline=None):
+        response = self._send(stream=True, deadline=deadline)
+        try:
+            content = b"".join(_until(
+                response.iter_content(streaming.CHUNK_SIZE), deadline))
+        finally:
+            response.close()
+        self._record_stream(span, response, len(content))
+        return content
+
+    def _timeout(self, deadline):
+        if deadline is None:
+            return self.timeout
+        return deadline.timeout(self.timeout)
+
+    def _send(self, stream=False, deadline=None):
+        return self._transport.request(self.route.method, self.url,
+                                       self.access_token, self.data,
+                                       stream=stream,
+                                       timeout=self._timeout(deadline))
+
+    def _stream_chunks(self, deadline=None, check_status=False):
+        with tracing.query_span(self) as span:
+            response = self._send(stream=True, deadline=deadline)
+            size = 0
             try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
+                if check_status and response.status_code >= 400:
+                    body = b"".join(response.iter_content(
+                        streaming.CHUNK_SIZE))
+                    raise InvalidResponseException(
+                        "{0}: {1}".format(response.status_code,
+                                          body.decode("utf-8", "replace")),
+                        response.status_code)
+                for chunk in _until(
+                        response.iter_content(streaming.CHUNK_SIZE),
+                        deadline):
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                response.close()
+            self._record_stream(span, response, size)
+
+
+def _until(chunks, deadline):
+    """Stops reading a body once the deadline, if any, has passed.
+
+    :raises mention.exceptions.DeadlineExceededException: if the deadline
+     passes before the body has been read.
+    """
+    for chunk in chunks:
+        if deadline is not None:
+            deadline.check()
+        yield chunk
 
-        data = response.json()
 
-        return data
+def _limit(limit):
+    """Clamps the number of items of a page to the maximum of 1000.
+
+    :param limit: requested number of items.
+    :type limit: str
+
+    :return: the limit to send, or None to use the default of the API.
+    :rtype: str
+    """
+    if limit is None or limit == "":
+        return None
+    if int(limit) > 1000:
+        return "1000"
+    if int(limit) < 1:
+        return None
+    return limit
+
+
+class AppDataAPI(Mention):
+    """Retrieves useful details about the application.
+
+    :param access_token: Mention API `access_token`
+    :type access_token: str
+
+    """
+
+    route = routes.APP_DATA
+
+    def __init__(self, access_token):
+        self.access_token = access_token
+        super(AppDataAPI, self).__init__(access_token)
 
 
 class FetchAnAlertAPI(Mention):
@@ -102,55 +296,14 @@ class FetchAnAlertAPI(Mention):
     :type alert_id: str
     """
 
+    route = routes.FETCH_AN_ALERT
+
     def __init__(self, access_token, account_id, alert_id):
         self.access_token = access_token
         self.account_id = account_id
         self.alert_id = alert_id
         super(FetchAnAlertAPI, self).__init__(access_token)
 
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        return params
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/"
-            "{alert_id}".format(**self.params))
-
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-
-        return data
-
 
 class CreateAnAlertAPI(Mention):
     """Retrieve details about a single alert.
@@ -204,6 +357,8 @@ class CreateAnAlertAPI(Mention):
     :type reviews_pages: list
     """
 
+    route = routes.CREATE_AN_ALERT
+
     def __init__(self,
                  access_token,
                  account_id,
@@ -232,71 +387,6 @@ class CreateAnAlertAPI(Mention):
         self.reviews_pages = reviews_pages
         super(CreateAnAlertAPI, self).__init__(access_token)
 
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        return params
-
-    @property
-    def data(self):
-        """Parameters passed to the API containing the details to create a new
-         alert.
-
-        :return: parameters to create new alert.
-        :rtype: dict
-        """
-        data = {}
-        data["name"] = self.name
-        data["query"] = self.queryd
-        data["languages"] = self.languages
-        data["countries"] = self.countries if self.countries else ""
-        data["sources"] = self.sources if self.sources else ""
-        data["blocked_sites"] = self.blocked_sites if self.blocked_sites else ""
-        data["noise_detection"] = self.noise_detection if self.noise_detection else ""
-        data["reviews_pages"] = self.reviews_pages if self.reviews_pages else ""
-
-        # Deletes parameter if it does not have a value
-        for key, value in list(data.items()):
-            if value == '':
-                del data[key]
-
-        data = json.dumps(data)
-        return data
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = "/accounts/{account_id}/alerts/".format(**self.params)
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.post(self.url, data=self.data)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.text
-        return data
-
 
 class UpdateAnAlertAPI(Mention):
     """Modifies an existing alert, usually to update the criteria and to improve the search's efficiency.
@@ -350,6 +440,8 @@ class UpdateAnAlertAPI(Mention):
     :type reviews_pages: list
     """
 
+    route = routes.UPDATE_AN_ALERT
+
     def __init__(self,
                  access_token,
                  account_id,
@@ -380,73 +472,6 @@ class UpdateAnAlertAPI(Mention):
         self.reviews_pages = reviews_pages
         super(UpdateAnAlertAPI, self).__init__(access_token)
 
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        return params
-
-    @property
-    def data(self):
-        """Parameters passed to the API containing the details to update a
-         alert.
-
-        :return: parameters to create new alert.
-        :rtype: dict
-        """
-        data = {}
-        data["name"] = self.name
-        data["query"] = self.queryd
-        data["languages"] = self.languages
-        data["countries"] = self.countries if self.countries else ""
-        data["sources"] = self.sources if self.sources else ""
-        data["blocked_sites"] = self.blocked_sites if self.blocked_sites else ""
-        data["noise_detection"] = self.noise_detection if self.noise_detection else ""
-        data["reviews_pages"] = self.reviews_pages if self.reviews_pages else ""
-
-        # Deletes parameter if it does not have a value
-        for key, value in list(data.items()):
-            if value == '':
-                del data[key]
-
-        data = json.dumps(data)
-        return data
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/{alert_id}"
-                    .format(**self.params))
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.put(self.url, data=self.data)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-        return data
-
 
 class FetchAlertsAPI(Mention):
     """This method will allow you to fetch a list of all alerts for a given account.
@@ -457,51 +482,13 @@ class FetchAlertsAPI(Mention):
     :type account_id: str
     """
 
+    route = routes.FETCH_ALERTS
+
     def __init__(self, access_token, account_id):
         self.access_token = access_token
         self.account_id = account_id
         super(FetchAlertsAPI, self).__init__(access_token)
 
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        return params
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts".format(**self.params))
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-
-        return data
-
 
 class FetchAMentionAPI(Mention):
     """Get a single mention by its mention ID.
@@ -518,6 +505,8 @@ class FetchAMentionAPI(Mention):
 
     """
 
+    route = routes.FETCH_A_MENTION
+
     def __init__(self, access_token, account_id, alert_id, mention_id):
         self.access_token = access_token
         self.account_id = account_id
@@ -525,49 +514,6 @@ class FetchAMentionAPI(Mention):
         self.mention_id = mention_id
         super(FetchAMentionAPI, self).__init__(access_token)
 
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        params["mention_id"] = self.mention_id
-        return params
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/{alert_id}/mentions/"
-                   "{mention_id}".format(**self.params))
-
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-        return data
-
 
 class FetchAllMentionsAPI(Mention):
     """Get all or a filtered amount of mentions from an account.
@@ -580,13 +526,14 @@ class FetchAllMentionsAPI(Mention):
 
     :param limit: Number of mentions to return. max 1000.
     :param before_date: Mentions Before date in 'yyyy-MM-dd HH:mm' format
+     (UTC), or a datetime; naive datetimes are taken as UTC.
 
     :Example:
 
     >>> before_date = '2018-11-25 12:00'
 
     :param not_before_date: Mentions Not before date in
-     'yyyy-MM-dd HH:mm' format
+     'yyyy-MM-dd HH:mm' format (UTC), or a datetime.
 
     :param source: Must be either web, twitter, blogs, forums, news,
      facebook, images or videos
@@ -619,8 +566,8 @@ class FetchAllMentionsAPI(Mention):
     :type alert_id: str
     :type since_id: str
     :type limit: str
-    :type before_date: str
-    :type not_before_date: str
+    :type before_date: str or datetime
+    :type not_before_date: str or datetime
     :type source: str
     :type unread: boolean
     :type favorite: boolean
@@ -635,6 +582,8 @@ class FetchAllMentionsAPI(Mention):
     :type cursor: str
     """
 
+    route = routes.FETCH_ALL_MENTIONS
+
     def __init__(self,
                  access_token,
                  account_id,
@@ -664,12 +613,12 @@ class FetchAllMentionsAPI(Mention):
         self.since_id = since_id
 
         if before_date is not None:
-            self.before_date = utils.transform_date(before_date)
+            self.before_date = utils.format_date(before_date)
         else:
             self.before_date = before_date
 
         if not_before_date is not None:
-            self.not_before_date = utils.transform_date(not_before_date)
+            self.not_before_date = utils.format_date(not_before_date)
         else:
             self.not_before_date = not_before_date
 
@@ -688,7 +637,7 @@ class FetchAllMentionsAPI(Mention):
         self.folder = folder
 
         if tone is not None:
-            self.tone = tone = utils.transform_tone(tone)
+            self.tone = utils.transform_tone(tone)
         else:
             self.tone = tone
 
@@ -710,96 +659,28 @@ class FetchAllMentionsAPI(Mention):
     def params(self):
         """Parameters used in the url of the API call and for authentication.
 
+        `since_id` can not be combined with the dates and the cursor, and
+        `unread` with the other filters; the parameters that do not apply are
+        left out.
+
         :return: parameters used in the url.
         :rtype: dict
         """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
+        params = super(FetchAllMentionsAPI, self).params
 
         if self.since_id:
-            params["since_id"] = self.since_id
-        else:
-            params["before_date"] = self.before_date if self.before_date else ""
-            params["not_before_date"] = self.not_before_date if self.before_date else ""
-            params["cursor"] = self.cursor if self.cursor else ""
+            for name in ("before_date", "not_before_date", "cursor"):
+                params[name] = None
 
         if self.unread:
-            params["unread"] = self.unread
-        else:
-            if (self.favorite) and (
-                (self.folder == "inbox") or (self.folder == "archive")):
-                params["favorite"] = self.favorite
-                params["folder"] = self.folder
-            else:
-                 params["folder"] = self.folder if self.folder else ""   
-            params["q"] = self.q if self.q else ""
-            params["tone"] = self.tone if self.tone else ""
-
-        if int(self.limit) > 1000:
-            params["limit"] = "1000"
-        elif int(self.limit) < 1:
-            params["limit"] = ""
-        else:
-            params["limit"] = self.limit
-
-        params["source"] = self.source if self.source else ""
-
-        params["countries"] = self.countries if self.countries else ""
-        params["include_children"] = self.include_children if self.include_children else ""
-        params["sort"] = self.sort if self.sort else ""
-        params["languages"] = self.languages if self.languages else ""
-        params["timezone"] = self.timezone if self.timezone else ""
-
-        # Deletes parameter if it does not have a value
-        for key, value in list(params.items()):
-            if value == '':
-                del params[key]
+            for name in ("favorite", "folder", "q", "tone"):
+                params[name] = None
+        elif self.folder not in ("inbox", "archive"):
+            params["favorite"] = None
 
+        params["limit"] = _limit(self.limit)
         return params
 
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = "/accounts/{account_id}/alerts/{alert_id}/mentions?"
-
-        # Returns copy of dictionary excluding certain keys
-        def without_keys(d, keys):
-            return {x: d[x] for x in d if x not in keys}
-
-        keys = {"access_token", "account_id", "alert_id"}
-        parameters = without_keys(self.params, keys)
-
-        for key, value in list(parameters.items()):
-            if value != '':
-                end_url += '&' + key + '={' + key + '}'
-
-        end_url = end_url.format(**self.params)
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-
-        return data
-
 
 class FetchMentionChildrenAPI(Mention):
     """""This class will allow you to fetch a list of all children mentions for a given mention.
@@ -809,6 +690,7 @@ class FetchMentionChildrenAPI(Mention):
     :param alert_id: ID of the alert.
     :param limit: Number of mentions to return. max 1000.
     :param before_date: Mentions Before date in 'yyyy-MM-dd HH:mm' format
+     (UTC), or a datetime; naive datetimes are taken as UTC.
 
     :Example:
 
@@ -818,9 +700,11 @@ class FetchMentionChildrenAPI(Mention):
     :type account_id: str
     :type alert_id: str
     :type limit: str
-    :type before_date: str
+    :type before_date: str or datetime
     """
 
+    route = routes.FETCH_MENTION_CHILDREN
+
     def __init__(self, access_token, account_id, alert_id, mention_id,
                  limit=None, before_date=None):
         self.access_token = access_token
@@ -830,7 +714,7 @@ class FetchMentionChildrenAPI(Mention):
         self.limit = limit
 
         if before_date is not None:
-            self.before_date = utils.transform_date(before_date)
+            self.before_date = utils.format_date(before_date)
         else:
             self.before_date = before_date
         super(FetchMentionChildrenAPI, self).__init__(access_token)
@@ -842,147 +726,98 @@ class FetchMentionChildrenAPI(Mention):
         :return: parameters used in the url.
         :rtype: dict
         """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        params["mention_id"] = self.mention_id
-        params["before_date"] = self.before_date if self.before_date else ""
-
-        if self.limit:
-            if int(self.limit) > 1000:
-                params["limit"] = "1000"
-            elif int(self.limit) < 1:
-                params["limit"] = ""
-            else:
-                params["limit"] = self.limit
-
+        params = super(FetchMentionChildrenAPI, self).params
+        params["limit"] = _limit(self.limit)
         return params
 
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
 
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/{alert_id}/mentions/"
-                  "{mention_id}/children?")
+class StreamMentionsAPI(Mention):
+    """Streams the new mentions of several alerts of an account over a
+    single connection.
 
-        def without_keys(d, keys):
-            return {x: d[x] for x in d if x not in keys}
+    The response is made of one JSON line per mention, each with the
+    `alert_id` it belongs to, see :class:`mention.accountstream.AccountStream`
+    for a stream that routes the mentions and reconnects.
 
-        keys = {"access_token", "account_id", "alert_id"}
-        parameters = without_keys(self.params, keys)
+    :param access_token: Mention API `access_token`
+    :param account_id: ID of the account.
+    :param alerts: IDs of the alerts to stream.
+    :param since_ids: ID of the newest mention already received, by alert
+     ID. The mentions after it are sent first; the alerts without one start
+     with the new mentions.
+    :param time_open: seconds without data after which the connection is
+     considered lost.
 
-        for key, value in list(parameters.items()):
-            if value != '':
-                end_url += '&' + key + '={' + key + '}'
+    :type access_token: str
+    :type account_id: str
+    :type alerts: list
+    :type since_ids: dict
+    :type time_open: float
+    """
 
-        end_url = end_url.format(**self.params)
-        return self._base_url + end_url
+    base_url = "https://stream.mention.net/api"
 
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
+    route = routes.STREAM_MENTIONS
 
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
+    def __init__(self,
+                 access_token,
+                 account_id,
+                 alerts,
+                 since_ids=None,
+                 time_open=20):
+        self.account_id = account_id
+        self.alerts = [str(alert) for alert in alerts]
+        self.since_ids = dict((str(alert), since_id) for alert, since_id in
+                              (since_ids or {}).items())
+        self.time_open = time_open
+        super(StreamMentionsAPI, self).__init__(access_token)
+
+    @property
+    def timeout(self):
+        """Seconds to wait for the connection and between two reads.
+
+        :rtype: tuple
         """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.get(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
+        return (Mention.timeout[0], self.time_open)
 
-        return data
+    @property
+    def url(self):
+        """The url of the stream, with an `alerts[]` parameter per alert and
+        their `since_id[alert]`.
+
+        :return: the url.
+        :rtype: str
+        """
+        pairs = ["alerts[]=" + routes.encode(alert) for alert in self.alerts]
+        pairs.extend("since_id[{0}]={1}".format(
+            routes.encode(alert), routes.encode(self.since_ids[alert]))
+            for alert in self.alerts
+            if self.since_ids.get(alert) is not None)
+        return "{0}?{1}".format(
+            self.route.build_url(self._base_url, self.params),
+            "&".join(pairs))
 
+    def query(self, deadline=None):
+        raise TypeError("StreamMentionsAPI can only be streamed, see "
+                        "query_stream")
 
-# class StreamMentionsAPI(Mention):
-#     """
-#     :param access_token: Mention API `access_token`
-#     :param account_id: ID of the account.
-#     :param alerts: list of alerts to stream.
-#     :param since_id: Returns mentions ordered by id.
-#     Can not be combined with before_date, not_before_date, cursor.
-
-#     :param time_open:
-#     Sets the amount of time the connection should stay open for.
-
-#     :type access_token: str
-#     :type account_id: str
-#     :type alerts: list
-#     :type since_id: list
-#     :type time_open: str
-#     """
-
-#     def __init__(self,
-#                  access_token,
-#                  account_id,
-#                  alerts,
-#                  since_ids=None,
-#                  time_open=20):
-#         self.access_token = access_token
-#         self.account_id = account_id
-#         self.alerts = alerts
-#         self.since_ids = since_ids
-#         self.time_open = time_open
-#         super(StreamMentionsAPI, self).__init__(access_token)
-       
-
-#    @property
-#    def params(self):
-#        params = {}
-#        params["access_token"] = self.access_token
-#        params["account_id"] = self.account_id
-
-#        querystring = ""
-
-#        for alert in self.alerts:
-#            querystring += "alerts[]=" + alert + "&"
-           
-#        if self.since_ids:
-#            for i in range(self.since_ids):
-#                querystring += ("since_id[{alert_id}]="
-#                                "{since_id}&").format(self.since_ids[i],
-#                                                      self.alerts[i])
-
-#        params["querystring"] = querystring
-               
-#        return params
-
-#    @property
-#    def url(self):
-#        base_url = "https://stream.mention.net/api"
-#        end_url = ("/accounts/{account_id}/mentions?"
-#                  "{querystring}").format(**self.params)
-
-#        return base_url + end_url
-
-
-#    def query(self):
-#        with requests.Session() as session:
-#            session.auth = OAuth2BearerToken(self.access_token)
-           
-#            response = session.get(self.url,
-#                                   stream=True,
-#                                   timeout=self.time_open)
-
-
-#            for line in response.iter_lines():
-#                if line:
-#                    print(json.loads(line))
-                           
-#            try:
-#                response.raise_for_status()
-#            except HTTPError:
-#                pass
-#            data = response.json()
-
-#        return data
+    def query_stream(self, deadline=None):
+        """The request that streams the mentions, decoded as they arrive.
+
+        :param deadline: budget of the stream.
+        :type deadline: :class:`mention.deadline.Deadline`
+
+        :return: an iterator over the mentions, until the server closes the
+         connection.
+        :rtype: generator
+
+        :raises mention.exceptions.InvalidResponseException: if the server
+         refuses the stream.
+        :raises mention.exceptions.RequestTimeoutException: if no data
+         arrives for `time_open` seconds.
+        """
+        return streaming.json_lines(self._stream_chunks(deadline,
+                                                        check_status=True))
 
 
 class CurateAMentionAPI(Mention):
@@ -1021,6 +856,8 @@ class CurateAMentionAPI(Mention):
     :type tone: str
     """
 
+    route = routes.CURATE_A_MENTION
+
     def __init__(self,
                  access_token,
                  account_id,
@@ -1048,82 +885,18 @@ class CurateAMentionAPI(Mention):
             self.trashed = trashed
 
         if read is not None:
-            self.read = tone = utils.transform_tone(read)
+            self.read = utils.transform_boolean(read)
         else:
             self.read = read
 
         self.tags = tags
         self.folder = folder
-        self.tone = tone
-        super(CurateAMentionAPI, self).__init__(access_token)
-
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        params["mention_id"] = self.mention_id
-        return params
-
-    @property
-    def data(self):
-        """Parameters passed to the API containing the details to update a
-         alert.
-
-        :return: parameters to create new alert.
-        :rtype: dict
-        """
-        data = {}
-        data["favorite"] = self.favorite if self.favorite else ""
-        data["trashed"] = self.trashed if self.trashed else ""
-        data["read"] = self.read if self.read else ""
-        data["tags"] = self.tags if self.tags else ""
-        data["folder"] = self.folder if self.folder else ""
-        data["tone"] = self.tone if self.tone else ""
-
-        # Deletes parameter if it does not have a value
-        for key, value in list(data.items()):
-            if value == '':
-                del data[key]
-
-        data = json.dumps(data)
-        return data
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
 
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/{alert_id}/mentions/"
-                   "{mention_id}".format(**self.params))
-
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.put(self.url, data=self.data)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-
-        return data
+        if tone is not None:
+            self.tone = utils.transform_tone(tone)
+        else:
+            self.tone = tone
+        super(CurateAMentionAPI, self).__init__(access_token)
 
 
 class MarkAllMentionsAsReadAPI(Mention):
@@ -1138,50 +911,10 @@ class MarkAllMentionsAsReadAPI(Mention):
     :type alert_id: str
     """
 
+    route = routes.MARK_ALL_MENTIONS_AS_READ
+
     def __init__(self, access_token, account_id, alert_id):
         self.access_token = access_token
         self.account_id = account_id
         self.alert_id = alert_id
         super(MarkAllMentionsAsReadAPI, self).__init__(access_token)
-
-    @property
-    def params(self):
-        """Parameters used in the url of the API call and for authentication.
-
-        :return: parameters used in the url.
-        :rtype: dict
-        """
-        params = {}
-        params["access_token"] = self.access_token
-        params["account_id"] = self.account_id
-        params["alert_id"] = self.alert_id
-        return params
-
-    @property
-    def url(self):
-        """The concatenation of the `base_url` and `end_url` that make up the
-        resultant url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: str
-        """
-        end_url = ("/accounts/{account_id}/alerts/{alert_id}/mentions/"
-                   "markallread".format(**self.params))
-
-        return self._base_url + end_url
-
-    def query(self):
-        """The request that returns a JSON file of the API call given a url.
-
-        :return: the `base_url` and the `end_url`.
-        :rtype: :class: `json`
-        """
-        with requests.Session() as session:
-            session.auth = OAuth2BearerToken(self.access_token)
-            response = session.post(self.url)
-            try:
-                response.raise_for_status()
-            except HTTPError:
-                pass
-            data = response.json()
-        return data
@@ -0,0 +1,276 @@
+"""Circuit breakers that stop sending requests to a failing endpoint.
+
+A :class:`CircuitBreakerTransport` wraps another transport and keeps one
+:class:`CircuitBreaker` per host and endpoint. When too many of the recent
+requests of an endpoint failed, i.e. raised, were answered with a ``5xx`` or
+``429`` status, or took longer than `slow_call_seconds`, its circuit opens:
+further requests fail immediately with
+:class:`mention.exceptions.CircuitOpenException` instead of waiting for
+their timeouts. After `open_seconds`, a few probe requests are let through;
+the circuit closes again if they succeed and reopens otherwise.
+
+:meth:`CircuitBreakerTransport.snapshot` reports the state of every circuit,
+so that schedulers can back off from the endpoints that are down.
+
+:Example:
+
+>>> Mention.transport = breaker.CircuitBreakerTransport(
+...     failure_threshold=0.5, slow_call_seconds=10, open_seconds=30)
+>>> try:
+...     page = FetchAllMentionsAPI(access_token, account_id,
+...                                alert_id).query()
+... except CircuitOpenException as error:
+...     reschedule(after=error.retry_after)
+"""
+import threading
+import time
+from collections import deque
+
+from mention import routes
+from mention.exceptions import CircuitOpenException
+from mention.transport import Transport, default_transport
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker(object):
+    """Circuit of one endpoint, shared by the threads sending its requests.
+
+    :param failure_threshold: fraction of failed requests among the recent
+     ones that opens the circuit.
+    :param slow_call_seconds: requests taking longer than this are counted
+     as failed, None to ignore latency.
+    :param window: number of recent requests considered.
+    :param min_calls: number of requests needed before the circuit can
+     open.
+    :param open_seconds: time the circuit stays open before probing.
+    :param half_open_calls: number of probe requests sent at once.
+    :param clock: function returning the current time in seconds.
+    :type failure_threshold: float
+    :type slow_call_seconds: float
+    :type window: int
+    :type min_calls: int
+    :type open_seconds: float
+    :type half_open_calls: int
+    :type clock: callable
+    """
+
+    def __init__(self,
+                 failure_threshold=0.5,
+                 slow_call_seconds=None,
+                 window=20,
+                 min_calls=10,
+                 open_seconds=30.0,
+                 half_open_calls=1,
+                 clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.state = CLOSED
+        #: Number of times the circuit opened.
+        self.opened = 0
+        #: Number of requests refused while the circuit was open.
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until the open circuit lets a probe through, 0 if it is
+        not open.
+
+        :rtype: float
+        """
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.open_seconds - self.clock())
+
+    def acquire(self):
+        """Reserves a request.
+
+        :return: True if the request is a probe of a half-open circuit.
+        :rtype: bool
+
+        :raises CircuitOpenException: if the circuit is open, or if the
+         probes of the half-open circuit are already in flight.
+        """
+        with self._lock:
+            if (self.state == OPEN and
+                    self.clock() - self._opened_at >= self.open_seconds):
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            retry_after = self.retry_after()
+        raise CircuitOpenException(
+            "Circuit open, retry in {0:.1f}s".format(retry_after),
+            retry_after=retry_after)
+
+    def record(self, failed, probe=False):
+        """Records the outcome of a request reserved with :meth:`acquire`.
+
+        :param failed: whether the request failed.
+        :param probe: the value returned by :meth:`acquire`.
+        :type failed: bool
+        :type probe: bool
+        """
+        with self._lock:
+            if probe:
+                self._probes -= 1
+                if self.state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._failures = 0
+                return
+            if self.state != CLOSED:
+                # Sent before the circuit opened.
+                return
+            outcomes = self._outcomes
+            if len(outcomes) == outcomes.maxlen and outcomes[0]:
+                self._failures -= 1
+            outcomes.append(failed)
+            self._failures += failed
+            if (len(outcomes) >= self.min_calls and
+                    self._failures >= self.failure_threshold * len(outcomes)):
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = self.clock()
+        self.opened += 1
+
+    def failed(self, response, seconds):
+        """Whether a response counts as a failure.
+
+        :param response: the response.
+        :param seconds: time the request took.
+        :type response: :class:`requests.Response`
+        :type seconds: float
+
+        :rtype: bool
+        """
+        status = response.status_code
+        if status >= 500 or status == 429:
+            return True
+        return (self.slow_call_seconds is not None and
+                seconds > self.slow_call_seconds)
+
+    def snapshot(self):
+        """Returns the state and counters of the circuit.
+
+        :rtype: dict
+        """
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failure_rate": (float(self._failures) / calls
+                                 if calls else 0.0),
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_after": self.retry_after(),
+            }
+
+
+class CircuitBreakerTransport(Transport):
+    """Sends requests through another transport, failing fast on the
+    endpoints whose circuit is open.
+
+    :param transport: transport that sends the requests, the default
+     transport if omitted.
+    :param options: options of the :class:`CircuitBreaker` of each
+     endpoint.
+    :type transport: :class:`mention.transport.Transport`
+    """
+
+    def __init__(self, transport=None, **options):
+        self.transport = transport or default_transport()
+        self.options = options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, method, url):
+        """Returns the circuit breaker of the endpoint of a request.
+
+        :param method: HTTP method.
+        :param url: full url of the request.
+        :type method: str
+        :type url: str
+
+        :rtype: :class:`CircuitBreaker`
+        """
+        key = routes.endpoint(method, url)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = self._breakers[key] = CircuitBreaker(
+                        **self.options)
+        return breaker
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        breaker = self.breaker(method, url)
+        probe = breaker.acquire()
+        started = breaker.clock()
+        try:
+            response = self.transport.request(method, url, access_token, data,
+                                              stream=stream, timeout=timeout)
+        except Exception:
+            breaker.record(True, probe)
+            raise
+        breaker.record(breaker.failed(response, breaker.clock() - started),
+                       probe)
+        if probe:
+            # Recorded on the span of the call.
+            response.circuit_probe = True
+        return response
+
+    async def arequest(self, method, url, access_token, data=None,
+                       timeout=None):
+        breaker = self.breaker(method, url)
+        probe = breaker.acquire()
+        started = breaker.clock()
+        try:
+            response = await self.transport.arequest(
+                method, url, access_token, data, timeout=timeout)
+        except BaseException:
+            # Includes the cancellation of the coroutine by a deadline.
+            breaker.record(True, probe)
+            raise
+        breaker.record(breaker.failed(response, breaker.clock() - started),
+                       probe)
+        if probe:
+            # Recorded on the span of the call.
+            response.circuit_probe = True
+        return response
+
+    def snapshot(self):
+        """Returns the state of the circuit of every endpoint.
+
+        :return: for each `(host, method, path template)`, the state, the
+         number of recent requests and their failure rate, the number of
+         times the circuit opened and of requests refused, and the seconds
+         until the next probe.
+        :rtype: dict
+        """
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return dict((key, breaker.snapshot()) for key, breaker in breakers)
@@ -0,0 +1,306 @@
+"""Backfills that survive crashes and resume where they stopped.
+
+A :class:`BackfillJob` fetches every page of a
+:class:`mention.base.FetchAllMentionsAPI` call and writes the mentions to a
+file as JSON lines. After each page it saves its progress to a checkpoint
+file: the cursor of the next page, the number of pages and mentions, the
+id of the last mention and the size of the output.
+
+The page is flushed to disk before the checkpoint, and the checkpoint is
+replaced atomically, so a checkpoint never refers to output that was not
+written. Running the job again with the same id resumes from the cursor of
+the checkpoint, after truncating the output to its size: the rows of a page
+written after the last checkpoint are dropped and fetched again, and no row
+is written twice.
+
+:Example:
+
+>>> client = FetchAllMentionsAPI(access_token, account_id, alert_id,
+...                              limit="1000")
+>>> job = BackfillJob("alert-1849085", client, "mentions.jsonl",
+...                   directory="checkpoints")
+>>> job.run()  # crashes after some hours
+>>> job.run()  # in a new process: resumes from the last page written
+{'pages': 1200, 'mentions': 1200000, 'complete': True, ...}
+"""
+import copy
+import json
+import os
+import tempfile
+
+from mention import tracing
+from mention.exceptions import (InvalidCheckpointException,
+                                RequestTimeoutException)
+from mention.deadline import as_deadline
+from mention.operations import check_response
+
+#: Version of the format of the checkpoints.
+VERSION = 1
+
+
+def _fsync_directory(directory):
+    # Makes a rename durable. Directories can not be opened on Windows.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomically(path, data, fsync=True):
+    """Replaces the content of a file.
+
+    The data is written to a temporary file in the same directory, which is
+    then renamed over the file, so a reader finds either the previous
+    content or the new one.
+
+    :param path: path of the file.
+    :param data: the new content.
+    :param fsync: whether to flush the file to disk before renaming it, and
+     the rename after.
+    :type path: str
+    :type data: bytes
+    :type fsync: bool
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as output:
+            output.write(data)
+            if fsync:
+                output.flush()
+                os.fsync(output.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    if fsync:
+        _fsync_directory(directory)
+
+
+class Checkpoint(object):
+    """JSON file replaced atomically.
+
+    :param path: path of the file.
+    :param fsync: whether to flush the file to disk before replacing the
+     previous one.
+    :type path: str
+    :type fsync: bool
+    """
+
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+
+    def load(self):
+        """Reads the checkpoint.
+
+        :return: the saved state, or None if there is no checkpoint.
+        :rtype: dict
+
+        :raises mention.exceptions.InvalidCheckpointException: if the file
+         can not be decoded.
+        """
+        try:
+            with open(self.path, "rb") as checkpoint:
+                return json.loads(checkpoint.read().decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except ValueError as error:
+            raise InvalidCheckpointException(
+                "{0}: {1}".format(self.path, error))
+
+    def save(self, state):
+        """Replaces the checkpoint with a new state, see
+        :func:`write_atomically`.
+
+        :param state: the state to save, encodable as JSON.
+        :type state: dict
+        """
+        write_atomically(self.path, json.dumps(state, sort_keys=True)
+                         .encode("utf-8"), fsync=self.fsync)
+
+    def remove(self):
+        """Deletes the checkpoint, if any."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class BackfillJob(object):
+    """Fetches every page of a call to a file, with a checkpoint per page.
+
+    :param job_id: name of the job, and of its checkpoint file.
+    :param client: the first page to fetch. It is not modified.
+    :param output: path of the JSON lines file the mentions are written to.
+    :param directory: directory of the checkpoint file.
+    :param transform: function applied to each mention, returning the row to
+     write or None to drop the mention. The mentions are written unchanged
+     if omitted.
+    :param fsync: whether to flush the output and the checkpoints to disk.
+     Without it, a crash of the process is survived but not a crash of the
+     machine.
+    :type job_id: str
+    :type client: :class:`mention.base.FetchAllMentionsAPI`
+    :type output: str
+    :type directory: str
+    :type transform: callable
+    :type fsync: bool
+    """
+
+    def __init__(self, job_id, client, output, directory=".",
+                 transform=None, fsync=True):
+        self.job_id = job_id
+        self.client = client
+        self.output = output
+        self.transform = transform
+        self.fsync = fsync
+        self.checkpoint = Checkpoint(
+            os.path.join(directory, "{0}.checkpoint.json".format(job_id)),
+            fsync=fsync)
+
+    @property
+    def query(self):
+        """Parameters of the call, without the `access_token` and the
+        `cursor`, which identify the mentions of the job.
+
+        :rtype: dict
+        """
+        query = dict(self.client.params)
+        query.pop("access_token", None)
+        query.pop("cursor", None)
+        query["path"] = self.client.route.path
+        return query
+
+    def state(self):
+        """Returns the progress saved by the last run.
+
+        :return: the checkpoint, or None if the job never ran.
+        :rtype: dict
+        """
+        return self.checkpoint.load()
+
+    def _resume(self):
+        """Opens the output at the position of the checkpoint."""
+        state = self.checkpoint.load()
+        if state is None:
+            state = {
+                "version": VERSION,
+                "job_id": self.job_id,
+                "query": self.query,
+                "cursor": self.client.cursor,
+                "pages": 0,
+                "mentions": 0,
+                "rows": 0,
+                "last_id": None,
+                "offset": 0,
+                "complete": False,
+            }
+            try:
+                output = open(self.output, "xb")
+            except FileExistsError:
+                raise InvalidCheckpointException(
+                    "the output of job {0} exists but it has no checkpoint: "
+                    "{1}".format(self.job_id, self.output))
+            self._save(state, output)
+            return state, output
+        if state.get("version") != VERSION or \
+                state.get("job_id") != self.job_id:
+            raise InvalidCheckpointException(
+                "{0} is not a checkpoint of job {1}".format(
+                    self.checkpoint.path, self.job_id))
+        if state["query"] != self.query:
+            raise InvalidCheckpointException(
+                "the checkpoint of job {0} is for another query: {1}".format(
+                    self.job_id, state["query"]))
+        try:
+            output = open(self.output, "r+b")
+        except FileNotFoundError:
+            raise InvalidCheckpointException(
+                "the output of job {0} is missing: {1}".format(
+                    self.job_id, self.output))
+        if os.fstat(output.fileno()).st_size < state["offset"]:
+            output.close()
+            raise InvalidCheckpointException(
+                "the output of job {0} is shorter than its checkpoint".format(
+                    self.job_id))
+        # Drops what was written after the checkpoint.
+        output.truncate(state["offset"])
+        output.seek(state["offset"])
+        return state, output
+
+    def _save(self, state, output):
+        output.flush()
+        if self.fsync:
+            os.fsync(output.fileno())
+        self.checkpoint.save(state)
+
+    def _rows(self, mentions):
+        dumps = json.JSONEncoder(ensure_ascii=False,
+                                 separators=(",", ":")).encode
+        rows = []
+        for mention in mentions:
+            row = mention if self.transform is None else \
+                self.transform(mention)
+            if row is not None:
+                rows.append(dumps(row) + "\n")
+        return rows
+
+    def run(self, deadline=None, max_pages=None):
+        """Fetches the pages from the checkpoint on, or from the first page
+        if there is none.
+
+        A job stopped by its deadline, by `max_pages` or by an error
+        response resumes on the next run; a complete job does nothing.
+
+        :param deadline: budget of this run, as a deadline or in seconds.
+        :param max_pages: maximum number of pages fetched by this run.
+        :type deadline: :class:`mention.deadline.Deadline` or float
+        :type max_pages: int
+
+        :return: the checkpoint after the run.
+        :rtype: dict
+
+        :raises mention.exceptions.InvalidCheckpointException: if the
+         checkpoint does not belong to this job or does not match its
+         output, or if the output exists without a checkpoint.
+        :raises mention.exceptions.InvalidResponseException: if the server
+         answers a page with an error, e.g. a 500 or a 429. The checkpoint
+         stays at that page.
+        """
+        deadline = as_deadline(deadline)
+        state, output = self._resume()
+        pages = 0
+        with output, tracing.span("mention.backfill_job",
+                                  job_id=self.job_id) as current:
+            while not state["complete"] and (max_pages is None or
+                                             pages < max_pages):
+                page_client = copy.copy(self.client)
+                page_client.cursor = state["cursor"]
+                page_client.page = state["pages"]
+                try:
+                    page = page_client.query(deadline=deadline)
+                except RequestTimeoutException:
+                    break
+                mentions = check_response(page, "mentions")["mentions"]
+                rows = self._rows(mentions)
+                output.write("".join(rows).encode("utf-8"))
+                more = page.get("_links", {}).get("more")
+                state["cursor"] = more["params"].get("cursor") if more \
+                    else None
+                state["complete"] = state["cursor"] is None
+                state["pages"] += 1
+                state["mentions"] += len(mentions)
+                state["rows"] += len(rows)
+                if mentions:
+                    state["last_id"] = mentions[-1].get("id")
+                state["offset"] = output.tell()
+                self._save(state, output)
+                pages += 1
+            tracing.set_attributes(current, pages=pages,
+                                   complete=state["complete"])
+        return state
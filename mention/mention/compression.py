@@ -0,0 +1,235 @@
+"""Content coding negotiation, streaming decompression and bandwidth
+accounting.
+
+The transports ask for compressed responses with the codings of
+:func:`accept_encoding` and decompress the raw body chunk by chunk while it
+is read, so a large page is never held compressed and decompressed at the
+same time. gzip and deflate are always available; br and zstd are offered
+when the optional `brotli` (or `brotlicffi`) and `zstandard` packages are
+installed, e.g. with ``pip install mention[compression]``.
+
+The compressed and decompressed sizes of every response are added to
+:data:`stats`, per endpoint and page size:
+
+:Example:
+
+>>> FetchAllMentionsAPI(access_token, account_id, alert_id,
+...                     limit="1000").query()
+>>> compression.stats.snapshot()
+{('FetchAllMentionsAPI', '1000'): {'requests': 1, 'wire_bytes': 118784,
+ 'bytes': 834560, 'seconds': 0.02, 'ratio': 7.03}}
+"""
+import threading
+import zlib
+
+_codecs = None
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        import brotlicffi as brotli
+    return brotli
+
+
+def codecs():
+    """Returns the content codings that can be decompressed, in order of
+    preference.
+
+    :rtype: tuple
+    """
+    global _codecs
+    if _codecs is None:
+        available = []
+        try:
+            import zstandard
+            available.append("zstd")
+        except ImportError:
+            pass
+        try:
+            _brotli()
+            available.append("br")
+        except ImportError:
+            pass
+        _codecs = tuple(available) + ("gzip", "deflate")
+    return _codecs
+
+
+def accept_encoding():
+    """Value of the `Accept-Encoding` header offering every available
+    coding.
+
+    :rtype: str
+    """
+    return ", ".join(codecs())
+
+
+class _Identity(object):
+
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b""
+
+
+class _Deflate(object):
+    """Decompresses deflate bodies, with or without the zlib header."""
+
+    def __init__(self):
+        self._decompressor = None
+
+    def decompress(self, data):
+        if self._decompressor is None:
+            if not data:
+                return b""
+            # Some servers send raw deflate streams without the header.
+            wbits = zlib.MAX_WBITS
+            if data[0] & 0x0F != 8:
+                wbits = -wbits
+            self._decompressor = zlib.decompressobj(wbits)
+        return self._decompressor.decompress(data)
+
+    def flush(self):
+        if self._decompressor is None:
+            return b""
+        return self._decompressor.flush()
+
+
+class _Brotli(object):
+
+    def __init__(self):
+        self._decompressor = _brotli().Decompressor()
+
+    def decompress(self, data):
+        return self._decompressor.process(data)
+
+    def flush(self):
+        return b""
+
+
+def decompressor(encoding):
+    """Returns an incremental decompressor for a content coding.
+
+    :param encoding: value of the `Content-Encoding` header, or None.
+    :type encoding: str
+
+    :return: an object with `decompress(data)` and `flush()` methods.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("identity", ""):
+        return _Identity()
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _Deflate()
+    if encoding == "br":
+        return _Brotli()
+    if encoding == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError("Unsupported content coding {0!r}".format(encoding))
+
+
+class DecodingStream(object):
+    """Decompresses the raw chunks of a body while they are read.
+
+    :param chunks: iterable of raw, possibly compressed, chunks.
+    :param encoding: value of the `Content-Encoding` header, or None.
+    :type chunks: iterable
+    :type encoding: str
+    """
+
+    def __init__(self, chunks, encoding):
+        self.encoding = encoding or "identity"
+        #: Bytes received, before decompression.
+        self.wire_size = 0
+        #: Bytes after decompression.
+        self.size = 0
+        #: Whether the whole body has been read.
+        self.complete = False
+        self._chunks = chunks
+        self._decompressor = decompressor(encoding)
+
+    def __iter__(self):
+        decompress = self._decompressor.decompress
+        for chunk in self._chunks:
+            self.wire_size += len(chunk)
+            data = decompress(chunk)
+            if data:
+                self.size += len(data)
+                yield data
+        data = self._decompressor.flush()
+        if data:
+            self.size += len(data)
+            yield data
+        self.complete = True
+
+
+class BandwidthStats(object):
+    """Compressed and decompressed byte counts, per endpoint and page size.
+
+    The counters can be updated from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, endpoint, response):
+        """Adds a response to the counters of an endpoint.
+
+        Responses that do not report their compressed size, e.g. replayed
+        from a cassette, are not counted.
+
+        :param endpoint: the endpoint instance.
+        :param response: the response, once its body has been read.
+        :type endpoint: :class:`mention.base.Mention`
+        :type response: :class:`requests.Response`
+        """
+        wire_size = getattr(response, "wire_size", None)
+        if wire_size is None:
+            return
+        elapsed = getattr(response, "elapsed", None)
+        key = (type(endpoint).__name__, getattr(endpoint, "limit", None))
+        with self._lock:
+            counters = self._counters.get(key)
+            if counters is None:
+                counters = self._counters[key] = [0, 0, 0, 0.0]
+            counters[0] += 1
+            counters[1] += wire_size
+            counters[2] += response.size
+            if elapsed is not None:
+                counters[3] += elapsed.total_seconds()
+
+    def snapshot(self):
+        """Returns the counters.
+
+        :return: for each `(endpoint, limit)`, the number of requests, the
+         bytes received and decompressed, the time spent waiting for the
+         responses and the compression ratio.
+        :rtype: dict
+        """
+        with self._lock:
+            items = [(key, list(counters))
+                     for key, counters in self._counters.items()]
+        snapshot = {}
+        for key, (requests, wire_bytes, size, seconds) in items:
+            snapshot[key] = {
+                "requests": requests,
+                "wire_bytes": wire_bytes,
+                "bytes": size,
+                "seconds": seconds,
+                "ratio": float(size) / wire_bytes if wire_bytes else None,
+            }
+        return snapshot
+
+    def reset(self):
+        """Clears the counters."""
+        with self._lock:
+            self._counters.clear()
+
+
+#: Process wide bandwidth counters, updated by the endpoints.
+stats = BandwidthStats()
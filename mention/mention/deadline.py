@@ -0,0 +1,109 @@
+"""Time budgets shared by the requests of an operation.
+
+A :class:`Deadline` is created once for a whole operation, such as a
+paginated iteration, and passed to every `query()` it makes. Each request
+then gets the smaller of its own timeouts and the time left, and no request
+is sent once the budget is spent.
+
+:Example:
+
+>>> deadline = Deadline(30)
+>>> page = FetchAllMentionsAPI(access_token, account_id, alert_id).query(
+...     deadline=deadline)
+>>> deadline.remaining()
+29.87
+"""
+import time
+
+from mention.exceptions import DeadlineExceededException
+
+
+class Deadline(object):
+    """A point in time by which an operation must be finished.
+
+    :param seconds: budget of the operation, from now.
+    :param clock: function returning the current time in seconds.
+    :type seconds: float
+    :type clock: callable
+    """
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self.seconds = seconds
+        self._clock = clock
+        self.expires_at = clock() + seconds
+
+    def remaining(self):
+        """Seconds left before the deadline, never negative.
+
+        :rtype: float
+        """
+        return max(0.0, self.expires_at - self._clock())
+
+    @property
+    def expired(self):
+        """Whether the budget has been spent."""
+        return self._clock() >= self.expires_at
+
+    def check(self):
+        """Raises if the budget has been spent.
+
+        :raises DeadlineExceededException: if the deadline has passed.
+        """
+        if self.expired:
+            raise DeadlineExceededException(
+                "Deadline of {0}s exceeded".format(self.seconds))
+
+    def timeout(self, timeout=None):
+        """Clamps the timeouts of a request to the time left.
+
+        :param timeout: timeout in seconds, a `(connect, read)` tuple, or
+         None for no timeout.
+        :type timeout: float or tuple
+
+        :return: the timeouts, none of them longer than the time left.
+        :rtype: float or tuple
+
+        :raises DeadlineExceededException: if the deadline has passed.
+        """
+        self.check()
+        remaining = self.remaining()
+        if timeout is None:
+            return (remaining, remaining)
+        if isinstance(timeout, tuple):
+            return tuple(remaining if value is None else min(value, remaining)
+                         for value in timeout)
+        return min(timeout, remaining)
+
+    async def wait_for(self, awaitable):
+        """Awaits a coroutine, cancelling it when the deadline passes.
+
+        :param awaitable: the coroutine.
+
+        :return: the result of the coroutine.
+
+        :raises DeadlineExceededException: if the deadline passes first.
+        """
+        import asyncio
+
+        self.check()
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceededException(
+                "Deadline of {0}s exceeded".format(self.seconds))
+
+    def __repr__(self):
+        return "Deadline({0:.3f}s left)".format(self.remaining())
+
+
+def as_deadline(deadline):
+    """Returns a deadline given as a :class:`Deadline` or in seconds.
+
+    :param deadline: the deadline, in seconds, or None.
+    :type deadline: :class:`Deadline` or float
+
+    :rtype: :class:`Deadline`
+    """
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
@@ -0,0 +1,358 @@
+"""Compact set of the mention ids already seen.
+
+Overlapping date windows, reconnections of the stream and retries return
+some mentions more than once. A set of the ids as Python strings costs
+around 100 bytes per id and grows without bound over a long run.
+:class:`SeenIds` keeps the ids as 64 bit integers:
+
+* the most recent ids exactly, in sorted :class:`array.array` segments of
+  8 bytes per id, plus a small set of the ids added since the last segment,
+* the older ids in a scalable Bloom filter of a few bits per id, which
+  grows as ids are added while keeping its rate of false positives below a
+  bound.
+
+A mention seen recently is always recognized, and an old one always is; a
+new mention is mistaken for an old one with probability `error_rate`, so
+at worst a few new mentions are dropped, never a duplicate kept.
+
+Numeric ids, those of the Mention API, are stored as their value; other ids
+are hashed to 64 bits.
+
+A :class:`SeenIds` is saved to a binary file that loads with a few reads,
+see :meth:`SeenIds.save` and :meth:`SeenIds.load`.
+
+:Example:
+
+>>> seen = SeenIds.load("seen.bin") if os.path.exists("seen.bin") \\
+...     else SeenIds()
+>>> result = operations.fetch_all_mentions(client, seen=seen)
+>>> for mention in seen.filter(client.query_stream()):
+...     process(mention)
+>>> seen.save("seen.bin")
+"""
+import array
+import bisect
+import hashlib
+import json
+import math
+import struct
+import sys
+import threading
+from collections import deque
+
+from mention.checkpoint import write_atomically
+
+_MASK = (1 << 64) - 1
+_MAGIC = b"MNTSEEN\x00"
+_HEADER = struct.Struct("<8sI")
+_VERSION = 1
+
+
+def _id(mention_id):
+    """Maps a mention id to a 64 bit integer."""
+    if isinstance(mention_id, int) and 0 <= mention_id <= _MASK:
+        return mention_id
+    text = str(mention_id)
+    if text.isdigit() and len(text) < 20:
+        value = int(text)
+        if value <= _MASK:
+            return value
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"),
+                                          digest_size=8).digest(), "little")
+
+
+def _mix(value):
+    # splitmix64 finalizer: spreads the bits of sequential ids.
+    value = (value ^ (value >> 30)) * 0xbf58476d1ce4e5b9 & _MASK
+    value = (value ^ (value >> 27)) * 0x94d049bb133111eb & _MASK
+    return value ^ (value >> 31)
+
+
+class BloomFilter(object):
+    """Bloom filter of 64 bit integers, with double hashing.
+
+    :param capacity: number of values for which the rate of false positives
+     is `error_rate`.
+    :param error_rate: probability that a value not added is found.
+    :type capacity: int
+    :type error_rate: float
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        size = int(math.ceil(-capacity * math.log(error_rate) /
+                             math.log(2) ** 2))
+        #: Number of bits.
+        self.size = max(8, (size + 7) // 8 * 8)
+        #: Number of hash functions.
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray(self.size // 8)
+        #: Number of values added.
+        self.count = 0
+
+    def _positions(self, value):
+        first = _mix(value)
+        second = _mix(first ^ 0x9e3779b97f4a7c15) | 1
+        size = self.size
+        return [(first + i * second) % size for i in range(self.hashes)]
+
+    def __contains__(self, value):
+        bits = self.bits
+        for position in self._positions(value):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, value):
+        """Adds a value.
+
+        :param value: the value.
+        :type value: int
+        """
+        bits = self.bits
+        for position in self._positions(value):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+
+class ScalableBloomFilter(object):
+    """Bloom filter growing with the number of values.
+
+    A new filter is added when the last one is full, with `growth` times its
+    capacity and `ratio` times its rate of false positives, so that the rate
+    of the whole series stays below `error_rate`.
+
+    :param capacity: capacity of the first filter.
+    :param error_rate: bound of the rate of false positives.
+    :param growth: growth of the capacity from a filter to the next.
+    :param ratio: tightening of the rate of false positives from a filter to
+     the next.
+    :type capacity: int
+    :type error_rate: float
+    :type growth: int
+    :type ratio: float
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.001, growth=2,
+                 ratio=0.8):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.ratio = ratio
+        self.filters = []
+
+    def __contains__(self, value):
+        for bloom in reversed(self.filters):
+            if value in bloom:
+                return True
+        return False
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def add(self, value):
+        """Adds a value.
+
+        :param value: the value.
+        :type value: int
+        """
+        if not self.filters or \
+                self.filters[-1].count >= self.filters[-1].capacity:
+            index = len(self.filters)
+            self.filters.append(BloomFilter(
+                self.capacity * self.growth ** index,
+                self.error_rate * (1 - self.ratio) * self.ratio ** index))
+        self.filters[-1].add(value)
+
+    @property
+    def nbytes(self):
+        """Size of the bits of the filters, in bytes."""
+        return sum(len(bloom.bits) for bloom in self.filters)
+
+
+class SeenIds(object):
+    """Set of mention ids, exact for the recent ones.
+
+    :param recent: number of most recent ids kept exactly. Older ids are
+     moved to the Bloom filter, a segment at a time.
+    :param segment: number of ids per sorted segment.
+    :param error_rate: bound of the rate of false positives of the Bloom
+     filter.
+    :param capacity: capacity of the first Bloom filter.
+    :type recent: int
+    :type segment: int
+    :type error_rate: float
+    :type capacity: int
+    """
+
+    def __init__(self, recent=1000000, segment=65536, error_rate=0.001,
+                 capacity=1000000):
+        self.recent = recent
+        self.segment = segment
+        self.bloom = ScalableBloomFilter(capacity, error_rate)
+        self._buffer = set()
+        self._segments = deque()
+        self._lock = threading.Lock()
+        #: Number of ids added.
+        self.count = 0
+
+    def _seen(self, value):
+        if value in self._buffer:
+            return True
+        for ids in self._segments:
+            index = bisect.bisect_left(ids, value)
+            if index < len(ids) and ids[index] == value:
+                return True
+        return value in self.bloom
+
+    def __contains__(self, mention_id):
+        value = _id(mention_id)
+        with self._lock:
+            return self._seen(value)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, mention_id):
+        """Adds an id.
+
+        :param mention_id: the id.
+        :type mention_id: str or int
+
+        :return: whether the id had not been seen.
+        :rtype: bool
+        """
+        value = _id(mention_id)
+        with self._lock:
+            if self._seen(value):
+                return False
+            self._buffer.add(value)
+            self.count += 1
+            if len(self._buffer) >= self.segment:
+                self._seal()
+            return True
+
+    def _seal(self):
+        """Turns the buffer into a segment and moves the oldest segments to
+        the Bloom filter."""
+        self._segments.append(array.array("Q", sorted(self._buffer)))
+        self._buffer = set()
+        while len(self._segments) > 1 and \
+                len(self._segments) * self.segment > self.recent:
+            for value in self._segments.popleft():
+                self.bloom.add(value)
+
+    def filter(self, mentions, key="id"):
+        """Yields the mentions not seen yet, and adds their ids.
+
+        :param mentions: the mentions, e.g. a page or a stream.
+        :param key: name of the id of a mention.
+        :type mentions: iterable
+        :type key: str
+        :rtype: generator
+        """
+        for mention in mentions:
+            if self.add(mention[key]):
+                yield mention
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by the ids, in bytes."""
+        return (sys.getsizeof(self._buffer) + 28 * len(self._buffer) +
+                sum(ids.itemsize * len(ids) for ids in self._segments) +
+                self.bloom.nbytes)
+
+    def to_bytes(self):
+        """Encodes the set, see :meth:`from_bytes`.
+
+        :rtype: bytes
+        """
+        with self._lock:
+            segments = list(self._segments)
+            if self._buffer:
+                segments.append(array.array("Q", sorted(self._buffer)))
+            bloom = self.bloom
+            meta = {
+                "version": _VERSION,
+                "byteorder": sys.byteorder,
+                "recent": self.recent,
+                "segment": self.segment,
+                "count": self.count,
+                "segments": [len(ids) for ids in segments],
+                "bloom": {
+                    "capacity": bloom.capacity,
+                    "error_rate": bloom.error_rate,
+                    "growth": bloom.growth,
+                    "ratio": bloom.ratio,
+                    "filters": [[f.capacity, f.error_rate, f.count]
+                                for f in bloom.filters],
+                },
+            }
+            encoded = json.dumps(meta, sort_keys=True).encode("utf-8")
+            parts = [_HEADER.pack(_MAGIC, len(encoded)), encoded]
+            parts.extend(ids.tobytes() for ids in segments)
+            parts.extend(bytes(f.bits) for f in bloom.filters)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Decodes a set encoded by :meth:`to_bytes`.
+
+        :param data: the encoded set.
+        :type data: bytes
+        :rtype: :class:`SeenIds`
+
+        :raises ValueError: if the data is not an encoded set.
+        """
+        view = memoryview(data)
+        magic, length = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError("not a set of mention ids")
+        offset = _HEADER.size
+        meta = json.loads(bytes(view[offset:offset + length]).decode("utf-8"))
+        if meta["version"] != _VERSION:
+            raise ValueError("unsupported version {0}".format(
+                meta["version"]))
+        offset += length
+        options = meta["bloom"]
+        seen = cls(meta["recent"], meta["segment"], options["error_rate"],
+                   options["capacity"])
+        seen.bloom.growth = options["growth"]
+        seen.bloom.ratio = options["ratio"]
+        seen.count = meta["count"]
+        for size in meta["segments"]:
+            ids = array.array("Q")
+            ids.frombytes(view[offset:offset + size * ids.itemsize])
+            if meta["byteorder"] != sys.byteorder:
+                ids.byteswap()
+            offset += size * ids.itemsize
+            seen._segments.append(ids)
+        for capacity, error_rate, count in options["filters"]:
+            bloom = BloomFilter(capacity, error_rate)
+            bloom.bits = bytearray(view[offset:offset + len(bloom.bits)])
+            bloom.count = count
+            offset += len(bloom.bits)
+            seen.bloom.filters.append(bloom)
+        return seen
+
+    def save(self, path, fsync=True):
+        """Saves the set to a file, replaced atomically.
+
+        :param path: path of the file.
+        :param fsync: whether to flush the file to disk.
+        :type path: str
+        :type fsync: bool
+        """
+        write_atomically(path, self.to_bytes(), fsync=fsync)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a set saved by :meth:`save`.
+
+        :param path: path of the file.
+        :type path: str
+        :rtype: :class:`SeenIds`
+        """
+        with open(path, "rb") as saved:
+            return cls.from_bytes(saved.read())
@@ -0,0 +1,361 @@
+"""Detection of near-duplicate mentions.
+
+Syndicated stories come back as dozens of mentions with the same text, give
+or take a few words. :class:`NearDuplicates` groups them into clusters, the
+first mention of a story being the original of its cluster.
+
+The text of a mention, its title and description, is cut into shingles of
+a few consecutive words. The similarity of two mentions is the Jaccard
+similarity of their shingles, estimated with a MinHash signature of
+`num_perm` values: the fraction of values the two signatures share. The
+signature is computed in a single pass over the shingles, with one
+permutation hashing: each shingle is hashed once, into one of `num_perm`
+bins, and the empty bins are filled from their neighbours.
+
+The signatures are split into `bands`. Two mentions sharing a band are
+candidates, confirmed when their similarity reaches `threshold`, so a new
+mention is compared with a few candidates instead of every mention
+indexed. Mentions are added one at a time, from a stream as well as from
+the local mirror.
+
+:func:`curate_duplicates` trashes or tags the duplicates of a cluster in
+one call.
+
+:Example:
+
+>>> detector = NearDuplicates(threshold=0.7, maxlen=100000)
+>>> for mention in client.query_stream():
+...     if detector.add(mention) is None:
+...         publish(mention)
+>>> for original, ids in detector.clusters(min_size=10).items():
+...     curate_duplicates(access_token, account_id, detector, original,
+...                       trashed=True)
+"""
+import threading
+import zlib
+from array import array
+from collections import defaultdict, deque
+
+from mention import operations
+from mention.keywords import FIELDS, words
+
+_MASK = (1 << 64) - 1
+
+
+# Fibonacci hashing: spreads the 32 bits of a CRC over the high bits, which
+# pick the bin of the signature.
+_GOLDEN = 0x9e3779b97f4a7c15
+
+
+def shingles(mention, size=3, fields=FIELDS):
+    """Returns the shingles of a mention, the runs of `size` consecutive
+    words of each field, as 64 bit hashes. A field shorter than `size` words
+    is a single shingle.
+
+    :param mention: the mention.
+    :param size: number of words per shingle.
+    :param fields: names of the fields.
+    :type mention: dict
+    :type size: int
+    :type fields: tuple
+    :rtype: set
+    """
+    hashes = set()
+    crc32 = zlib.crc32
+    for field in fields:
+        field = words(mention.get(field))
+        if not field:
+            continue
+        hashes.update(
+            crc32(" ".join(field[start:start + size]).encode("utf-8")) *
+            _GOLDEN & _MASK
+            for start in range(max(1, len(field) - size + 1)))
+    return hashes
+
+
+def signature(hashes, num_perm=64):
+    """Computes the MinHash signature of a set of hashes, with one
+    permutation hashing.
+
+    :param hashes: the hashes, see :func:`shingles`.
+    :param num_perm: number of values of the signature.
+    :type hashes: set
+    :type num_perm: int
+    :return: the signature, or None for an empty set.
+    :rtype: :class:`array.array`
+    """
+    if not hashes:
+        return None
+    bins = [None] * num_perm
+    for value in hashes:
+        index = (value * num_perm) >> 64
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    # An empty bin takes the value of the next bin that is not empty. The
+    # values of a bin lie in its own range, so the value only equals a bin
+    # filled from the same bin, at the same distance.
+    if None in bins:
+        filled = []
+        for index in range(num_perm):
+            distance = 0
+            while bins[(index + distance) % num_perm] is None:
+                distance += 1
+            filled.append(bins[(index + distance) % num_perm])
+        bins = filled
+    return array("Q", bins)
+
+
+def similarity(first, second):
+    """Estimates the Jaccard similarity of two signatures.
+
+    :type first: :class:`array.array`
+    :type second: :class:`array.array`
+    :rtype: float
+    """
+    return sum(a == b for a, b in zip(first, second)) / float(len(first))
+
+
+class NearDuplicates(object):
+    """Clusters of near-duplicate mentions, with locality sensitive hashing.
+
+    :param threshold: similarity from which two mentions are duplicates.
+    :param num_perm: number of values of the signatures.
+    :param bands: number of bands of the signatures; with more bands,
+     duplicates are less likely to be missed, and more candidates are
+     compared.
+    :param shingle_size: number of words per shingle.
+    :param fields: names of the fields compared.
+    :param maxlen: number of most recent mentions kept, all if omitted.
+    :type threshold: float
+    :type num_perm: int
+    :type bands: int
+    :type shingle_size: int
+    :type fields: tuple
+    :type maxlen: int
+    """
+
+    def __init__(self, threshold=0.7, num_perm=64, bands=16, shingle_size=3,
+                 fields=FIELDS, maxlen=None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.fields = tuple(fields)
+        self.maxlen = maxlen
+        self._signatures = {}
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+        self._alerts = {}
+        self._originals = {}
+        self._members = {}
+        self._order = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, mention_id):
+        return mention_id in self._signatures
+
+    def signature(self, mention):
+        """Computes the signature of a mention.
+
+        :param mention: the mention.
+        :type mention: dict
+        :return: the signature, or None for a mention without text.
+        :rtype: :class:`array.array`
+        """
+        return signature(shingles(mention, self.shingle_size, self.fields),
+                         self.num_perm)
+
+    def _bands(self, mention_signature):
+        rows = self.rows
+        return [hash(tuple(mention_signature[start:start + rows]))
+                for start in range(0, self.num_perm, rows)]
+
+    def _query(self, mention_signature, keys):
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        found = []
+        for candidate in candidates:
+            score = similarity(mention_signature,
+                               self._signatures[candidate])
+            if score >= self.threshold:
+                found.append((candidate, score))
+        found.sort(key=lambda item: -item[1])
+        return found
+
+    def query(self, mention):
+        """Finds the near-duplicates of a mention, without adding it.
+
+        :param mention: the mention.
+        :type mention: dict
+        :return: `(mention_id, similarity)` pairs, most similar first.
+        :rtype: list
+        """
+        mention_signature = self.signature(mention)
+        if mention_signature is None:
+            return []
+        with self._lock:
+            return [(candidate, score) for candidate, score in
+                    self._query(mention_signature,
+                                self._bands(mention_signature))
+                    if candidate != mention.get("id")]
+
+    def add(self, mention):
+        """Adds a mention, to the cluster of its most similar near-duplicate
+        if any.
+
+        :param mention: the mention.
+        :type mention: dict
+        :return: the ID of the original of its cluster, or None if the
+         mention is not a near-duplicate.
+        :rtype: str
+
+        :raises ValueError: if the mention has no `alert_id`, which its
+         curation needs.
+        """
+        mention_id = mention["id"]
+        alert_id = mention.get("alert_id")
+        if alert_id is None:
+            raise ValueError(
+                "mention {0} has no alert_id".format(mention_id))
+        mention_signature = self.signature(mention)
+        if mention_signature is None:
+            return None
+        keys = self._bands(mention_signature)
+        with self._lock:
+            if mention_id in self._signatures:
+                original = self._originals[mention_id]
+                return None if original == mention_id else original
+            found = self._query(mention_signature, keys)
+            original = self._originals[found[0][0]] if found else mention_id
+            self._signatures[mention_id] = mention_signature
+            self._alerts[mention_id] = alert_id
+            self._originals[mention_id] = original
+            self._members.setdefault(original, []).append(mention_id)
+            for bucket, key in zip(self._buckets, keys):
+                bucket[key].append(mention_id)
+            self._order.append(mention_id)
+            if self.maxlen is not None and len(self._order) > self.maxlen:
+                self._remove(self._order.popleft())
+        return None if original == mention_id else original
+
+    def filter(self, mentions):
+        """Yields the mentions that are not near-duplicates, and adds all of
+        them.
+
+        :param mentions: the mentions, e.g. a page or a stream.
+        :type mentions: iterable
+        :rtype: generator
+        """
+        for mention in mentions:
+            if self.add(mention) is None:
+                yield mention
+
+    def _remove(self, mention_id):
+        mention_signature = self._signatures.pop(mention_id)
+        for bucket, key in zip(self._buckets, self._bands(mention_signature)):
+            bucket[key].remove(mention_id)
+            if not bucket[key]:
+                del bucket[key]
+        del self._alerts[mention_id]
+        original = self._originals.pop(mention_id)
+        members = self._members[original]
+        members.remove(mention_id)
+        if not members:
+            del self._members[original]
+
+    def remove(self, mention_id):
+        """Removes a mention. Its cluster keeps the ID of its original.
+
+        :param mention_id: ID of the mention.
+        :type mention_id: str
+        """
+        with self._lock:
+            self._remove(mention_id)
+            self._order.remove(mention_id)
+
+    def original(self, mention_id):
+        """Returns the ID of the original of the cluster of a mention.
+
+        :param mention_id: ID of the mention.
+        :type mention_id: str
+        :rtype: str
+        """
+        return self._originals[mention_id]
+
+    def cluster(self, mention_id):
+        """Returns the mentions of the cluster of a mention.
+
+        :param mention_id: ID of the mention.
+        :type mention_id: str
+        :return: their IDs, in the order they were added.
+        :rtype: list
+        """
+        with self._lock:
+            return list(self._members[self._originals[mention_id]])
+
+    def clusters(self, min_size=2):
+        """Returns the clusters of at least `min_size` mentions.
+
+        :param min_size: smallest number of mentions of a cluster.
+        :type min_size: int
+        :return: the IDs of the mentions of each cluster, by the ID of its
+         original.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict((original, list(members)) for original, members
+                        in self._members.items() if len(members) >= min_size)
+
+    def duplicates(self, mention_id):
+        """Returns the duplicates of the cluster of a mention, all of its
+        mentions but the original.
+
+        :param mention_id: ID of the mention.
+        :type mention_id: str
+        :return: their IDs by alert ID.
+        :rtype: dict
+        """
+        with self._lock:
+            original = self._originals[mention_id]
+            result = {}
+            for member in self._members[original]:
+                if member != original:
+                    result.setdefault(self._alerts[member], []).append(
+                        member)
+            return result
+
+
+def curate_duplicates(access_token, account_id, detector, mention_id,
+                      deadline=None, workers=8, **fields):
+    """Curates all the duplicates of a cluster at once, e.g. to trash or tag
+    them, see :func:`mention.operations.curate_mentions`. The original of
+    the cluster is left alone.
+
+    :param access_token: Mention API `access_token`.
+    :param account_id: ID of the account.
+    :param detector: the detector the mentions were added to.
+    :param mention_id: ID of a mention of the cluster.
+    :param deadline: budget of the whole operation, as a deadline or in
+     seconds.
+    :param workers: number of requests in flight.
+    :param fields: fields to update, see
+     :class:`mention.base.CurateAMentionAPI`.
+    :type access_token: str
+    :type account_id: str
+    :type detector: :class:`NearDuplicates`
+    :type mention_id: str
+    :type deadline: :class:`mention.deadline.Deadline` or float
+    :type workers: int
+    :return: the responses by mention id, and in `pending` the ids of the
+     duplicates whose update failed or was not confirmed.
+    :rtype: :class:`mention.operations.OperationResult`
+    """
+    return operations.curate_mentions(access_token, account_id, None,
+                                      detector.duplicates(mention_id),
+                                      deadline, workers, **fields)
@@ -1,5 +1,9 @@
 class InvalidResponseException(Exception):
-    pass
+
+    def __init__(self, message, status_code=None):
+        super(InvalidResponseException, self).__init__(message)
+        #: HTTP status of the response, if any.
+        self.status_code = status_code
 
 
 class InvalidEndpointException(Exception):
@@ -8,3 +12,31 @@ class InvalidEndpointException(Exception):
 
 class InvalidURLException(Exception):
     pass
+
+
+class UnrecordedRequestException(Exception):
+    pass
+
+
+class RequestTimeoutException(Exception):
+    pass
+
+
+class DeadlineExceededException(RequestTimeoutException):
+    pass
+
+
+class CircuitOpenException(Exception):
+
+    def __init__(self, message, retry_after=None):
+        super(CircuitOpenException, self).__init__(message)
+        #: Seconds until the circuit lets a probe request through.
+        self.retry_after = retry_after
+
+
+class InvalidCheckpointException(Exception):
+    pass
+
+
+class InvalidQueryException(Exception):
+    pass
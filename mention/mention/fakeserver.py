@@ -0,0 +1,1187 @@
+"""Local stand-in for the Mention API.
+
+The fake server implements the routes used by :mod:`mention.base` on top of
+a seeded synthetic data set, so pipelines can be load tested without
+touching the real API. Latency, server errors and ``429`` rate limiting can
+be injected, and the stream endpoint pushes newly generated mentions as
+newline delimited JSON.
+
+The server is a small HTTP/1.1 implementation on top of :mod:`asyncio`
+with keep-alive and pipelining, running on a background thread. HTTP/2
+clients with prior knowledge (h2c) are served too when the optional `h2`
+package is installed. Mentions
+are serialized once and responses are assembled from the cached bytes, so
+the server can push well over 10k requests per second into the client.
+
+:Example:
+
+>>> from mention import fakeserver
+>>> with fakeserver.FakeMentionServer(seed=1, error_rate=0.01) as server, \\
+...         server.redirect():
+...     account_id = server.data.account_ids[0]
+...     FetchAlertsAPI(access_token, account_id).query()
+"""
+import asyncio
+import base64
+import bisect
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, unquote
+
+_STATUS = {
+    200: "OK",
+    201: "Created",
+    204: "No Content",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+
+_WORDS = (
+    "nasa spacex arianespace ariane discovery mars rocket launch orbit "
+    "satellite mission crew station lunar probe engine booster payload "
+    "nike adidas sneaker release colorway limited drop store online "
+    "market shares growth report quarter revenue profit company chief "
+    "new first latest week today update review video photo story live "
+    "city world team season game fans record history future plan deal "
+    "the a of and to in for on with from after over about at by"
+).split()
+
+_SOURCES = ("web", "twitter", "blogs", "forums", "news", "facebook",
+            "images", "videos")
+_LANGUAGES = ("en", "en", "en", "fr", "de", "es")
+_COUNTRIES = ("US", "GB", "FR", "DE", "ZA", "XX")
+_SITES = ("hypebeast.com", "space.com", "reuters.com", "nytimes.com",
+          "bbc.co.uk", "techcrunch.com", "example.org", "lemonde.fr")
+
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.0+00:00"
+
+#: Bodies smaller than this are not worth compressing.
+_MIN_COMPRESSED_SIZE = 1024
+
+_HTTP2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+
+#: Timezone designator at the end of an ISO 8601 date.
+_OFFSET = re.compile(r"(Z|([+-])(\d\d):?(\d\d))$")
+
+
+def _format_date(moment):
+    return moment.strftime(_DATE_FORMAT)
+
+
+def _parse_date(value):
+    """Parses the date formats accepted by the Mention API, as naive UTC."""
+    value = value.replace(" ", "T")
+    moment = datetime.strptime(value[:16], "%Y-%m-%dT%H:%M")
+    offset = _OFFSET.search(value, 16)
+    if offset and offset.group(2):
+        delta = timedelta(hours=int(offset.group(3)),
+                          minutes=int(offset.group(4)))
+        moment += -delta if offset.group(2) == "+" else delta
+    return moment
+
+
+def _boolean(value):
+    if isinstance(value, str):
+        return value not in ("", "0", "false")
+    return bool(value)
+
+
+def _encode_cursor(mention_id):
+    return base64.urlsafe_b64encode(
+        str(mention_id).encode("ascii")).decode("ascii")
+
+
+def _decode_cursor(cursor):
+    return int(base64.urlsafe_b64decode(cursor.encode("ascii")))
+
+
+class _Alert(object):
+    """Mentions of a single alert, kept in ascending id order."""
+
+    def __init__(self, alert):
+        self.alert = alert
+        self.ids = []
+        self.mentions = {}
+        self._encoded = {}
+        self.children = {}
+
+    def add(self, mention):
+        mention_id = int(mention["id"])
+        self.ids.append(mention_id)
+        self.mentions[mention_id] = mention
+
+    def encoded(self, mention_id):
+        encoded = self._encoded.get(mention_id)
+        if encoded is None:
+            encoded = json.dumps(self.mentions[mention_id]).encode("utf-8")
+            self._encoded[mention_id] = encoded
+        return encoded
+
+    def invalidate(self, mention_id):
+        self._encoded.pop(mention_id, None)
+
+
+class SyntheticData(object):
+    """Seeded synthetic accounts, alerts and mentions.
+
+    The same seed always produces the same data set.
+
+    :param seed: seed of the random generator.
+    :param accounts: number of accounts.
+    :param alerts_per_account: number of alerts per account.
+    :param mentions_per_alert: number of mentions generated per alert.
+    :param duplicate_rate: probability that a mention is a near copy of a
+     recent one, as syndicated news often is.
+    :param start: publication date of the newest generated mention.
+
+    :type seed: int
+    :type accounts: int
+    :type alerts_per_account: int
+    :type mentions_per_alert: int
+    :type duplicate_rate: float
+    :type start: datetime
+    """
+
+    def __init__(self,
+                 seed=0,
+                 accounts=1,
+                 alerts_per_account=3,
+                 mentions_per_alert=2000,
+                 duplicate_rate=0.1,
+                 start=None):
+        self.random = random.Random(seed)
+        self.duplicate_rate = duplicate_rate
+        self.start = start or datetime(2018, 12, 20, 12, 0)
+        self.account_ids = []
+        self.alerts = {}
+        self._accounts = {}
+        self._next_mention_id = 128000000000
+        self._next_alert_id = 1849000
+        self._lock = threading.Lock()
+
+        for _ in range(accounts):
+            account_id = "{0}_{1:x}".format(
+                self.random.randint(100000, 999999),
+                self.random.getrandbits(128))
+            self.account_ids.append(account_id)
+            self._accounts[account_id] = []
+            for _ in range(alerts_per_account):
+                self.create_alert(account_id, {
+                    "name": self._words(2).title(),
+                    "query": {"type": "basic",
+                              "included_keywords": self._words(2).split(),
+                              "required_keywords": [],
+                              "excluded_keywords": []},
+                    "languages": ["en"],
+                })
+
+        total = mentions_per_alert * len(self.alerts)
+        for index in range(total):
+            alert_id = self.random.choice(list(self.alerts))
+            age = timedelta(seconds=(total - index) * 30)
+            self.generate_mention(alert_id, self.start - age)
+
+    def _words(self, count):
+        return " ".join(self.random.choice(_WORDS) for _ in range(count))
+
+    def alert_ids(self, account_id):
+        """Returns the ids of the alerts of an account."""
+        return list(self._accounts.get(account_id, ()))
+
+    def alert(self, account_id, alert_id):
+        """Returns the alert store, or None if it does not exist."""
+        if alert_id not in self._accounts.get(account_id, ()):
+            return None
+        return self.alerts.get(alert_id)
+
+    def create_alert(self, account_id, details):
+        """Creates an alert from the JSON body of a create request."""
+        with self._lock:
+            self._next_alert_id += 1
+            alert_id = str(self._next_alert_id)
+        now = _format_date(self.start)
+        alert = {
+            "id": alert_id,
+            "name": details.get("name", ""),
+            "query": details.get("query", {}),
+            "languages": details.get("languages", []),
+            "countries": details.get("countries", []),
+            "sources": details.get("sources", list(_SOURCES)),
+            "blocked_sites": details.get("blocked_sites", []),
+            "noise_detection": _boolean(details.get("noise_detection")),
+            "reviews_pages": details.get("reviews_pages", []),
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.alerts[alert_id] = _Alert(alert)
+        self._accounts.setdefault(account_id, []).append(alert_id)
+        return alert
+
+    def delete_alert(self, account_id, alert_id):
+        """Deletes an alert and its mentions."""
+        self._accounts[account_id].remove(alert_id)
+        del self.alerts[alert_id]
+
+    def generate_mention(self, alert_id, published_at=None):
+        """Generates a mention, stores it under the alert and returns it."""
+        store = self.alerts[alert_id]
+        with self._lock:
+            self._next_mention_id += self.random.randint(1, 50)
+            mention_id = self._next_mention_id
+
+        published_at = published_at or datetime.utcnow()
+        if store.ids and self.random.random() < self.duplicate_rate:
+            original = store.mentions[store.ids[-self.random.randint(
+                1, min(len(store.ids), 20))]]
+            words = original["description"].split()
+            words[self.random.randrange(len(words))] = self._words(1)
+            title = original["title"]
+            description = " ".join(words)
+        else:
+            title = self._words(self.random.randint(5, 10)).capitalize()
+            description = self._words(self.random.randint(20, 60))
+
+        site = self.random.choice(_SITES)
+        url = "http://{0}/{1}".format(site, mention_id)
+        mention = {
+            "id": str(mention_id),
+            "alert_id": int(alert_id),
+            "title": title,
+            "description": description,
+            "original_url": url,
+            "unique_id": url,
+            "published_at": _format_date(published_at),
+            "created_at": _format_date(published_at),
+            "updated_at": _format_date(published_at),
+            "country": self.random.choice(_COUNTRIES),
+            "favorite": False,
+            "folder": "inbox",
+            "read": False,
+            "tone": self.random.choice((-1, 0, 0, 1)),
+            "source_type": self.random.choice(_SOURCES),
+            "source_name": site,
+            "source_url": "http://" + site,
+            "language_code": self.random.choice(_LANGUAGES),
+            "children": {"children": [],
+                         "total": self.random.choice((0, 0, 0, 1, 2, 3))},
+            "tags": [],
+        }
+        with self._lock:
+            store.add(mention)
+        return mention
+
+    def children(self, store, mention_id):
+        """Returns the (lazily generated) children of a mention."""
+        children = store.children.get(mention_id)
+        if children is None:
+            parent = store.mentions[mention_id]
+            generator = random.Random(mention_id)
+            children = []
+            for index in range(parent["children"]["total"]):
+                child = dict(parent)
+                child["id"] = str(mention_id * 10 + index + 1)
+                child["children"] = {"children": [], "total": 0}
+                child["source_name"] = generator.choice(_SITES)
+                children.append(child)
+            store.children[mention_id] = children
+        return children
+
+
+class _Request(object):
+
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method, path, query, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+
+
+class _Response(object):
+
+    __slots__ = ("status", "body", "headers", "stream")
+
+    def __init__(self, status, body=b"", headers=None, stream=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or ()
+        self.stream = stream
+
+
+def _json(status, payload):
+    return _Response(status, json.dumps(payload).encode("utf-8"))
+
+
+def _error(status, message):
+    return _json(status, {"code": status, "message": message})
+
+
+def _compressor(coding):
+    """Returns a function compressing a body with a content coding, or None
+    if the coding is not supported."""
+    if coding == "gzip":
+        def gzip_(body):
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            return compressor.compress(body) + compressor.flush()
+        return gzip_
+    if coding == "deflate":
+        return lambda body: zlib.compress(body, 6)
+    try:
+        if coding == "br":
+            import brotli
+            return lambda body: brotli.compress(body, quality=4)
+        if coding == "zstd":
+            import zstandard
+            return zstandard.ZstdCompressor(level=3).compress
+    except ImportError:
+        pass
+    return None
+
+
+def _compress(response, accept_encoding):
+    """Compresses the body of a response with the first coding of the
+    `Accept-Encoding` header that is supported, if the body is large enough
+    to benefit from it."""
+    if not accept_encoding or len(response.body) < _MIN_COMPRESSED_SIZE:
+        return
+    for token in accept_encoding.split(","):
+        coding, _, parameters = token.partition(";")
+        coding = coding.strip().lower()
+        if parameters.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        compress = _compressor(coding)
+        if compress is not None:
+            response.body = compress(response.body)
+            response.headers = tuple(response.headers) + (
+                ("Content-Encoding", coding),)
+            return
+
+class MentionAPIApp(object):
+    """Routes requests to the synthetic data set.
+
+    This is the transport independent part of the fake server; it maps a
+    method, path and query string to a response.
+
+    :param data: the synthetic data set.
+    :param access_token: if given, requests must carry this bearer token.
+    :type data: :class:`SyntheticData`
+    :type access_token: str
+    """
+
+    prefix = "/api"
+
+    def __init__(self, data, access_token=None, stream_rate=10.0,
+                 stream_duration=30.0):
+        self.data = data
+        self.access_token = access_token
+        self.stream_rate = stream_rate
+        self.stream_duration = stream_duration
+        self._app_data = json.dumps({
+            "app_languages": {"en": "English", "fr": "French"},
+            "alert_languages": dict((code, code) for code in _LANGUAGES),
+            "alert_countries": dict((code, code) for code in _COUNTRIES),
+            "alert_sources": dict((code, code) for code in _SOURCES),
+            "alert_tones": {"-1": "negative", "0": "neutral",
+                            "1": "positive"},
+        }).encode("utf-8")
+
+    def handle(self, request):
+        """Returns the response to a request.
+
+        :param request: the parsed request.
+        :type request: :class:`_Request`
+        :rtype: :class:`_Response`
+        """
+        if self.access_token is not None:
+            expected = "Bearer " + self.access_token
+            if request.headers.get("authorization") != expected:
+                return _json(401, {
+                    "error": "invalid_grant",
+                    "error_description": "The access token provided is "
+                                         "invalid."})
+
+        if not request.path.startswith(self.prefix):
+            return _error(404, "Not Found")
+        parts = [unquote(part) for part in
+                 request.path[len(self.prefix):].strip("/").split("/")]
+        method = request.method
+
+        if parts == ["app", "data"]:
+            return _Response(200, self._app_data)
+        if len(parts) < 2 or parts[0] != "accounts":
+            return _error(404, "Not Found")
+
+        account_id = parts[1]
+        rest = parts[2:]
+        if rest == ["mentions"] and method == "GET":
+            return self.stream(account_id, request)
+        if not rest or rest[0] != "alerts":
+            return _error(404, "Not Found")
+        if len(rest) == 1:
+            if method == "GET":
+                return self.list_alerts(account_id)
+            if method == "POST":
+                return self.create_alert(account_id, request)
+            return _error(405, "Method Not Allowed")
+
+        store = self.data.alert(account_id, rest[1])
+        if store is None:
+            return _error(404, "Alert not found")
+        if len(rest) == 2:
+            if method == "GET":
+                return _json(200, {"alert": store.alert})
+            if method == "PUT":
+                return self.update_alert(store, request)
+            if method == "DELETE":
+                return self.delete_alert(account_id, rest[1])
+            return _error(405, "Method Not Allowed")
+        if rest[2] != "mentions":
+            return _error(404, "Not Found")
+        if len(rest) == 3 and method == "GET":
+            return self.list_mentions(store, request)
+        if rest[3:] == ["markallread"] and method == "POST":
+            for mention_id in store.ids:
+                store.mentions[mention_id]["read"] = True
+                store.invalidate(mention_id)
+            return _json(200, {"alert": store.alert})
+
+        try:
+            mention_id = int(rest[3])
+        except ValueError:
+            return _error(404, "Not Found")
+        if mention_id not in store.mentions:
+            return _error(404, "Mention not found")
+        if len(rest) == 4:
+            if method == "GET":
+                return _Response(200, b'{"mention":' +
+                                 store.encoded(mention_id) + b'}')
+            if method == "PUT":
+                return self.curate(store, mention_id, request)
+            return _error(405, "Method Not Allowed")
+        if rest[4:] == ["children"] and method == "GET":
+            return self.children(store, mention_id, request)
+        return _error(404, "Not Found")
+
+    def _body(self, request):
+        try:
+            return json.loads(request.body.decode("utf-8") or "{}")
+        except ValueError:
+            return None
+
+    def list_alerts(self, account_id):
+        alerts = [self.data.alerts[alert_id].alert
+                  for alert_id in self.data.alert_ids(account_id)]
+        return _json(200, {"alerts": alerts, "_links": {}})
+
+    def create_alert(self, account_id, request):
+        details = self._body(request)
+        if details is None or not details.get("name"):
+            return _error(400, "Validation Failed")
+        return _json(200, {"alert": self.data.create_alert(account_id,
+                                                           details)})
+
+    def update_alert(self, store, request):
+        details = self._body(request)
+        if details is None:
+            return _error(400, "Validation Failed")
+        for key, value in details.items():
+            if key in store.alert and key != "id":
+                store.alert[key] = value
+        store.alert["updated_at"] = _format_date(datetime.utcnow())
+        return _json(200, {"alert": store.alert})
+
+    def delete_alert(self, account_id, alert_id):
+        self.data.delete_alert(account_id, alert_id)
+        return _Response(204)
+
+    def curate(self, store, mention_id, request):
+        details = self._body(request)
+        if details is None:
+            return _error(400, "Validation Failed")
+        mention = store.mentions[mention_id]
+        for key in ("favorite", "read"):
+            if key in details:
+                mention[key] = _boolean(details[key])
+        if _boolean(details.get("trashed")):
+            mention["folder"] = "trash"
+        if details.get("folder"):
+            mention["folder"] = details["folder"]
+        if "tone" in details:
+            mention["tone"] = int(details["tone"])
+        if "tags" in details:
+            mention["tags"] = list(details["tags"])
+        store.invalidate(mention_id)
+        return _Response(200, b'{"mention":' + store.encoded(mention_id) +
+                         b'}')
+
+    def _limit(self, params):
+        try:
+            return max(1, min(int(params.get("limit") or 20), 1000))
+        except ValueError:
+            return 20
+
+    def _page(self, key, items, links, extra=b""):
+        return _Response(200, b'{"' + key + b'":[' + b",".join(items) +
+                         b'],"_links":' + json.dumps(links).encode("utf-8") +
+                         extra + b'}')
+
+    def _filter(self, store, params):
+        """Returns a predicate for the filter parameters, or None."""
+        checks = []
+        if _boolean(params.get("unread")):
+            checks.append(lambda mention: not mention["read"])
+        if _boolean(params.get("favorite")):
+            checks.append(lambda mention: mention["favorite"])
+        if params.get("folder"):
+            folder = params["folder"]
+            checks.append(lambda mention: mention["folder"] == folder)
+        elif not params.get("since_id"):
+            checks.append(lambda mention: mention["folder"] != "trash")
+        if params.get("source"):
+            source = params["source"]
+            checks.append(lambda mention: mention["source_type"] == source)
+        if params.get("tone"):
+            tone = int(params["tone"])
+            checks.append(lambda mention: mention["tone"] == tone)
+        if params.get("q"):
+            term = params["q"].lower()
+            checks.append(lambda mention: term in mention["title"].lower())
+        if params.get("languages"):
+            languages = set(params["languages"].split(","))
+            checks.append(lambda mention:
+                          mention["language_code"] in languages)
+        for key in ("before_date", "not_before_date"):
+            if params.get(key):
+                bound = _format_date(_parse_date(params[key]))
+                if key == "before_date":
+                    checks.append(lambda mention, bound=bound:
+                                  mention["published_at"] < bound)
+                else:
+                    checks.append(lambda mention, bound=bound:
+                                  mention["published_at"] >= bound)
+        if not checks:
+            return None
+        mentions = store.mentions
+        return lambda mention_id: all(check(mentions[mention_id])
+                                      for check in checks)
+
+    def list_mentions(self, store, request):
+        """Lists mentions, newest first, following the API's pagination.
+
+        With `since_id`, the mentions newer than `since_id` are returned
+        oldest first. Otherwise pages go back in time and `_links.more`
+        carries the `cursor` of the next page.
+        """
+        params = dict(parse_qsl(request.query, keep_blank_values=True))
+        limit = self._limit(params)
+        ids = store.ids
+        try:
+            accept = self._filter(store, params)
+        except ValueError:
+            return _error(400, "Validation Failed")
+        links = {}
+        newest = ids[-1] if ids else 0
+
+        if params.get("since_id"):
+            since_id = int(params["since_id"])
+            start = bisect.bisect_right(ids, since_id)
+            page = []
+            for mention_id in ids[start:]:
+                if accept is None or accept(mention_id):
+                    page.append(mention_id)
+                    if len(page) == limit:
+                        break
+            pull = page[-1] if page else since_id
+            links["pull"] = {"params": {"limit": limit,
+                                        "since_id": str(pull)}}
+        else:
+            end = len(ids)
+            if params.get("cursor"):
+                try:
+                    end = bisect.bisect_left(
+                        ids, _decode_cursor(params["cursor"]))
+                except ValueError:
+                    return _error(400, "Invalid cursor")
+            page = []
+            index = end - 1
+            while index >= 0 and len(page) < limit:
+                if accept is None or accept(ids[index]):
+                    page.append(ids[index])
+                index -= 1
+            if page and index >= 0:
+                more = {"limit": limit, "cursor": _encode_cursor(page[-1])}
+                links["more"] = {"params": more}
+            links["pull"] = {"params": {"limit": limit,
+                                        "since_id": str(newest)}}
+
+        return self._page(b"mentions",
+                          [store.encoded(mention_id) for mention_id in page],
+                          links,
+                          b',"reached_history_limit":false')
+
+    def children(self, store, mention_id, request):
+        params = dict(parse_qsl(request.query, keep_blank_values=True))
+        children = self.data.children(store, mention_id)
+        if params.get("before_date"):
+            try:
+                bound = _format_date(_parse_date(params["before_date"]))
+            except ValueError:
+                return _error(400, "Validation Failed")
+            children = [child for child in children
+                        if child["published_at"] < bound]
+        children = children[:self._limit(params)]
+        return self._page(b"children",
+                          [json.dumps(child).encode("utf-8")
+                           for child in children], {})
+
+    def stream(self, account_id, request):
+        """Streams mentions of the requested alerts as JSON lines.
+
+        Mentions newer than each alert's `since_id[alert]` are replayed
+        first, then new mentions are generated at `stream_rate` per second
+        until `stream_duration` has passed.
+        """
+        params = parse_qsl(request.query, keep_blank_values=True)
+        alerts = [value for key, value in params if key == "alerts[]"]
+        if not alerts:
+            alerts = self.data.alert_ids(account_id)
+        since_ids = {}
+        for key, value in params:
+            if key.startswith("since_id[") and key.endswith("]"):
+                since_ids[key[9:-1]] = int(value)
+
+        stores = []
+        for alert_id in alerts:
+            store = self.data.alert(account_id, alert_id)
+            if store is None:
+                return _error(404, "Alert not found")
+            stores.append((alert_id, store))
+
+        return _Response(200, stream=self._stream_lines(stores, since_ids))
+
+    def _stream_lines(self, stores, since_ids):
+        """Returns a coroutine function that feeds lines to `write`."""
+        data = self.data
+        rate = self.stream_rate
+        duration = self.stream_duration
+
+        async def produce(write):
+            for alert_id, store in stores:
+                if alert_id in since_ids:
+                    start = bisect.bisect_right(store.ids,
+                                                since_ids[alert_id])
+                    for mention_id in store.ids[start:]:
+                        write(store.encoded(mention_id) + b"\n")
+            deadline = time.monotonic() + duration
+            while rate > 0 and time.monotonic() < deadline:
+                await asyncio.sleep(1.0 / rate)
+                alert_id, store = data.random.choice(stores)
+                mention = data.generate_mention(alert_id)
+                write(store.encoded(int(mention["id"])) + b"\n")
+
+        return produce
+
+
+class _HTTPProtocol(asyncio.Protocol):
+    """Minimal HTTP/1.1 server protocol with keep-alive and pipelining."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b""
+        self.pending = deque()
+        self.worker = None
+        self.http2 = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.connections += 1
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if self.worker is not None:
+            self.worker.cancel()
+        if self.http2 is not None:
+            self.http2.close()
+
+    def data_received(self, data):
+        if self.http2 is not None:
+            self.http2.data_received(data)
+            return
+        self.buffer += data
+        if self.buffer.startswith(b"PRI "):
+            # Connection preface of an HTTP/2 client with prior knowledge.
+            if len(self.buffer) < len(_HTTP2_PREFACE):
+                return
+            try:
+                self.http2 = _HTTP2Connection(self.server, self.transport)
+            except ImportError:
+                self.transport.close()
+                return
+            data, self.buffer = self.buffer, b""
+            self.http2.data_received(data)
+            return
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                return
+            head = self.buffer[:end].decode("latin-1").split("\r\n")
+            headers = {}
+            for line in head[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if len(self.buffer) < end + 4 + length:
+                return
+            body = self.buffer[end + 4:end + 4 + length]
+            self.buffer = self.buffer[end + 4 + length:]
+
+            try:
+                method, target, _ = head[0].split(" ", 2)
+            except ValueError:
+                self.transport.close()
+                return
+            path, _, query = target.partition("?")
+            request = _Request(method, path, query, headers, body)
+            if not self.pending and self.server.immediate():
+                response = self.server.dispatch(request)
+                if response.stream is None:
+                    self.respond(response)
+                    continue
+                request = response
+            self.pending.append(request)
+            if self.worker is None:
+                self.worker = asyncio.ensure_future(self.drain())
+
+    async def drain(self):
+        try:
+            while self.pending and self.transport is not None:
+                response = self.pending.popleft()
+                if isinstance(response, _Request):
+                    delay = self.server.latency()
+                    if delay:
+                        await asyncio.sleep(delay)
+                    response = self.server.dispatch(response)
+                if response.stream is not None:
+                    await self.respond_stream(response)
+                else:
+                    self.respond(response)
+        finally:
+            self.worker = None
+
+    def respond(self, response):
+        if self.transport is None:
+            return
+        head = ["HTTP/1.1 {0} {1}".format(response.status,
+                                          _STATUS.get(response.status, "")),
+                "Content-Type: application/json",
+                "Content-Length: {0}".format(len(response.body))]
+        for name, value in response.headers:
+            head.append("{0}: {1}".format(name, value))
+        self.transport.write(("\r\n".join(head) + "\r\n\r\n")
+                             .encode("latin-1") + response.body)
+
+    async def respond_stream(self, response):
+        self.transport.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n")
+
+        def write(line):
+            if self.transport is not None:
+                self.transport.write("{0:x}\r\n".format(len(line))
+                                     .encode("ascii") + line + b"\r\n")
+
+        await response.stream(write)
+        if self.transport is not None:
+            self.transport.write(b"0\r\n\r\n")
+
+
+class _HTTP2Connection(object):
+    """HTTP/2 with prior knowledge (h2c) for a connection of
+    :class:`_HTTPProtocol`, using the optional `h2` package.
+
+    Each stream is dispatched as soon as its request is complete, and the
+    responses are sent as the flow control windows allow, so slow responses
+    do not hold back the others.
+    """
+
+    def __init__(self, server, transport):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+
+        self.server = server
+        self.transport = transport
+        self.connection = H2Connection(H2Configuration(
+            client_side=False, header_encoding="utf-8"))
+        self.requests = {}
+        self.outgoing = {}
+        self.tasks = set()
+        self.connection.initiate_connection()
+        self.flush()
+
+    def close(self):
+        self.transport = None
+        for task in self.tasks:
+            task.cancel()
+
+    def data_received(self, data):
+        from h2 import events
+        from h2.exceptions import ProtocolError
+
+        try:
+            received = self.connection.receive_data(data)
+        except ProtocolError:
+            self.flush()
+            self.transport.close()
+            return
+        for event in received:
+            if isinstance(event, events.RequestReceived):
+                self.requests[event.stream_id] = (dict(event.headers), [])
+            elif isinstance(event, events.DataReceived):
+                self.requests[event.stream_id][1].append(event.data)
+                self.connection.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, events.StreamEnded):
+                self.request_received(event.stream_id)
+            elif isinstance(event, events.StreamReset):
+                self.requests.pop(event.stream_id, None)
+                self.outgoing.pop(event.stream_id, None)
+            elif isinstance(event, events.ConnectionTerminated):
+                self.transport.close()
+                return
+        self.flush()
+
+    def request_received(self, stream_id):
+        headers, body = self.requests.pop(stream_id)
+        path, _, query = headers[":path"].partition("?")
+        request = _Request(headers[":method"], path, query, headers,
+                           b"".join(body))
+        if self.server.immediate():
+            response = self.server.dispatch(request)
+            if response.stream is None:
+                self.respond(stream_id, response)
+                return
+            request = response
+        task = asyncio.ensure_future(self.delayed(stream_id, request))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def delayed(self, stream_id, response):
+        if isinstance(response, _Request):
+            delay = self.server.latency()
+            if delay:
+                await asyncio.sleep(delay)
+            response = self.server.dispatch(response)
+        if response.stream is None:
+            self.respond(stream_id, response)
+            self.flush()
+            return
+
+        self.send_headers(stream_id, 200, ())
+
+        def write(line):
+            self.send(stream_id, line, False)
+            self.flush()
+
+        await response.stream(write)
+        self.send(stream_id, b"", True)
+        self.flush()
+
+    def send_headers(self, stream_id, status, headers, length=None):
+        head = [(":status", str(status)),
+                ("content-type", "application/json")]
+        if length is not None:
+            head.append(("content-length", str(length)))
+        head.extend((name.lower(), value) for name, value in headers)
+        self.connection.send_headers(stream_id, head)
+        self.outgoing[stream_id] = [bytearray(), False]
+
+    def respond(self, stream_id, response):
+        self.send_headers(stream_id, response.status, response.headers,
+                          len(response.body))
+        self.send(stream_id, response.body, True)
+
+    def send(self, stream_id, data, end):
+        pending = self.outgoing.get(stream_id)
+        if pending is not None:
+            pending[0] += data
+            pending[1] = end
+
+    def flush(self):
+        """Sends as much pending data as the flow control windows allow."""
+        from h2.exceptions import StreamClosedError
+
+        for stream_id, pending in list(self.outgoing.items()):
+            data, end = pending
+            try:
+                while data:
+                    size = min(len(data),
+                               self.connection.local_flow_control_window(
+                                   stream_id),
+                               self.connection.max_outbound_frame_size)
+                    if size <= 0:
+                        break
+                    self.connection.send_data(stream_id, bytes(data[:size]))
+                    del data[:size]
+                if end and not data:
+                    self.connection.end_stream(stream_id)
+                    del self.outgoing[stream_id]
+            except StreamClosedError:
+                del self.outgoing[stream_id]
+        if self.transport is not None:
+            self.transport.write(self.connection.data_to_send())
+
+
+class FakeMentionServer(object):
+    """Runs the fake Mention API on a background thread.
+
+    :param data: synthetic data set; a new one is generated from `seed` if
+     omitted.
+    :param seed: seed of the synthetic data and of the fault injection.
+    :param host: interface to listen on.
+    :param port: port to listen on, 0 picks a free port.
+    :param latency: added latency of every response in seconds.
+    :param latency_jitter: random extra latency of up to this many seconds.
+    :param slow_rate: fraction of responses delayed by `slow_latency` more,
+     the tail of a latency distribution.
+    :param slow_latency: extra latency of the slow responses in seconds.
+    :param error_rate: fraction of requests answered with a ``500``.
+    :param throttle_rate: fraction of requests answered with a ``429``.
+    :param retry_after: value of the `Retry-After` header of ``429``
+     responses.
+    :param access_token: if given, requests must carry this bearer token.
+    :param stream_rate: new mentions per second pushed by the stream
+     endpoint.
+    :param stream_duration: seconds after which the stream endpoint closes
+     the connection.
+    :param compression: if True, responses are compressed with the first
+     coding of the `Accept-Encoding` header that the server supports.
+
+    :type data: :class:`SyntheticData`
+    :type seed: int
+    :type host: str
+    :type port: int
+    :type latency: float
+    :type latency_jitter: float
+    :type slow_rate: float
+    :type slow_latency: float
+    :type error_rate: float
+    :type throttle_rate: float
+    :type retry_after: int
+    :type access_token: str
+    :type stream_rate: float
+    :type stream_duration: float
+    :type compression: bool
+    """
+
+    def __init__(self,
+                 data=None,
+                 seed=0,
+                 host="127.0.0.1",
+                 port=0,
+                 latency=0.0,
+                 latency_jitter=0.0,
+                 slow_rate=0.0,
+                 slow_latency=1.0,
+                 error_rate=0.0,
+                 throttle_rate=0.0,
+                 retry_after=1,
+                 access_token=None,
+                 stream_rate=10.0,
+                 stream_duration=30.0,
+                 compression=True):
+        self.data = data if data is not None else SyntheticData(seed=seed)
+        self.app = MentionAPIApp(self.data, access_token, stream_rate,
+                                 stream_duration)
+        self.host = host
+        self.port = port
+        self.latency_base = latency
+        self.latency_jitter = latency_jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.compression = compression
+        self.requests = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        """Url to use as :attr:`mention.base.Mention.base_url`."""
+        return "http://{0}:{1}{2}".format(self.host, self.port,
+                                          self.app.prefix)
+
+    def immediate(self):
+        """Whether responses can be written as soon as a request arrives."""
+        return not (self.latency_base or self.latency_jitter or
+                    self.slow_rate)
+
+    def latency(self):
+        latency = self.latency_base
+        if self.latency_jitter:
+            latency += self._random.random() * self.latency_jitter
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            latency += self.slow_latency
+        return latency
+
+    def dispatch(self, request):
+        """Applies fault injection, then routes the request."""
+        self.requests += 1
+        if self.throttle_rate and self._random.random() < self.throttle_rate:
+            response = _error(429, "Too Many Requests")
+            response.headers = (("Retry-After", str(self.retry_after)),)
+            return response
+        if self.error_rate and self._random.random() < self.error_rate:
+            return _error(500, "Internal Server Error")
+        try:
+            response = self.app.handle(request)
+        except Exception:
+            return _error(500, "Internal Server Error")
+        if self.compression and response.stream is None:
+            _compress(response, request.headers.get("accept-encoding"))
+        return response
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            self._loop.create_server(lambda: _HTTPProtocol(self),
+                                     self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def start(self):
+        """Starts serving on a background thread."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        """Stops the server and waits for its thread to finish."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def redirect(self, endpoint=None):
+        """Points the API calls at the server, see :class:`Redirect`.
+
+        :rtype: :class:`Redirect`
+        """
+        return Redirect(self.base_url, endpoint)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Redirect(object):
+    """Points the API calls at another server, e.g. a
+    :class:`FakeMentionServer`, until it is stopped.
+
+    It is used as a context manager, or with :meth:`start` and :meth:`stop`
+    when the redirection spans several tests.
+
+    :param base_url: url to use as the `base_url` of the calls.
+    :param endpoint: class of the calls redirected,
+     :class:`mention.base.Mention` and so all of them if omitted.
+    :type base_url: str
+    :type endpoint: type
+    """
+
+    def __init__(self, base_url, endpoint=None):
+        self.base_url = base_url
+        self.endpoint = endpoint
+        self._saved = None
+
+    def start(self):
+        """Redirects the calls.
+
+        :return: the redirection.
+        :rtype: :class:`Redirect`
+        """
+        if self.endpoint is None:
+            from mention.base import Mention
+            self.endpoint = Mention
+        # A subclass may inherit its base url rather than define its own.
+        self._saved = self.endpoint.__dict__.get("base_url")
+        self.endpoint.base_url = self.base_url
+        return self
+
+    def stop(self):
+        """Restores the base url of the calls."""
+        if self._saved is None:
+            del self.endpoint.base_url
+        else:
+            self.endpoint.base_url = self._saved
+        self._saved = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs a fake Mention API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mentions-per-alert", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    data = SyntheticData(seed=args.seed,
+                         mentions_per_alert=args.mentions_per_alert)
+    server = FakeMentionServer(data, seed=args.seed, host=args.host,
+                               port=args.port, latency=args.latency,
+                               latency_jitter=args.latency_jitter,
+                               slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency,
+                               error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate)
+    server.start()
+    print("Serving {0} for account {1}".format(server.base_url,
+                                               data.account_ids[0]),
+          flush=True)
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
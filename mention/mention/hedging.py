@@ -0,0 +1,263 @@
+"""Hedged requests, which cut the tail latency of idempotent requests.
+
+A :class:`HedgingTransport` sends a GET through another transport, and if no
+response has arrived after a delay taken from the recent latencies of the
+endpoint, e.g. their 95th percentile, it sends the same request a second
+time. With :class:`mention.transport.RequestsTransport`, the second request
+goes over another pooled connection. The first response wins; the other
+request is cancelled if it has not started, and its response is closed
+otherwise.
+
+Hedges are extra load on the API, so each one takes a token from a
+:class:`mention.ratelimit.TokenBucket`, and none is sent when the bucket is
+empty. Sharing the bucket of a :class:`mention.ratelimit.RateLimitedTransport`
+keeps the hedges within the rate limit of the client. A hedge never waits
+for the rate limit: it takes its tokens upfront, once, and goes around the
+:class:`mention.ratelimit.RateLimitedTransport`. A request that can not be
+hedged, for want of latencies or of tokens, is sent from the calling thread.
+
+:Example:
+
+>>> budget = ratelimit.TokenBucket(rate=10, capacity=20)
+>>> FetchAMentionAPI.transport = hedging.HedgingTransport(
+...     ratelimit.RateLimitedTransport(budget), budget=budget)
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+from mention import routes
+from mention.ratelimit import RateLimitedTransport, TokenBucket
+from mention.transport import Transport, default_transport
+
+
+class _Endpoint(object):
+    """Recent latencies and counters of the requests of an endpoint."""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def percentile(self, percent, min_samples):
+        latencies = sorted(self.latencies)
+        if len(latencies) < min_samples:
+            return None
+        index = int(round(percent / 100.0 * (len(latencies) - 1)))
+        return latencies[index]
+
+
+def _attempts(response, count):
+    """Notes on a response the number of requests sent for it, recorded on
+    the span of the call, see :func:`mention.tracing.record_response`."""
+    response.attempts = count
+    return response
+
+
+def _discard(future):
+    """Closes the response of the request that lost the race."""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class HedgingTransport(Transport):
+    """Sends idempotent requests through another transport, hedging the
+    slow ones.
+
+    :param transport: transport that sends the requests, the default
+     transport if omitted.
+    :param budget: tokens for the hedges, by default 10 per second.
+    :param percentile: percentile of the recent latencies of an endpoint
+     after which a request is hedged.
+    :param min_samples: number of latencies needed before hedging the
+     requests of an endpoint.
+    :param window: number of recent latencies kept per endpoint.
+    :param methods: HTTP methods that are hedged, only idempotent ones.
+    :param max_workers: number of threads sending the requests that may
+     be hedged and their hedges. The others are sent from the calling
+     thread.
+    :type transport: :class:`mention.transport.Transport`
+    :type budget: :class:`mention.ratelimit.TokenBucket`
+    :type percentile: float
+    :type min_samples: int
+    :type window: int
+    :type methods: tuple
+    :type max_workers: int
+    """
+
+    def __init__(self,
+                 transport=None,
+                 budget=None,
+                 percentile=95,
+                 min_samples=20,
+                 window=200,
+                 methods=("GET",),
+                 max_workers=32):
+        self.transport = transport or default_transport()
+        self.budget = budget or TokenBucket(rate=10, capacity=10)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.window = window
+        self.methods = methods
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers)
+
+    def _endpoint(self, method, url):
+        key = routes.endpoint(method, url)
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = _Endpoint(self.window)
+            endpoint.requests += 1
+            delay = endpoint.percentile(self.percentile, self.min_samples)
+        return endpoint, delay
+
+    def _observe(self, endpoint, started):
+        def observe(future):
+            if not future.cancelled() and future.exception() is None:
+                with self._lock:
+                    endpoint.latencies.append(time.perf_counter() - started)
+        return observe
+
+    def _timed(self, endpoint, send):
+        # Timed from the start of the request, not from its submission, so
+        # the time spent waiting for a worker is not taken for latency.
+        started = time.perf_counter()
+        response = send()
+        with self._lock:
+            endpoint.latencies.append(time.perf_counter() - started)
+        return response
+
+    def _hedge_path(self):
+        """The transport of the hedges, and the buckets they take a token
+        from."""
+        transport = self.transport
+        buckets = [self.budget]
+        if isinstance(transport, RateLimitedTransport):
+            # The hedge takes its token of the rate limit upfront, rather
+            # than wait for it in a worker, and a single token if the rate
+            # limit is the budget.
+            if transport.bucket is not self.budget:
+                buckets.append(transport.bucket)
+            transport = transport.transport
+        return transport, buckets
+
+    def _can_hedge(self):
+        return all(bucket.tokens >= 1 for bucket in self._hedge_path()[1])
+
+    def _hedge(self, endpoint):
+        """Takes the tokens of a hedge, without waiting.
+
+        :return: the transport sending the hedge, None if it is not sent.
+        """
+        transport, buckets = self._hedge_path()
+        taken = []
+        for bucket in buckets:
+            if not bucket.try_acquire():
+                for other in taken:
+                    other.release()
+                return None
+            taken.append(bucket)
+        with self._lock:
+            endpoint.hedged += 1
+        return transport
+
+    def _won(self, endpoint):
+        with self._lock:
+            endpoint.hedge_wins += 1
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        send = partial(self.transport.request, method, url, access_token,
+                       data, stream=stream, timeout=timeout)
+        if method not in self.methods:
+            return send()
+        endpoint, delay = self._endpoint(method, url)
+        if delay is None or not self._can_hedge():
+            # Nothing to race with: the request is sent from the calling
+            # thread.
+            return _attempts(self._timed(endpoint, send), 1)
+        primary = self._pool.submit(self._timed, endpoint, send)
+        if wait([primary], timeout=delay).done:
+            return _attempts(primary.result(), 1)
+        transport = self._hedge(endpoint)
+        if transport is None:
+            return _attempts(primary.result(), 1)
+
+        hedge = self._pool.submit(transport.request, method, url,
+                                  access_token, data, stream=stream,
+                                  timeout=timeout)
+        done, pending = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner = primary if primary in done else hedge
+        if winner.exception() is not None and pending:
+            # The other request may still succeed.
+            winner = pending.pop()
+            wait([winner])
+        loser = hedge if winner is primary else primary
+        loser.cancel()
+        loser.add_done_callback(_discard)
+        if winner is hedge and winner.exception() is None:
+            self._won(endpoint)
+        return _attempts(winner.result(), 2)
+
+    async def arequest(self, method, url, access_token, data=None,
+                       timeout=None):
+        import asyncio
+
+        send = partial(self.transport.arequest, method, url, access_token,
+                       data, timeout=timeout)
+        if method not in self.methods:
+            return await send()
+        endpoint, delay = self._endpoint(method, url)
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(send())
+        primary.add_done_callback(self._observe(endpoint, started))
+        try:
+            if delay is not None:
+                await asyncio.wait([primary], timeout=delay)
+            if primary.done() or delay is None:
+                return _attempts(await primary, 1)
+            transport = self._hedge(endpoint)
+            if transport is None:
+                return _attempts(await primary, 1)
+
+            hedge = asyncio.ensure_future(transport.arequest(
+                method, url, access_token, data, timeout=timeout))
+            try:
+                done, pending = await asyncio.wait(
+                    [primary, hedge], return_when=asyncio.FIRST_COMPLETED)
+                winner = primary if primary in done else hedge
+                if winner.exception() is not None and pending:
+                    winner = pending.pop()
+                    await asyncio.wait([winner])
+            finally:
+                hedge.cancel()
+            if winner is hedge and winner.exception() is None:
+                self._won(endpoint)
+            return _attempts(winner.result(), 2)
+        finally:
+            primary.cancel()
+
+    def snapshot(self):
+        """Returns the counters of every endpoint.
+
+        :return: for each `(host, method, path template)`, the number of
+         requests, of hedges sent and of hedges that answered first, and the
+         current hedging delay in seconds.
+        :rtype: dict
+        """
+        with self._lock:
+            return dict((key, {
+                "requests": endpoint.requests,
+                "hedged": endpoint.hedged,
+                "hedge_wins": endpoint.hedge_wins,
+                "delay": endpoint.percentile(self.percentile,
+                                             self.min_samples),
+            }) for key, endpoint in self._endpoints.items())
+
+    def close(self):
+        self._pool.shutdown(wait=False)
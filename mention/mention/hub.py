@@ -0,0 +1,351 @@
+"""Fan-out of a feed of mentions to many consumers.
+
+A :class:`Hub` takes the mentions of a single source, e.g. a streamed call
+or a :class:`mention.scheduler.PollingScheduler`, and delivers each of them
+to every :class:`Subscription`, so the API is queried once however many
+consumers there are.
+
+Each subscription has a bounded queue and its own policy for when its
+consumer falls behind and the queue is full:
+
+* :data:`BLOCK`: the hub waits for room, slowing down the source and so
+  every subscription,
+* :data:`DROP_OLDEST`: the oldest mention of the queue is dropped,
+* :data:`SPILL`: the mentions are written to a :mod:`mention.journal` on
+  disk and read back in order once the consumer has caught up.
+
+:meth:`Hub.stats` reports for every subscription the mentions delivered,
+dropped and spilled, the mentions waiting and the lag of the consumer.
+
+:Example:
+
+>>> hub = Hub()
+>>> alerts = hub.subscribe("alerting", maxsize=100, overflow=DROP_OLDEST)
+>>> archive = hub.subscribe("archive", overflow=SPILL,
+...                         spill_directory="/var/spool/mentions")
+>>> hub.start(client.query_stream())
+>>> for mention in alerts:
+...     notify(mention)
+"""
+import json
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+
+from mention.journal import JournalReader, JournalWriter
+
+#: The hub waits for room in the queue.
+BLOCK = "block"
+#: The oldest mention of the queue is dropped.
+DROP_OLDEST = "drop_oldest"
+#: The mentions are written to disk until the queue has room.
+SPILL = "spill"
+
+_POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+
+class _Spill(object):
+    """Mentions written to a journal, read back in order."""
+
+    def __init__(self, directory):
+        self.directory = tempfile.mkdtemp(prefix="spill-", dir=directory)
+        self.writer = JournalWriter(self.directory, fsync_every=1 << 30,
+                                    fsync_interval=float("inf"))
+        self.reader = None
+        self.read = 0
+
+    def __len__(self):
+        return self.writer.next_seq - self.read
+
+    def append(self, entry):
+        self.writer.append_bytes(json.dumps(entry).encode("utf-8"))
+
+    def take(self, count):
+        """Reads the next entries back."""
+        self.writer.flush(fsync=False)
+        if self.reader is None:
+            self.reader = JournalReader(self.directory)
+        else:
+            self.reader.refresh()
+        entries = [json.loads(bytes(record)) for _, record in
+                   self.reader.records(self.read, self.read + count)]
+        self.read += len(entries)
+        return entries
+
+    def close(self):
+        self.writer.close()
+        if self.reader is not None:
+            self.reader.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Subscription(object):
+    """Queue of the mentions of a hub for one consumer.
+
+    Iterating over a subscription yields its mentions until the hub is
+    closed and the queue is empty.
+
+    :param hub: the hub.
+    :param name: name of the consumer.
+    :param maxsize: number of mentions the queue holds in memory.
+    :param overflow: what to do when the queue is full, :data:`BLOCK`,
+     :data:`DROP_OLDEST` or :data:`SPILL`.
+    :param spill_directory: directory of the spill files, the temporary
+     directory if omitted.
+    :type hub: :class:`Hub`
+    :type name: str
+    :type maxsize: int
+    :type overflow: str
+    :type spill_directory: str
+    """
+
+    def __init__(self, hub, name, maxsize=1000, overflow=BLOCK,
+                 spill_directory=None):
+        if overflow not in _POLICIES:
+            raise ValueError("overflow must be one of {0}".format(
+                ", ".join(_POLICIES)))
+        self.hub = hub
+        self.name = name
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.spill_directory = spill_directory
+        self._queue = deque()
+        self._spill = None
+        self._condition = threading.Condition()
+        self._closed = False
+        #: Number of mentions published to the subscription.
+        self.published = 0
+        #: Number of mentions handed to the consumer.
+        self.delivered = 0
+        #: Number of mentions dropped.
+        self.dropped = 0
+        #: Number of mentions written to disk.
+        self.spilled = 0
+        #: Number of times the hub waited for room.
+        self.blocked = 0
+
+    def _put(self, mention, now):
+        with self._condition:
+            if self._closed:
+                return
+            entry = (self.published, now, mention)
+            self.published += 1
+            if self._spill is not None and len(self._spill):
+                # Once spilling, the mentions go after the spilled ones.
+                self._spill.append(entry)
+                self.spilled += 1
+            elif len(self._queue) < self.maxsize:
+                self._queue.append(entry)
+            elif self.overflow == DROP_OLDEST:
+                self._queue.popleft()
+                self._queue.append(entry)
+                self.dropped += 1
+            elif self.overflow == SPILL:
+                if self._spill is None:
+                    self._spill = _Spill(self.spill_directory)
+                self._spill.append(entry)
+                self.spilled += 1
+            else:
+                self.blocked += 1
+                while len(self._queue) >= self.maxsize and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                self._queue.append(entry)
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """Returns the next mention.
+
+        :param timeout: seconds to wait for a mention, forever if omitted.
+        :type timeout: float
+        :rtype: dict
+
+        :raises queue.Empty: if there is no mention within the timeout, or
+         the hub is closed and the queue is empty.
+        """
+        with self._condition:
+            if not self._queue and self._spill is not None:
+                self._queue.extend(tuple(entry) for entry in
+                                   self._spill.take(self.maxsize))
+                if not len(self._spill):
+                    self._spill.close()
+                    self._spill = None
+            if not self._condition.wait_for(
+                    lambda: self._queue or self._closed, timeout):
+                raise queue.Empty()
+            if not self._queue:
+                raise queue.Empty()
+            _, _, mention = self._queue.popleft()
+            self.delivered += 1
+            self._condition.notify_all()
+            return mention
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.get()
+            except queue.Empty:
+                return
+
+    def stats(self):
+        """Returns the counters of the subscription.
+
+        :return: the mentions published, delivered, dropped and spilled,
+         the times the hub blocked, the mentions waiting in memory and on
+         disk, the lag, i.e. the number of mentions published but not
+         delivered nor dropped, and the age in seconds of the oldest
+         mention waiting in memory.
+        :rtype: dict
+        """
+        with self._condition:
+            spilled = len(self._spill) if self._spill is not None else 0
+            age = self.hub._clock() - self._queue[0][1] if self._queue \
+                else 0.0
+            return {
+                "overflow": self.overflow,
+                "published": self.published,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "blocked": self.blocked,
+                "queued": len(self._queue),
+                "on_disk": spilled,
+                "lag": self.published - self.delivered - self.dropped,
+                "age": age,
+            }
+
+    def close(self):
+        """Stops the subscription and deletes its spill files; the mentions
+        in memory can still be read."""
+        self.hub.unsubscribe(self)
+        with self._condition:
+            self._end()
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+    def _end(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Hub(object):
+    """Delivers the mentions of a source to subscriptions.
+
+    :param clock: function returning the current time in seconds.
+    :type clock: callable
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        #: Number of mentions published.
+        self.published = 0
+        #: Exception that stopped the source, if any.
+        self.error = None
+
+    def subscribe(self, name, maxsize=1000, overflow=BLOCK,
+                  spill_directory=None):
+        """Adds a consumer, who receives the mentions published from now
+        on, see :class:`Subscription`.
+
+        :rtype: :class:`Subscription`
+        """
+        subscription = Subscription(self, name, maxsize, overflow,
+                                    spill_directory)
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Removes a consumer.
+
+        :param subscription: its subscription.
+        :type subscription: :class:`Subscription`
+        """
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions
+                                   if s is not subscription]
+
+    def publish(self, mention):
+        """Delivers a mention to every subscription.
+
+        :param mention: the mention.
+        :type mention: dict
+        """
+        now = self._clock()
+        with self._lock:
+            self.published += 1
+            subscriptions = self._subscriptions
+        for subscription in subscriptions:
+            subscription._put(mention, now)
+
+    def on_mentions(self, target, mentions):
+        """Publishes the mentions of a poll, to use as the `on_mentions` of
+        a :class:`mention.scheduler.PollingScheduler`."""
+        for mention in mentions:
+            self.publish(mention)
+
+    def run(self, source):
+        """Publishes the mentions of a source until it is exhausted or
+        :meth:`stop` is called, then closes the hub.
+
+        :param source: iterable of mentions, e.g. a streamed call.
+        :type source: iterable
+        """
+        try:
+            for mention in source:
+                self.publish(mention)
+                if self._stopped.is_set():
+                    break
+        except Exception as error:
+            self.error = error
+        finally:
+            self.close()
+
+    def start(self, source):
+        """Runs :meth:`run` on a background thread.
+
+        :return: the hub.
+        :rtype: :class:`Hub`
+        """
+        self._thread = threading.Thread(target=self.run, args=(source,),
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops a hub started with :meth:`start` after the next mention of
+        its source, and waits for it.
+
+        The subscriptions are ended first, so a publication waiting for room
+        in the queue of a consumer that has gone away returns.
+        """
+        self._stopped.set()
+        self.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Ends every subscription: their consumers read the mentions left
+        in the queues, then stop."""
+        for subscription in self._subscriptions:
+            subscription._end()
+
+    def stats(self):
+        """Returns the counters of every subscription, by name, see
+        :meth:`Subscription.stats`.
+
+        :rtype: dict
+        """
+        return dict((subscription.name, subscription.stats())
+                    for subscription in self._subscriptions)
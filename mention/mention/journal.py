@@ -0,0 +1,480 @@
+"""Append-only log of mentions, shared by reader processes.
+
+A journal is a directory of segments. Each segment holds the records
+appended from a base sequence number on, in four files named after it:
+
+* ``.log``: the records, each a header (length, CRC32 and id of the
+  mention) followed by the JSON of the mention,
+* ``.idx``: the offset of each record in the ``.log``, 8 bytes each, so the
+  record of a sequence number is found in one read,
+* ``.ids``: the id of each record, 8 bytes each,
+* ``.ididx``: once the segment is full and sealed, the `(id, sequence)`
+  pairs sorted by id, searched by bisection to find a mention by id.
+
+A :class:`JournalWriter` appends the records in batches: they are written
+and made durable with one `fsync` every `fsync_every` records or
+`fsync_interval` seconds, and when the segment is full. A record is written
+before its offset, so readers never see a partial record, and a writer
+reopening a journal after a crash drops what follows the last complete
+record.
+
+:class:`JournalReader`, in any process, memory maps the files and returns
+records as :class:`memoryview` slices of the maps, without copying them:
+by sequence number, by range of sequence numbers or by mention id.
+
+Ids are mapped to 64 bit integers as in :mod:`mention.dedupe`; the arrays
+are in the byte order of the machine.
+
+:Example:
+
+>>> with JournalWriter("mentions") as journal:
+...     for mention in fetch_all_mentions(client).items:
+...         journal.append(mention)
+>>> reader = JournalReader("mentions")
+>>> json.loads(bytes(reader.get(reader.lookup("1243658271"))))
+{'id': '1243658271', 'title': ...}
+>>> for seq, record in reader.records(1000, 2000):
+...     process(record)
+"""
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from mention.checkpoint import write_atomically
+from mention.dedupe import _id
+
+#: Size from which a segment is sealed and a new one started, in bytes.
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+#: Length of the record, CRC32 of the record and id of the mention.
+_HEADER = struct.Struct("=IIQ")
+_WORD = 8
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _path(directory, base, extension):
+    return os.path.join(directory, "{0:020d}{1}".format(base, extension))
+
+
+def _bases(directory):
+    """Returns the base sequence numbers of the segments, in order."""
+    bases = []
+    for name in os.listdir(directory):
+        stem, extension = os.path.splitext(name)
+        if extension == ".log" and stem.isdigit():
+            bases.append(int(stem))
+    return sorted(bases)
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _words(path, count):
+    """Reads the first 64 bit words of a file."""
+    words = array.array("Q")
+    with open(path, "rb") as data:
+        words.frombytes(data.read(count * _WORD))
+    return words
+
+
+class JournalWriter(object):
+    """Appends mentions to a journal.
+
+    There must be a single writer per journal.
+
+    :param directory: directory of the journal, created if needed.
+    :param segment_bytes: size from which a segment is sealed.
+    :param fsync_every: number of records appended between two flushes.
+    :param fsync_interval: seconds between two flushes, checked when a
+     record is appended.
+    :param clock: function returning the current time in seconds.
+    :type directory: str
+    :type segment_bytes: int
+    :type fsync_every: int
+    :type fsync_interval: float
+    :type clock: callable
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES,
+                 fsync_every=1000, fsync_interval=1.0, clock=time.monotonic):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = bytearray()
+        self._offsets = array.array("Q")
+        self._ids = array.array("Q")
+        self._synced_at = clock()
+        os.makedirs(directory, exist_ok=True)
+        bases = _bases(directory)
+        if not bases:
+            self._open(0)
+        elif os.path.exists(_path(directory, bases[-1], ".ididx")):
+            self._open(bases[-1] +
+                       _size(_path(directory, bases[-1], ".idx")) // _WORD)
+        else:
+            self._recover(bases[-1])
+            self._open(bases[-1])
+
+    def _recover(self, base):
+        """Drops what follows the last complete record of a segment."""
+        log = _path(self.directory, base, ".log")
+        count = min(_size(_path(self.directory, base, ".idx")),
+                    _size(_path(self.directory, base, ".ids"))) // _WORD
+        offsets = _words(_path(self.directory, base, ".idx"), count)
+        end = 0
+        with open(log, "rb") as records:
+            while count:
+                records.seek(offsets[count - 1])
+                header = records.read(_HEADER.size)
+                if len(header) == _HEADER.size:
+                    length, crc, _ = _HEADER.unpack(header)
+                    if zlib.crc32(records.read(length)) == crc:
+                        end = offsets[count - 1] + _HEADER.size + length
+                        break
+                count -= 1
+        for extension, size in ((".log", end), (".idx", count * _WORD),
+                                (".ids", count * _WORD)):
+            with open(_path(self.directory, base, extension), "ab") as data:
+                data.truncate(size)
+
+    def _open(self, base):
+        self._base = base
+        self._log = open(_path(self.directory, base, ".log"), "ab")
+        self._idx = open(_path(self.directory, base, ".idx"), "ab")
+        self._ids_file = open(_path(self.directory, base, ".ids"), "ab")
+        self._position = self._log.tell()
+        self._count = self._idx.tell() // _WORD
+
+    @property
+    def next_seq(self):
+        """Sequence number of the next record."""
+        return self._base + self._count + len(self._offsets)
+
+    def append(self, mention):
+        """Appends a mention.
+
+        :param mention: the mention, with its `id`.
+        :type mention: dict
+
+        :return: the sequence number of the record.
+        :rtype: int
+        """
+        return self.append_bytes(_dumps(mention).encode("utf-8"),
+                                 mention.get("id"))
+
+    def append_bytes(self, record, mention_id=None):
+        """Appends an encoded record.
+
+        :param record: the record, e.g. the JSON of a mention.
+        :param mention_id: id of the mention, to find the record by id.
+        :type record: bytes
+        :type mention_id: str
+
+        :return: the sequence number of the record.
+        :rtype: int
+        """
+        value = 0 if mention_id is None else _id(mention_id)
+        with self._lock:
+            seq = self.next_seq
+            self._offsets.append(self._position + len(self._data))
+            self._ids.append(value)
+            self._data += _HEADER.pack(len(record), zlib.crc32(record), value)
+            self._data += record
+            if len(self._offsets) >= self.fsync_every or \
+                    self._position + len(self._data) >= \
+                    self.segment_bytes or \
+                    self._clock() - self._synced_at >= self.fsync_interval:
+                self._flush(True)
+        return seq
+
+    def flush(self, fsync=True):
+        """Writes the records appended so far, making them visible to the
+        readers.
+
+        :param fsync: whether to also make them durable.
+        :type fsync: bool
+        """
+        with self._lock:
+            self._flush(fsync)
+
+    def _flush(self, fsync):
+        if self._offsets:
+            # The records are written before their offsets.
+            self._log.write(self._data)
+            self._log.flush()
+            if fsync:
+                os.fsync(self._log.fileno())
+            self._ids_file.write(self._ids.tobytes())
+            self._ids_file.flush()
+            self._idx.write(self._offsets.tobytes())
+            self._idx.flush()
+            self._position += len(self._data)
+            self._count += len(self._offsets)
+            self._data = bytearray()
+            self._offsets = array.array("Q")
+            self._ids = array.array("Q")
+        if fsync:
+            os.fsync(self._ids_file.fileno())
+            os.fsync(self._idx.fileno())
+            self._synced_at = self._clock()
+        if self._position >= self.segment_bytes:
+            self._seal()
+            self._open(self._base + self._count)
+
+    def _seal(self):
+        """Writes the id index of the segment and closes its files."""
+        for data in (self._log, self._idx, self._ids_file):
+            data.close()
+        ids = _words(_path(self.directory, self._base, ".ids"), self._count)
+        pairs = array.array("Q")
+        for value, seq in sorted(zip(ids, range(self._base,
+                                                self._base + self._count))):
+            pairs.append(value)
+            pairs.append(seq)
+        write_atomically(_path(self.directory, self._base, ".ididx"),
+                         pairs.tobytes())
+
+    def close(self):
+        """Flushes the records and closes the journal."""
+        with self._lock:
+            self._flush(True)
+            for data in (self._log, self._idx, self._ids_file):
+                data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map(path, size):
+    if size <= 0:
+        return None
+    with open(path, "rb") as data:
+        return mmap.mmap(data.fileno(), size, access=mmap.ACCESS_READ)
+
+
+class _Segment(object):
+    """Memory maps of the files of a segment."""
+
+    def __init__(self, directory, base):
+        self.directory = directory
+        self.base = base
+        self.count = 0
+        self.sealed = False
+        self.log = self.offsets = self.index = None
+        self.ids = {}
+        self._maps = []
+
+    def refresh(self):
+        """Maps the records written since the last refresh."""
+        if self.sealed:
+            return
+        path = _path(self.directory, self.base, ".ididx")
+        sealed = os.path.exists(path)
+        count = min(_size(_path(self.directory, self.base, ".idx")),
+                    _size(_path(self.directory, self.base, ".ids"))) // _WORD
+        if count == self.count and not sealed:
+            return
+        self.close()
+        # The offsets are read before the records they point to.
+        offsets = _map(_path(self.directory, self.base, ".idx"),
+                       count * _WORD)
+        log = _map(_path(self.directory, self.base, ".log"),
+                   _size(_path(self.directory, self.base, ".log")))
+        self._maps = [offsets, log]
+        self.offsets = memoryview(offsets).cast("Q") if count else None
+        self.log = log
+        if sealed:
+            index = _map(path, _size(path))
+            self._maps.append(index)
+            self.index = memoryview(index).cast("Q") if count else None
+            self.ids = {}
+            self.sealed = True
+        else:
+            ids = _map(_path(self.directory, self.base, ".ids"),
+                       count * _WORD)
+            if count:
+                values = memoryview(ids).cast("Q")
+                for position in range(self.count, count):
+                    self.ids[values[position]] = self.base + position
+                values.release()
+            ids.close()
+        self.count = count
+
+    def lookup(self, value):
+        """Returns the sequence number of the last record of an id."""
+        if not self.sealed:
+            return self.ids.get(value)
+        if self.index is None:
+            return None
+        index = self.index
+        low, high = 0, len(index) // 2
+        while low < high:
+            middle = (low + high) // 2
+            if index[2 * middle] <= value:
+                low = middle + 1
+            else:
+                high = middle
+        if low and index[2 * (low - 1)] == value:
+            return index[2 * (low - 1) + 1]
+        return None
+
+    def close(self):
+        for view in (self.offsets, self.index):
+            if view is not None:
+                view.release()
+        self.offsets = self.index = None
+        for data in self._maps:
+            if data is not None:
+                try:
+                    data.close()
+                except BufferError:
+                    # Records are still referenced; the map is freed with
+                    # them.
+                    pass
+
+
+class JournalReader(object):
+    """Reads the records of a journal, without copying them.
+
+    The reader sees the records flushed when it was opened or last
+    refreshed, see :meth:`refresh`. The records it returns are
+    :class:`memoryview` slices of memory maps, valid until :meth:`close`.
+
+    :param directory: directory of the journal.
+    :type directory: str
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._segments = []
+        self._bases = []
+        self.refresh()
+
+    def refresh(self):
+        """Maps the records and segments written since the last refresh.
+
+        :return: the number of records.
+        :rtype: int
+        """
+        for base in _bases(self.directory):
+            if not self._bases or base > self._bases[-1]:
+                self._segments.append(_Segment(self.directory, base))
+                self._bases.append(base)
+        for segment in self._segments:
+            segment.refresh()
+        return len(self)
+
+    def __len__(self):
+        if not self._segments:
+            return 0
+        return self._segments[-1].base + self._segments[-1].count
+
+    @property
+    def first_seq(self):
+        """Sequence number of the oldest record."""
+        return self._bases[0] if self._bases else 0
+
+    def _segment(self, seq):
+        index = bisect.bisect_right(self._bases, seq) - 1
+        if index < 0 or seq - self._bases[index] >= \
+                self._segments[index].count:
+            raise IndexError("no record {0}".format(seq))
+        return self._segments[index]
+
+    def get(self, seq, verify=False):
+        """Returns a record.
+
+        :param seq: sequence number of the record.
+        :param verify: whether to check the CRC32 of the record.
+        :type seq: int
+        :type verify: bool
+        :rtype: :class:`memoryview`
+
+        :raises IndexError: if there is no such record.
+        :raises ValueError: if the record is corrupt.
+        """
+        segment = self._segment(seq)
+        offset = segment.offsets[seq - segment.base]
+        length, crc, _ = _HEADER.unpack_from(segment.log, offset)
+        start = offset + _HEADER.size
+        record = memoryview(segment.log)[start:start + length]
+        if verify and zlib.crc32(record) != crc:
+            raise ValueError("record {0} is corrupt".format(seq))
+        return record
+
+    def records(self, start=None, stop=None):
+        """Yields the records of a range of sequence numbers.
+
+        :param start: first sequence number, the oldest if omitted.
+        :param stop: sequence number after the last, the end if omitted.
+        :type start: int
+        :type stop: int
+        :return: `(seq, record)` pairs.
+        :rtype: generator
+        """
+        seq = self.first_seq if start is None else max(start, self.first_seq)
+        stop = len(self) if stop is None else min(stop, len(self))
+        while seq < stop:
+            yield seq, self.get(seq)
+            seq += 1
+
+    def lookup(self, mention_id):
+        """Returns the sequence number of the last record of a mention.
+
+        :param mention_id: id of the mention.
+        :type mention_id: str
+
+        :return: the sequence number, or None if the mention is not in the
+         journal.
+        :rtype: int
+        """
+        value = _id(mention_id)
+        for segment in reversed(self._segments):
+            seq = segment.lookup(value)
+            if seq is not None:
+                return seq
+        return None
+
+    def mention(self, mention_id):
+        """Returns the last record of a mention, decoded.
+
+        :param mention_id: id of the mention.
+        :type mention_id: str
+
+        :return: the mention, or None if it is not in the journal.
+        :rtype: dict
+        """
+        seq = self.lookup(mention_id)
+        if seq is None:
+            return None
+        return json.loads(bytes(self.get(seq)))
+
+    def close(self):
+        """Unmaps the journal."""
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        self._bases = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,342 @@
+"""Local evaluation of the keywords of basic alert queries.
+
+A basic query, see :class:`mention.base.CreateAnAlertAPI`, matches the
+mentions containing at least one of its `included_keywords`, all of its
+`required_keywords` and none of its `excluded_keywords`. :func:`compile_query`
+turns it into a :class:`KeywordQuery`, to run the same rules on the mirrored
+mentions or on mentions coming from other sources, without calling the API.
+
+The keywords are matched as whole words, regardless of case and accents, in
+the title and the description of the mentions. All the keywords, of one
+query or of the queries of many alerts in a :class:`KeywordFilter`, are
+compiled into a single Aho-Corasick :class:`Automaton` over words, so a
+mention is read once whatever the number of keywords. Most mentions share no
+word with the keywords at all: they are rejected with a set intersection,
+before the automaton runs.
+
+:Example:
+
+>>> query = compile_query({"type": "basic",
+...                        "included_keywords": ["NASA", "SpaceX"],
+...                        "required_keywords": ["mars"],
+...                        "excluded_keywords": ["fil d'ariane"]})
+>>> result = query.match({"title": "SpaceX and NASA",
+...                         "description": "Landing on Mars"})
+>>> result.matched, result.included
+(True, ('NASA', 'SpaceX'))
+"""
+import re
+import unicodedata
+
+from mention.exceptions import InvalidQueryException
+
+#: Fields of a mention the keywords are searched in.
+FIELDS = ("title", "description")
+
+_WORDS = re.compile(r"\w+").findall
+_MARKS = re.compile("[\u0300-\u036f]").sub
+
+
+def words(text):
+    """Splits a text into words, in lowercase and without accents.
+
+    :param text: the text.
+    :type text: str
+    :rtype: list
+    """
+    if not text:
+        return []
+    if not text.isascii():
+        text = _MARKS("", unicodedata.normalize("NFKD", text))
+    return _WORDS(text.casefold())
+
+
+class Automaton(object):
+    """Aho-Corasick automaton finding keywords, possibly of several words,
+    in a single pass over the words of a text.
+
+    :param keywords: the keywords.
+    :type keywords: list
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for index, keyword in enumerate(self.keywords):
+            self._add(index, words(keyword))
+        self._link()
+        #: Words of the keywords: a text without any of them has no match.
+        self.vocabulary = frozenset(self._goto[0])
+
+    def _add(self, index, keyword):
+        if not keyword:
+            return
+        state = 0
+        for word in keyword:
+            if word not in self._goto[state]:
+                self._goto[state][word] = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = self._goto[state][word]
+        self._output[state].append(index)
+
+    def _link(self):
+        # Breadth first, so the failure of a state is linked before its
+        # children look it up.
+        pending = list(self._goto[0].values())
+        for state in pending:
+            for word, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                self._output[child].extend(self._output[self._fail[child]])
+                pending.append(child)
+        self._output = [tuple(output) for output in self._output]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def search(self, text, found=None):
+        """Finds the keywords in a text.
+
+        :param text: the text, or its :func:`words`.
+        :param found: set the indexes of the keywords found are added to.
+        :type text: str or list
+        :type found: set
+        :return: the indexes of the keywords found.
+        :rtype: set
+        """
+        if found is None:
+            found = set()
+        if isinstance(text, str):
+            text = words(text)
+        if self.vocabulary.isdisjoint(text):
+            return found
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for word in text:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def search_mention(self, mention, fields=FIELDS, found=None):
+        """Finds the keywords in the fields of a mention. A keyword does not
+        span two fields.
+
+        :param mention: the mention.
+        :param fields: names of the fields searched.
+        :param found: set the indexes of the keywords found are added to.
+        :type mention: dict
+        :type fields: tuple
+        :type found: set
+        :rtype: set
+        """
+        if found is None:
+            found = set()
+        for field in fields:
+            self.search(mention.get(field) or "", found)
+        return found
+
+
+class KeywordMatch(object):
+    """Result of a :class:`KeywordQuery` on a mention.
+
+    :param matched: whether the mention matches the query.
+    :param included: the included keywords found.
+    :param required: the required keywords found.
+    :param excluded: the excluded keywords found.
+    """
+
+    __slots__ = ("matched", "included", "required", "excluded")
+
+    def __init__(self, matched, included=(), required=(), excluded=()):
+        self.matched = matched
+        self.included = included
+        self.required = required
+        self.excluded = excluded
+
+    def __bool__(self):
+        return self.matched
+
+    def __eq__(self, other):
+        return isinstance(other, KeywordMatch) and \
+            all(getattr(self, name) == getattr(other, name)
+                for name in self.__slots__)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "KeywordMatch({0})".format(", ".join(
+            "{0}={1!r}".format(name, getattr(self, name))
+            for name in self.__slots__))
+
+
+class KeywordQuery(object):
+    """Keywords of a basic alert query.
+
+    :param included: keywords of which a mention contains at least one.
+    :param required: keywords a mention contains all of.
+    :param excluded: keywords a mention contains none of.
+    :type included: list
+    :type required: list
+    :type excluded: list
+
+    :raises mention.exceptions.InvalidQueryException: if there is neither
+     an included nor a required keyword, or a keyword has no word.
+    """
+
+    def __init__(self, included=(), required=(), excluded=()):
+        self.included = tuple(included)
+        self.required = tuple(required)
+        self.excluded = tuple(excluded)
+        if not self.included and not self.required:
+            raise InvalidQueryException(
+                "A query needs included or required keywords")
+        for keyword in self.keywords:
+            if not words(keyword):
+                raise InvalidQueryException(
+                    "Keyword {0!r} has no word".format(keyword))
+        self._automaton = None
+
+    @property
+    def keywords(self):
+        """All the keywords, included first, then required and excluded.
+
+        :rtype: tuple
+        """
+        return self.included + self.required + self.excluded
+
+    def evaluate(self, found, offset=0):
+        """Applies the rules of the query to the keywords found.
+
+        :param found: indexes of the keywords found, in :attr:`keywords`
+         shifted by `offset`.
+        :param offset: index of the first keyword of the query.
+        :type found: set
+        :type offset: int
+        :rtype: :class:`KeywordMatch`
+        """
+        hits = []
+        for keywords in (self.included, self.required, self.excluded):
+            hits.append(tuple(keyword for index, keyword in
+                              enumerate(keywords, offset)
+                              if index in found))
+            offset += len(keywords)
+        included, required, excluded = hits
+        matched = (bool(included) or not self.included) and \
+            len(required) == len(self.required) and not excluded
+        return KeywordMatch(matched, included, required, excluded)
+
+    def match(self, mention, fields=FIELDS):
+        """Runs the query on a mention.
+
+        :param mention: the mention.
+        :param fields: names of the fields searched.
+        :type mention: dict
+        :type fields: tuple
+        :rtype: :class:`KeywordMatch`
+        """
+        if self._automaton is None:
+            self._automaton = Automaton(self.keywords)
+        return self.evaluate(self._automaton.search_mention(mention, fields))
+
+
+def compile_query(queryd):
+    """Compiles the keywords of a basic alert query.
+
+    :param queryd: the `queryd` of the alert, see
+     :class:`mention.base.CreateAnAlertAPI`.
+    :type queryd: dict
+    :rtype: :class:`KeywordQuery`
+
+    :raises mention.exceptions.InvalidQueryException: if the query is not a
+     basic one or has no keyword to match.
+    """
+    if queryd.get("type", "basic") != "basic":
+        raise InvalidQueryException(
+            "Only basic queries have keywords, not {0!r}".format(
+                queryd.get("type")))
+    return KeywordQuery(queryd.get("included_keywords") or (),
+                        queryd.get("required_keywords") or (),
+                        queryd.get("excluded_keywords") or ())
+
+
+class KeywordFilter(object):
+    """Runs the queries of many alerts on mentions in a single pass.
+
+    :param queries: `queryd` or :class:`KeywordQuery` by alert ID.
+    :type queries: dict
+    """
+
+    def __init__(self, queries=None):
+        self.queries = {}
+        self._automaton = None
+        for alert_id, query in (queries or {}).items():
+            self.add(alert_id, query)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def add(self, alert_id, query):
+        """Adds or replaces the query of an alert.
+
+        :param alert_id: ID of the alert.
+        :param query: its `queryd` or :class:`KeywordQuery`.
+        :type alert_id: str
+        :type query: dict or :class:`KeywordQuery`
+        """
+        if not isinstance(query, KeywordQuery):
+            query = compile_query(query)
+        self.queries[alert_id] = query
+        self._automaton = None
+
+    def remove(self, alert_id):
+        """Removes the query of an alert.
+
+        :param alert_id: ID of the alert.
+        :type alert_id: str
+        """
+        del self.queries[alert_id]
+        self._automaton = None
+
+    def _compile(self):
+        keywords = []
+        # The alert of every keyword, as (alert ID, query, index of its
+        # first keyword).
+        self._owners = []
+        for alert_id, query in self.queries.items():
+            owner = (alert_id, query, len(keywords))
+            keywords.extend(query.keywords)
+            self._owners.extend([owner] * len(query.keywords))
+        self._automaton = Automaton(keywords)
+
+    def match(self, mention, fields=FIELDS):
+        """Runs the queries of every alert on a mention.
+
+        :param mention: the mention.
+        :param fields: names of the fields searched.
+        :type mention: dict
+        :type fields: tuple
+        :return: the :class:`KeywordMatch` of the alerts matching the
+         mention, by alert ID.
+        :rtype: dict
+        """
+        if self._automaton is None:
+            self._compile()
+        found = self._automaton.search_mention(mention, fields)
+        matches = {}
+        # A query matches only mentions with one of its keywords.
+        for alert_id, query, start in set(self._owners[index]
+                                          for index in found):
+            result = query.evaluate(found, start)
+            if result.matched:
+                matches[alert_id] = result
+        return matches
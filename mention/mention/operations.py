@@ -0,0 +1,265 @@
+"""Operations made of several API calls, bounded by one deadline.
+
+Each operation shares a single :class:`mention.deadline.Deadline` between
+all of its requests. When the budget is spent, the requests in flight are
+abandoned and the operation returns what it obtained so far, in an
+:class:`OperationResult` telling how far it got, instead of raising.
+
+:Example:
+
+>>> client = FetchAllMentionsAPI(access_token, account_id, alert_id,
+...                              limit="1000")
+>>> result = operations.fetch_all_mentions(client, deadline=60)
+>>> result.complete, result.done, len(result.items)
+(False, 12, 12000)
+>>> client.cursor = result.cursor  # resume later from the next page
+"""
+import copy
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from mention import base, tracing
+from mention.deadline import as_deadline
+from mention.exceptions import (InvalidResponseException,
+                                RequestTimeoutException)
+
+
+class OperationResult(object):
+    """Result of an operation, possibly cut short by its deadline.
+
+    :param items: what the operation obtained, e.g. the mentions fetched,
+     or the responses by mention id.
+    :param complete: whether the operation ran to its end.
+    :param done: number of calls that succeeded, e.g. pages or mentions.
+    :param total: number of calls of the operation, if known in advance.
+    :param cursor: cursor of the next page of a paginated iteration.
+    :param pending: keys of the calls that did not succeed, in order.
+    :param error: the error that stopped the operation or failed some of
+     its calls, e.g. a timeout or an error response.
+    :type items: list or dict
+    :type complete: bool
+    :type done: int
+    :type total: int
+    :type cursor: str
+    :type pending: list
+    :type error: Exception
+    """
+
+    def __init__(self, items, complete, done, total=None, cursor=None,
+                 pending=None, error=None):
+        self.items = items
+        self.complete = complete
+        self.done = done
+        self.total = total
+        self.cursor = cursor
+        self.pending = pending or []
+        self.error = error
+
+    def __repr__(self):
+        progress = str(self.done)
+        if self.total is not None:
+            progress += "/" + str(self.total)
+        return "<OperationResult {0} {1}{2}>".format(
+            progress, "complete" if self.complete else "incomplete",
+            "" if self.error is None else ": {0!r}".format(self.error))
+
+
+def check_response(response, key):
+    """Raises if a response is an error, e.g. a 500 or a 429, rather than
+    the expected data.
+
+    :param response: the decoded response.
+    :param key: key of the data in a successful response.
+    :type response: dict
+    :type key: str
+
+    :raises mention.exceptions.InvalidResponseException: if the response
+     has no `key`.
+    """
+    if key not in response:
+        raise InvalidResponseException(
+            "{0}: {1}".format(response.get("code"), response.get("message")),
+            response.get("code"))
+    return response
+
+
+def fetch_all_mentions(client, deadline=None, max_pages=None, seen=None):
+    """Fetches the pages of a :class:`mention.base.FetchAllMentionsAPI`
+    call, following the cursors of `_links.more`.
+
+    :param client: the first page to fetch. It is not modified.
+    :param deadline: budget of the whole iteration, as a deadline or in
+     seconds.
+    :param max_pages: maximum number of pages to fetch.
+    :param seen: ids of the mentions already fetched, which are skipped. The
+     ids of the new mentions are added.
+    :type client: :class:`mention.base.FetchAllMentionsAPI`
+    :type deadline: :class:`mention.deadline.Deadline` or float
+    :type max_pages: int
+    :type seen: :class:`mention.dedupe.SeenIds`
+
+    :return: the mentions, the number of pages fetched and the `cursor` of
+     the next page, if any. A page that fails, e.g. with a timeout or an
+     error response, stops the iteration at its cursor, in `error`.
+    :rtype: :class:`OperationResult`
+    """
+    deadline = as_deadline(deadline)
+    mentions = []
+    pages = 0
+    cursor = client.cursor
+    error = None
+    with tracing.span("mention.fetch_all_mentions",
+                      alert_id=client.alert_id) as current:
+        while max_pages is None or pages < max_pages:
+            page_client = copy.copy(client)
+            page_client.cursor = cursor
+            page_client.page = pages
+            try:
+                page = check_response(
+                    page_client.query(deadline=deadline), "mentions")
+            except Exception as exception:
+                error = exception
+                break
+            found = page["mentions"]
+            mentions.extend(found if seen is None else seen.filter(found))
+            pages += 1
+            more = page.get("_links", {}).get("more")
+            cursor = more["params"].get("cursor") if more else None
+            if cursor is None:
+                break
+        complete = error is None and cursor is None
+        tracing.set_attributes(current, pages=pages, items=len(mentions),
+                               complete=complete)
+    return OperationResult(mentions, complete, pages, cursor=cursor,
+                           error=error)
+
+
+def _query_all(name, calls, deadline, workers, expected=None):
+    """Queries endpoints concurrently until they are done or the deadline
+    passes.
+
+    :param name: name of the span of the operation.
+    :param calls: `(key, endpoint)` pairs. The `page` of each endpoint is
+     set to its index.
+    :param deadline: budget of the operation.
+    :param workers: number of requests in flight.
+    :param expected: key of the data in a successful response, see
+     :func:`check_response`.
+
+    :return: the responses by key. The keys of the calls that failed or did
+     not end before the deadline are in `pending`, and the first error in
+     `error`.
+    :rtype: :class:`OperationResult`
+    """
+    deadline = as_deadline(deadline)
+    responses = {}
+    error = None
+    for index, (_, endpoint) in enumerate(calls):
+        endpoint.page = index
+    with tracing.span(name, total=len(calls)) as current:
+        pool = ThreadPoolExecutor(workers)
+        futures = {pool.submit(endpoint.query, deadline): key
+                   for key, endpoint in calls}
+        pending = set(futures)
+        try:
+            while pending:
+                if deadline is not None:
+                    deadline.check()
+                done, pending = wait(
+                    pending, return_when=FIRST_COMPLETED,
+                    timeout=None if deadline is None else deadline.remaining())
+                for future in done:
+                    try:
+                        response = future.result()
+                        if expected is not None:
+                            check_response(response, expected)
+                    except Exception as exception:
+                        error = error or exception
+                    else:
+                        responses[futures[future]] = response
+        except RequestTimeoutException as exception:
+            error = exception
+        finally:
+            # Requests in flight end by themselves, their timeouts are
+            # clamped to the deadline.
+            pool.shutdown(wait=False, cancel_futures=True)
+        items = {key: responses[key] for key, _ in calls if key in responses}
+        left = [key for key, _ in calls if key not in responses]
+        tracing.set_attributes(current, done=len(items),
+                               complete=not left)
+    return OperationResult(items, not left, len(items), total=len(calls),
+                           pending=left, error=error)
+
+
+def expand_children(access_token, account_id, alert_id, mention_ids,
+                    deadline=None, workers=8, limit=None):
+    """Fetches the children of several mentions concurrently.
+
+    :param access_token: Mention API `access_token`.
+    :param account_id: ID of the account.
+    :param alert_id: ID of the alert.
+    :param mention_ids: IDs of the mentions.
+    :param deadline: budget of the whole operation, as a deadline or in
+     seconds.
+    :param workers: number of requests in flight.
+    :param limit: maximum number of children per mention.
+    :type access_token: str
+    :type account_id: str
+    :type alert_id: str
+    :type mention_ids: list
+    :type deadline: :class:`mention.deadline.Deadline` or float
+    :type workers: int
+    :type limit: str
+
+    :return: the children by mention id, and the ids of the mentions whose
+     children were not fetched in `pending`, see :func:`_query_all`.
+    :rtype: :class:`OperationResult`
+    """
+    calls = [(mention_id,
+              base.FetchMentionChildrenAPI(access_token, account_id,
+                                           alert_id, mention_id, limit=limit))
+             for mention_id in mention_ids]
+    result = _query_all("mention.expand_children", calls, deadline, workers,
+                        expected="children")
+    result.items = {mention_id: page["children"]
+                    for mention_id, page in result.items.items()}
+    return result
+
+
+def curate_mentions(access_token, account_id, alert_id, mention_ids,
+                    deadline=None, workers=8, **fields):
+    """Curates several mentions concurrently, e.g. to mark them as read.
+
+    :param access_token: Mention API `access_token`.
+    :param account_id: ID of the account.
+    :param alert_id: ID of the alert, ignored if `mention_ids` is by alert.
+    :param mention_ids: IDs of the mentions, or the IDs of the mentions of
+     several alerts by alert ID, e.g. to trash the duplicates of a story.
+    :param deadline: budget of the whole operation, as a deadline or in
+     seconds.
+    :param workers: number of requests in flight.
+    :param fields: fields to update, see
+     :class:`mention.base.CurateAMentionAPI`.
+    :type access_token: str
+    :type account_id: str
+    :type alert_id: str
+    :type mention_ids: list or dict
+    :type deadline: :class:`mention.deadline.Deadline` or float
+    :type workers: int
+
+    :return: the responses by mention id, and in `pending` the ids of the
+     mentions whose update failed or was not confirmed before the deadline,
+     some of which may have been applied.
+    :rtype: :class:`OperationResult`
+    """
+    if isinstance(mention_ids, dict):
+        by_alert = mention_ids.items()
+    else:
+        by_alert = [(alert_id, mention_ids)]
+    calls = [(mention_id,
+              base.CurateAMentionAPI(access_token, account_id, alert_id,
+                                     mention_id, **fields))
+             for alert_id, ids in by_alert
+             for mention_id in ids]
+    return _query_all("mention.curate_mentions", calls, deadline, workers,
+                      expected="mention")
+
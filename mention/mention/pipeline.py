@@ -0,0 +1,282 @@
+"""Backfills that decode and transform pages in a process pool.
+
+Decoding the JSON of large :class:`mention.base.FetchAllMentionsAPI` pages
+and transforming the mentions is CPU bound and holds the GIL, so a threaded
+backfill uses a single core. A :class:`DecodePipeline` splits the work:
+
+* I/O threads fetch the raw pages with
+  :meth:`mention.base.Mention.query_raw` and follow their cursors,
+* worker processes decode each page, apply a transform to every mention and
+  serialize the rows as JSON lines,
+* the calling thread writes the rows to a sink, page by page.
+
+Pages are handed to the workers through a fixed set of shared memory slots,
+:class:`multiprocessing.shared_memory.SharedMemory` blocks created once:
+the raw page is copied into a free slot, decoded from there by the worker,
+which writes the serialized rows back into the same slot, and the rows are
+written to the sink straight from the slot. No page is pickled or sent
+through a pipe, unless it does not fit in a slot. The number of slots also
+bounds the pages in flight, and so the memory of the backfill.
+
+:Example:
+
+>>> clients = [FetchAllMentionsAPI(access_token, account_id, alert_id,
+...                                limit="1000") for alert_id in alert_ids]
+>>> with DecodePipeline(Fields(("id", "title", "published_at")),
+...                     processes=4) as pipeline, \\
+...         open("mentions.jsonl", "wb") as sink:
+...     pipeline.backfill(clients, sink)
+{'pages': 240, 'mentions': 240000, 'rows': 240000, ...}
+"""
+import copy
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+#: Size of the shared memory slots, in bytes.
+SLOT_SIZE = 4 * 1024 * 1024
+
+_LINKS = b'"_links":'
+
+#: Slots attached by a worker process, by name.
+_attached = {}
+
+
+class Fields(object):
+    """Transform keeping some fields of each mention.
+
+    :param names: names of the fields to keep.
+    :type names: tuple
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+
+    def __call__(self, mention):
+        return dict((name, mention.get(name)) for name in self.names)
+
+
+def _decode(source, size, items, transform):
+    """Decodes and transforms a page, in a worker process.
+
+    :param source: name of the slot holding the page, or the page itself.
+    :param size: size of the page in bytes.
+    :param items: name of the array of items of the page.
+    :param transform: function applied to each item, whose result is
+     serialized unless it is None.
+
+    :return: the number of items and of rows, the size of the serialized
+     rows, the rows unless they were written back to the slot, and the
+     `_links` of the page.
+    :rtype: tuple
+    """
+    block = None
+    if isinstance(source, str):
+        block = _attached.get(source)
+        if block is None:
+            block = _attached[source] = shared_memory.SharedMemory(source)
+        text = str(block.buf[:size], "utf-8")
+    else:
+        text = source.decode("utf-8")
+    page = json.loads(text)
+    del text
+
+    found = page.get(items) or []
+    dumps = json.JSONEncoder(ensure_ascii=False,
+                             separators=(",", ":")).encode
+    rows = []
+    for item in found:
+        row = item if transform is None else transform(item)
+        if row is not None:
+            rows.append(dumps(row))
+    data = ("\n".join(rows) + "\n").encode("utf-8") if rows else b""
+    links = page.get("_links") or {}
+    size = len(data)
+    if block is not None and size <= block.size:
+        block.buf[:size] = data
+        data = None
+    return len(found), len(rows), size, data, links
+
+
+def _cursor(links):
+    more = links.get("more") if isinstance(links, dict) else None
+    return more["params"].get("cursor") if more else None
+
+
+def _tail_links(body, window=4096):
+    """Reads the `_links` at the end of a raw page without decoding the
+    page, or returns None if they are not there."""
+    index = body.rfind(_LINKS, max(0, len(body) - window))
+    if index < 0:
+        return None
+    try:
+        links, _ = json.JSONDecoder().raw_decode(
+            body[index + len(_LINKS):].decode("utf-8"))
+    except ValueError:
+        return None
+    return links if isinstance(links, dict) else None
+
+
+def _write(sink, slot, length, data):
+    if data is not None:
+        sink.write(data)
+        return
+    view = slot.buf[:length]
+    try:
+        sink.write(view)
+    finally:
+        view.release()
+
+
+class DecodePipeline(object):
+    """Fetches pages in threads and decodes them in processes.
+
+    :param transform: function applied to each mention in the worker
+     processes, returning the row to write or None to drop the mention. It
+     must be picklable, e.g. a module level function or :class:`Fields`.
+     The mentions are written unchanged if omitted.
+    :param processes: number of worker processes, the number of CPUs if
+     omitted.
+    :param io_workers: number of threads fetching pages.
+    :param slots: number of shared memory slots, i.e. of pages in flight.
+    :param slot_size: size of each slot in bytes. Larger pages are sent to
+     the workers through a pipe.
+    :type transform: callable
+    :type processes: int
+    :type io_workers: int
+    :type slots: int
+    :type slot_size: int
+    """
+
+    def __init__(self, transform=None, processes=None, io_workers=4,
+                 slots=None, slot_size=SLOT_SIZE):
+        self.transform = transform
+        self.processes = processes or os.cpu_count() or 1
+        self.io_workers = io_workers
+        self.slot_size = slot_size
+        self._slots = [shared_memory.SharedMemory(create=True,
+                                                  size=slot_size)
+                       for _ in range(slots or 2 * self.processes +
+                                      io_workers)]
+        self._free = queue.Queue()
+        for slot in self._slots:
+            self._free.put(slot)
+        self._pool = ProcessPoolExecutor(self.processes)
+
+    def _fetch_all(self, client, results, stop, deadline, max_pages):
+        """Fetches the pages of a client, in an I/O thread."""
+        items = client.route.items
+        cursor = getattr(client, "cursor", None)
+        pages = 0
+        try:
+            while not stop.is_set() and (max_pages is None or
+                                         pages < max_pages):
+                page_client = copy.copy(client)
+                page_client.cursor = cursor
+                page_client.page = pages
+                body = page_client.query_raw(deadline)
+                slot = None
+                if len(body) <= self.slot_size:
+                    slot = self._free.get()
+                    slot.buf[:len(body)] = body
+                    future = self._pool.submit(_decode, slot.name, len(body),
+                                               items, self.transform)
+                else:
+                    future = self._pool.submit(_decode, body, len(body),
+                                               items, self.transform)
+                results.put((future, slot, len(body)))
+                pages += 1
+                links = _tail_links(body)
+                del body
+                if links is None:
+                    links = future.result()[4]
+                cursor = _cursor(links)
+                if cursor is None:
+                    break
+        except Exception as error:
+            results.put((None, error, 0))
+        results.put(None)
+
+    def backfill(self, clients, sink, deadline=None, max_pages=None):
+        """Fetches every page of several paginated calls and writes the
+        transformed mentions to a sink, as JSON lines.
+
+        The pages of a client are written in order; the pages of different
+        clients are interleaved.
+
+        :param clients: the first page of each call, e.g. one
+         :class:`mention.base.FetchAllMentionsAPI` per alert. They are not
+         modified.
+        :param sink: binary file the rows are written to.
+        :param deadline: budget of each request, see
+         :class:`mention.deadline.Deadline`.
+        :param max_pages: maximum number of pages per client.
+        :type clients: list
+        :type sink: file
+        :type deadline: :class:`mention.deadline.Deadline`
+        :type max_pages: int
+
+        :return: the number of pages, mentions and rows, the bytes fetched
+         and written, and the elapsed seconds.
+        :rtype: dict
+        """
+        started = time.perf_counter()
+        stats = {"pages": 0, "mentions": 0, "rows": 0, "bytes_in": 0,
+                 "bytes_out": 0}
+        results = queue.Queue()
+        stop = threading.Event()
+        error = None
+        with ThreadPoolExecutor(self.io_workers) as io:
+            for client in clients:
+                io.submit(self._fetch_all, client, results, stop, deadline,
+                          max_pages)
+            running = len(clients)
+            while running:
+                result = results.get()
+                if result is None:
+                    running -= 1
+                    continue
+                future, slot, size = result
+                if future is None:
+                    error = error or slot
+                    stop.set()
+                    continue
+                try:
+                    mentions, rows, length, data, _ = future.result()
+                    if error is None:
+                        _write(sink, slot, length, data)
+                        stats["pages"] += 1
+                        stats["mentions"] += mentions
+                        stats["rows"] += rows
+                        stats["bytes_in"] += size
+                        stats["bytes_out"] += length
+                except Exception as exception:
+                    # The I/O threads stop, the pages in flight are
+                    # drained to free their slots.
+                    error = error or exception
+                    stop.set()
+                finally:
+                    if slot is not None:
+                        self._free.put(slot)
+        if error is not None:
+            raise error
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    def close(self):
+        """Stops the worker processes and frees the shared memory."""
+        self._pool.shutdown()
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,541 @@
+"""Local evaluation of the `query_string` of advanced alert queries.
+
+An advanced query, see :class:`mention.base.CreateAnAlertAPI`, is a boolean
+expression of words and "quoted phrases", combined with ``AND``, ``OR``,
+``NOT`` and parentheses, e.g.
+``(NASA AND Discovery) OR (Arianespace AND "Ariane 6")``. Two operands next
+to each other are joined with ``AND``; ``NOT`` binds tighter than ``AND``,
+which binds tighter than ``OR``. Words match as in :mod:`mention.keywords`:
+whole words, regardless of case and accents, in the title and the
+description of the mentions, a phrase within a single field.
+
+:func:`compile_query` turns a query into an :class:`AdvancedQuery`, a
+predicate on mentions, to tune an alert on the mirrored mentions without
+creating test alerts through the API. The operands of ``AND`` and ``OR``
+are evaluated with short-circuits, in the order of their selectivity: the
+operands of ``AND`` least likely to match first, those of ``OR`` most likely
+to match first. The selectivity of the words comes from the document
+frequencies of an :class:`InvertedIndex`, if given.
+
+An :class:`InvertedIndex` of many stored mentions evaluates a query on all
+of them at once, with set operations on the mentions of each word, starting
+with the rarest.
+
+:Example:
+
+>>> index = InvertedIndex.from_journal(JournalReader("mentions"))
+>>> query = compile_query({"type": "advanced",
+...                        "query_string": "(NASA AND Discovery) OR "
+...                                        "(Arianespace AND Ariane)"},
+...                       frequency=index.frequency)
+>>> query.match(mention)
+True
+>>> [index.ids[doc] for doc in index.search(query)]
+['1245', '1398', ...]
+"""
+import json
+import re
+from array import array
+from bisect import bisect_left
+
+from mention.exceptions import InvalidQueryException
+from mention.keywords import FIELDS, words
+
+_TOKENS = re.compile(r'\s*(?:(\()|(\))|"([^"]*)("?)|([^\s()"]+))')
+_OPERATORS = ("AND", "OR", "NOT")
+
+#: Probability of a term matching a mention, without document frequencies.
+DEFAULT_FREQUENCY = 0.5
+
+
+class Term(object):
+    """A word or a phrase.
+
+    :param words: its words, see :func:`mention.keywords.words`.
+    :type words: tuple
+    """
+
+    __slots__ = ("words",)
+
+    def __init__(self, words):
+        self.words = tuple(words)
+
+    def __eq__(self, other):
+        return type(other) is Term and other.words == self.words
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.words)
+
+    def __repr__(self):
+        return "Term({0!r})".format(" ".join(self.words))
+
+
+class And(object):
+    """Matches when all of its operands do.
+
+    :param children: the operands.
+    :type children: list
+    """
+
+    __slots__ = ("children",)
+
+    def __init__(self, children):
+        self.children = tuple(children)
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.children == self.children
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, list(self.children))
+
+
+class Or(And):
+    """Matches when one of its operands does.
+
+    :param children: the operands.
+    :type children: list
+    """
+
+    __slots__ = ()
+
+
+class Not(object):
+    """Matches when its operand does not.
+
+    :param child: the operand.
+    """
+
+    __slots__ = ("child",)
+
+    def __init__(self, child):
+        self.child = child
+
+    def __eq__(self, other):
+        return type(other) is Not and other.child == self.child
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Not({0!r})".format(self.child)
+
+
+def _tokenize(query_string):
+    tokens = []
+    position = 0
+    query_string = query_string.rstrip()
+    while position < len(query_string):
+        found = _TOKENS.match(query_string, position)
+        if found is None:
+            raise InvalidQueryException(
+                "Unexpected character at {0} in {1!r}".format(
+                    position, query_string))
+        opening, closing, phrase, quote, word = found.groups()
+        if phrase is not None and not quote:
+            raise InvalidQueryException(
+                "Unclosed quote in {0!r}".format(query_string))
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif word in _OPERATORS:
+            tokens.append(word)
+        else:
+            text = word if phrase is None else phrase
+            if not words(text):
+                raise InvalidQueryException(
+                    "{0!r} has no word".format(text))
+            tokens.append(Term(words(text)))
+        position = found.end()
+    return tokens
+
+
+def _combine(cls, children):
+    if len(children) == 1:
+        return children[0]
+    # (a AND b) AND c is a AND b AND c, to order the three together.
+    flat = []
+    for child in children:
+        flat.extend(child.children if type(child) is cls else (child,))
+    return cls(flat)
+
+
+class _Parser(object):
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+        self.tokens = _tokenize(query_string)
+        self.position = 0
+
+    def error(self, message):
+        return InvalidQueryException("{0} in {1!r}".format(
+            message, self.query_string))
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise self.error("Empty query")
+        node = self.disjunction()
+        if self.peek() is not None:
+            raise self.error("Unexpected {0!r}".format(self.peek()))
+        return node
+
+    def disjunction(self):
+        children = [self.conjunction()]
+        while self.peek() == "OR":
+            self.next()
+            children.append(self.conjunction())
+        return _combine(Or, children)
+
+    def conjunction(self):
+        children = [self.negation()]
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.next()
+            children.append(self.negation())
+        return _combine(And, children)
+
+    def negation(self):
+        if self.peek() == "NOT":
+            self.next()
+            return Not(self.negation())
+        return self.operand()
+
+    def operand(self):
+        token = self.next()
+        if isinstance(token, Term):
+            return token
+        if token == "(":
+            node = self.disjunction()
+            if self.next() != ")":
+                raise self.error("Unclosed parenthesis")
+            return node
+        if token is None:
+            raise self.error("Unexpected end")
+        raise self.error("Unexpected {0!r}".format(token))
+
+
+def parse(query_string):
+    """Parses a `query_string` into a tree of :class:`Term`, :class:`And`,
+    :class:`Or` and :class:`Not`.
+
+    :param query_string: the query.
+    :type query_string: str
+
+    :raises mention.exceptions.InvalidQueryException: if the query is not
+     valid.
+    """
+    return _Parser(query_string).parse()
+
+
+def terms(node):
+    """Returns the terms of a query tree.
+
+    :rtype: set
+    """
+    if isinstance(node, Term):
+        return set((node,))
+    if isinstance(node, Not):
+        return terms(node.child)
+    return set().union(*(terms(child) for child in node.children))
+
+
+def probability(node, frequency=None):
+    """Estimates the probability of a query tree matching a mention,
+    assuming independent terms.
+
+    :param node: the query tree.
+    :param frequency: function returning the fraction of the mentions a
+     :class:`Term` matches, :data:`DEFAULT_FREQUENCY` for every term if
+     omitted.
+    :type frequency: callable
+    :rtype: float
+    """
+    if isinstance(node, Term):
+        return DEFAULT_FREQUENCY if frequency is None else frequency(node)
+    if isinstance(node, Not):
+        return 1.0 - probability(node.child, frequency)
+    result = 1.0
+    if isinstance(node, Or):
+        for child in node.children:
+            result *= 1.0 - probability(child, frequency)
+        return 1.0 - result
+    for child in node.children:
+        result *= probability(child, frequency)
+    return result
+
+
+def _contains(postings, doc):
+    position = bisect_left(postings, doc)
+    return position < len(postings) and postings[position] == doc
+
+
+def _joined(fields):
+    return [" {0} ".format(" ".join(field)) for field in fields]
+
+
+def _compile(node, frequency):
+    if isinstance(node, Term):
+        if len(node.words) == 1:
+            word = node.words[0]
+            return lambda document: word in document[0]
+        phrase = " {0} ".format(" ".join(node.words))
+        return lambda document: any(phrase in field
+                                    for field in document[1])
+    if isinstance(node, Not):
+        child = _compile(node.child, frequency)
+        return lambda document: not child(document)
+    # The operands deciding the result soonest go first: for AND those
+    # least likely to match, for OR those most likely to.
+    children = sorted(node.children,
+                      key=lambda child: probability(child, frequency),
+                      reverse=isinstance(node, Or))
+    children = [_compile(child, frequency) for child in children]
+    if isinstance(node, Or):
+        def evaluate(document):
+            for child in children:
+                if child(document):
+                    return True
+            return False
+    else:
+        def evaluate(document):
+            for child in children:
+                if not child(document):
+                    return False
+            return True
+    return evaluate
+
+
+class AdvancedQuery(object):
+    """Predicate on mentions compiled from a `query_string`.
+
+    :param query_string: the query.
+    :param frequency: function returning the fraction of the mentions a
+     :class:`Term` matches, to order the operands, e.g.
+     :meth:`InvertedIndex.frequency`.
+    :type query_string: str
+    :type frequency: callable
+
+    :raises mention.exceptions.InvalidQueryException: if the query is not
+     valid.
+    """
+
+    def __init__(self, query_string, frequency=None):
+        self.query_string = query_string
+        #: The query tree, see :func:`parse`.
+        self.tree = parse(query_string)
+        #: The terms of the query.
+        self.terms = terms(self.tree)
+        self._phrases = any(len(term.words) > 1 for term in self.terms)
+        self._predicate = _compile(self.tree, frequency)
+
+    def match(self, mention, fields=FIELDS):
+        """Runs the query on a mention.
+
+        :param mention: the mention.
+        :param fields: names of the fields searched.
+        :type mention: dict
+        :type fields: tuple
+        :rtype: bool
+        """
+        fields = [words(mention.get(field)) for field in fields]
+        document = (set().union(*fields),
+                    _joined(fields) if self._phrases else ())
+        return self._predicate(document)
+
+
+def compile_query(queryd, frequency=None):
+    """Compiles the `query_string` of an advanced alert query.
+
+    :param queryd: the `queryd` of the alert, see
+     :class:`mention.base.CreateAnAlertAPI`.
+    :param frequency: see :class:`AdvancedQuery`.
+    :type queryd: dict
+    :type frequency: callable
+    :rtype: :class:`AdvancedQuery`
+
+    :raises mention.exceptions.InvalidQueryException: if the query is not an
+     advanced one or is not valid.
+    """
+    if queryd.get("type") != "advanced":
+        raise InvalidQueryException(
+            "Only advanced queries have a query_string, not {0!r}".format(
+                queryd.get("type")))
+    return AdvancedQuery(queryd.get("query_string") or "", frequency)
+
+
+class InvertedIndex(object):
+    """Mentions by word, to run queries on many mentions at once.
+
+    The index keeps, for every word and every pair of consecutive words,
+    the numbers of the mentions containing it. A phrase of more than two
+    words is looked up by its pairs of words, then checked on the mentions
+    themselves if `documents` is given.
+
+    :param fields: names of the fields indexed.
+    :param documents: function returning a mention from its number, see
+     :meth:`add`.
+    :type fields: tuple
+    :type documents: callable
+    """
+
+    def __init__(self, fields=FIELDS, documents=None):
+        self.fields = tuple(fields)
+        self.documents = documents
+        #: ID of every mention, by number.
+        self.ids = []
+        self._postings = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, mention):
+        """Indexes a mention.
+
+        :param mention: the mention.
+        :type mention: dict
+        :return: the number of the mention in the index.
+        :rtype: int
+        """
+        doc = len(self.ids)
+        self.ids.append(mention.get("id"))
+        keys = set()
+        for field in self.fields:
+            field = words(mention.get(field))
+            keys.update(field)
+            keys.update(" ".join(pair) for pair in zip(field, field[1:]))
+        postings = self._postings
+        for key in keys:
+            if key not in postings:
+                postings[key] = array("I")
+            postings[key].append(doc)
+        return doc
+
+    @classmethod
+    def from_journal(cls, reader, fields=FIELDS):
+        """Indexes the mentions of a journal, which also checks the
+        phrases.
+
+        :param reader: the journal.
+        :param fields: names of the fields indexed.
+        :type reader: :class:`mention.journal.JournalReader`
+        :type fields: tuple
+        :rtype: :class:`InvertedIndex`
+        """
+        seqs = array("Q")
+
+        def documents(doc):
+            return json.loads(bytes(reader.get(seqs[doc])))
+
+        index = cls(fields, documents)
+        for seq, record in reader.records():
+            index.add(json.loads(bytes(record)))
+            seqs.append(seq)
+        return index
+
+    def _keys(self, term):
+        if len(term.words) == 1:
+            return term.words
+        return [" ".join(pair) for pair in zip(term.words, term.words[1:])]
+
+    def _size(self, term):
+        return min(len(self._postings.get(key, ())) for key in
+                   self._keys(term))
+
+    def frequency(self, term):
+        """Returns the fraction of the mentions containing a term, at most,
+        for a phrase of more than two words.
+
+        :param term: the term.
+        :type term: :class:`Term`
+        :rtype: float
+        """
+        return self._size(term) / float(len(self.ids) or 1)
+
+    def _term(self, term, cache):
+        if term in cache:
+            return cache[term]
+        keys = sorted(self._keys(term),
+                      key=lambda key: len(self._postings.get(key, ())))
+        result = set(self._postings.get(keys[0], ()))
+        for key in keys[1:]:
+            result = self._filter(result, key)
+        if len(term.words) > 2 and self.documents is not None:
+            phrase = " {0} ".format(" ".join(term.words))
+            result = set(doc for doc in result
+                         if any(phrase in field for field in _joined(
+                             [words(self.documents(doc).get(field))
+                              for field in self.fields])))
+        cache[term] = result
+        return result
+
+    def _filter(self, docs, key):
+        postings = self._postings.get(key, ())
+        if not docs:
+            return docs
+        if len(docs) * 16 < len(postings):
+            # Fewer lookups in the sorted postings than copying them.
+            return set(doc for doc in docs if _contains(postings, doc))
+        return docs.intersection(postings)
+
+    def _evaluate(self, node, cache):
+        if isinstance(node, Term):
+            return self._term(node, cache)
+        if isinstance(node, Not):
+            return set(range(len(self.ids))) - \
+                self._evaluate(node.child, cache)
+        if isinstance(node, Or):
+            result = set()
+            for child in node.children:
+                result |= self._evaluate(child, cache)
+            return result
+        # AND: start from the rarest operand and stop once nothing is left;
+        # NOT operands are removed from the result.
+        positive = [child for child in node.children
+                    if not isinstance(child, Not)]
+        negative = [child.child for child in node.children
+                    if isinstance(child, Not)]
+        positive.sort(key=lambda child: probability(child, self.frequency))
+        if positive:
+            result = self._evaluate(positive[0], cache)
+        else:
+            result = set(range(len(self.ids)))
+        for child in positive[1:]:
+            if not result:
+                return result
+            if isinstance(child, Term) and len(child.words) == 1:
+                result = self._filter(result, child.words[0])
+            else:
+                result = result & self._evaluate(child, cache)
+        for child in negative:
+            if not result:
+                return result
+            result = result - self._evaluate(child, cache)
+        return result
+
+    def search(self, query):
+        """Runs a query on every mention of the index.
+
+        :param query: the query, its `query_string` or its tree.
+        :type query: :class:`AdvancedQuery` or str
+        :return: the numbers of the mentions matching, in order.
+        :rtype: list
+        """
+        if isinstance(query, AdvancedQuery):
+            query = query.tree
+        elif not isinstance(query, (Term, And, Not)):
+            query = parse(query)
+        return sorted(self._evaluate(query, {}))
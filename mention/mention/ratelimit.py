@@ -0,0 +1,132 @@
+"""Client side rate limiting with token buckets.
+
+A :class:`TokenBucket` holds the request budget of a client: it refills at
+a steady rate up to a burst capacity, and each request takes a token.
+:class:`RateLimitedTransport` makes every request wait for a token, so a
+pool of workers stays under the rate limit of the API. Optional extra
+requests, such as the hedges of :class:`mention.hedging.HedgingTransport`,
+only take a token when one is available right away, so they never delay
+the regular requests sharing the bucket.
+
+:Example:
+
+>>> budget = ratelimit.TokenBucket(rate=10, capacity=20)
+>>> Mention.transport = ratelimit.RateLimitedTransport(budget)
+"""
+import threading
+import time
+
+from mention.transport import Transport, default_transport
+
+
+class TokenBucket(object):
+    """A budget of requests refilled at a steady rate.
+
+    The bucket can be shared by several threads.
+
+    :param rate: tokens added per second.
+    :param capacity: maximum number of tokens, i.e. the largest burst. The
+     bucket starts full.
+    :param clock: function returning the current time in seconds.
+    :type rate: float
+    :type capacity: float
+    :type clock: callable
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self):
+        """Number of tokens available now.
+
+        :rtype: float
+        """
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens if they are available, without waiting.
+
+        :param tokens: number of tokens to take.
+        :type tokens: float
+
+        :return: whether the tokens were taken.
+        :rtype: bool
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def release(self, tokens=1):
+        """Gives back tokens that were not used, up to the capacity.
+
+        :param tokens: number of tokens to give back.
+        :type tokens: float
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens=1, timeout=None):
+        """Takes tokens, waiting for the bucket to refill if needed.
+
+        :param tokens: number of tokens to take, at most the capacity.
+        :param timeout: maximum number of seconds to wait, None to wait as
+         long as needed.
+        :type tokens: float
+        :type timeout: float
+
+        :return: whether the tokens were taken before the timeout.
+        :rtype: bool
+        """
+        expires_at = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                if not self.rate:
+                    return False
+                wait = (tokens - self._tokens) / self.rate
+            if expires_at is not None and self._clock() + wait > expires_at:
+                return False
+            time.sleep(wait)
+
+
+class RateLimitedTransport(Transport):
+    """Sends requests through another transport, at most at the rate of a
+    token bucket.
+
+    :param bucket: budget of the requests.
+    :param transport: transport that sends the requests, the default
+     transport if omitted.
+    :type bucket: :class:`TokenBucket`
+    :type transport: :class:`mention.transport.Transport`
+    """
+
+    def __init__(self, bucket, transport=None):
+        self.bucket = bucket
+        self.transport = transport or default_transport()
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        self.bucket.acquire()
+        return self.transport.request(method, url, access_token, data,
+                                      stream=stream, timeout=timeout)
@@ -0,0 +1,261 @@
+"""Route table of the Mention API.
+
+Each endpoint class of :mod:`mention.base` is described by a :class:`Route`:
+its HTTP method, path template, query parameters and body fields. The
+request itself is executed by :meth:`mention.base.Mention.query`, the single
+code path shared by all endpoints.
+
+Routes are compiled once, when the table is built: building a url is then a
+single pass over the path segments and the query parameters, with each value
+percent-encoded by :func:`encode`.
+
+A new endpoint only needs a route and the attributes it refers to:
+
+:Example:
+
+>>> class FetchAlertTasksAPI(Mention):
+...     route = Route("GET", "/accounts/{account_id}/alerts/{alert_id}/tasks",
+...                   query=("limit",), items="tasks")
+...
+...     def __init__(self, access_token, account_id, alert_id, limit=None):
+...         self.account_id = account_id
+...         self.alert_id = alert_id
+...         self.limit = limit
+...         super(FetchAlertTasksAPI, self).__init__(access_token)
+"""
+import re
+from functools import lru_cache
+from operator import attrgetter
+from string import Formatter, ascii_letters, digits
+from urllib.parse import quote, urlsplit
+
+_UNRESERVED_CHARACTERS = ascii_letters + digits + "_.~-"
+
+#: Routes by HTTP method, in order of definition, see :func:`resolve`.
+_table = {}
+_UNRESERVED = re.compile(r"[A-Za-z0-9_.~-]*\Z").match
+
+#: Percent-encoding of the reserved ASCII characters, for `str.translate`.
+_ESCAPES = dict((code, "%{0:02X}".format(code)) for code in range(128)
+                if chr(code) not in _UNRESERVED_CHARACTERS)
+
+
+def encode(value):
+    """Percent-encodes a value of the url.
+
+    Numbers are formatted, and lists and tuples are joined with commas.
+    Values made of unreserved characters only, such as ids, are returned
+    as is; the others are escaped in a single pass and memoized.
+
+    :param value: value of a path or query parameter.
+    :type value: str
+
+    :return: the encoded value.
+    :rtype: str
+    """
+    if not isinstance(value, str):
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(item) for item in value)
+        else:
+            value = str(value)
+    if _UNRESERVED(value):
+        return value
+    return _escape(value)
+
+
+@lru_cache(maxsize=1024)
+def _escape(value):
+    # Polling loops send the same dates and filters over and over.
+    if value.isascii():
+        return value.translate(_ESCAPES)
+    return quote(value, safe="")
+
+
+class Route(object):
+    """Describes the HTTP request of an endpoint.
+
+    :param method: HTTP method.
+    :param path: path template relative to the base url, with the
+     parameters in braces, e.g. `/accounts/{account_id}/alerts`.
+    :param query: names of the parameters sent in the query string, in
+     order. Parameters without a value are left out.
+    :param body: fields of the JSON body, in order. A field is either the
+     name of an attribute of the endpoint, or a `(field, attribute)` pair.
+     Fields without a value are left out.
+    :param items: name of the array of items in the response, for the
+     endpoints that can be streamed.
+
+    :type method: str
+    :type path: str
+    :type query: tuple
+    :type body: tuple
+    :type items: str
+    """
+
+    def __init__(self, method, path, query=(), body=None, items=None):
+        self.method = method
+        self.path = path
+        self._path = tuple((literal, field) for literal, field, _, _ in
+                           Formatter().parse(path))
+        self.path_fields = tuple(field for _, field in self._path if field)
+        self._match = re.compile("".join(
+            re.escape(literal) + ("[^/]+" if field else "")
+            for literal, field in self._path) + r"\Z").search
+        self.query = tuple(query)
+        self._query = tuple((name, name + "=") for name in self.query)
+        #: Names of all the parameters of the route.
+        self.fields = fields = self.path_fields + self.query
+        if len(fields) > 1:
+            self._values = attrgetter(*fields)
+        elif fields:
+            self._values = lambda endpoint: (getattr(endpoint, fields[0]),)
+        else:
+            self._values = lambda endpoint: ()
+        self.body = None if body is None else tuple(
+            (field, field) if isinstance(field, str) else tuple(field)
+            for field in body)
+        self.items = items
+        _table.setdefault(method, []).append(self)
+
+    def params(self, endpoint):
+        """Reads the parameters of the route from the attributes of an
+        endpoint.
+
+        :param endpoint: the endpoint instance.
+        :type endpoint: :class:`mention.base.Mention`
+
+        :return: the value of each field of the route.
+        :rtype: dict
+        """
+        return dict(zip(self.fields, self._values(endpoint)))
+
+    def build_url(self, base_url, params):
+        """Builds the url of the route.
+
+        :param base_url: root url of the API.
+        :param params: parameters of the endpoint. Query parameters that are
+         None or empty are left out.
+        :type base_url: str
+        :type params: dict
+
+        :return: the url.
+        :rtype: str
+        """
+        parts = [base_url]
+        for literal, field in self._path:
+            parts.append(literal)
+            if field:
+                parts.append(encode(params[field]))
+        separator = "?"
+        for name, prefix in self._query:
+            value = params.get(name)
+            if value is None or value == "":
+                continue
+            parts.append(separator)
+            parts.append(prefix)
+            parts.append(encode(value))
+            separator = "&"
+        return "".join(parts)
+
+    def __repr__(self):
+        return "Route({0!r}, {1!r})".format(self.method, self.path)
+
+
+def resolve(method, path):
+    """Finds the route of a request, e.g. to keep statistics per endpoint
+    rather than per url.
+
+    :param method: HTTP method.
+    :param path: path of the url, with or without the base url.
+    :type method: str
+    :type path: str
+
+    :return: the route with the longest template matching the end of the
+     path, or None.
+    :rtype: :class:`Route`
+    """
+    found = None
+    for route in _table.get(method, ()):
+        if route._match(path) and (found is None or
+                                   len(route.path) > len(found.path)):
+            found = route
+    return found
+
+
+def endpoint(method, url):
+    """Identifies the endpoint of a request independently of its ids, to
+    keep state or statistics per endpoint.
+
+    :param method: HTTP method.
+    :param url: full url of the request.
+    :type method: str
+    :type url: str
+
+    :return: the host, the method and the path template of the route, or
+     the path if no route matches.
+    :rtype: tuple
+    """
+    parts = urlsplit(url)
+    route = resolve(method, parts.path)
+    return parts.netloc, method, route.path if route else parts.path
+
+
+def _has_value(value):
+    return value is not None and value != "" and value != []
+
+
+def body_fields(route, endpoint):
+    """Returns the body fields of a route that have a value on an endpoint.
+
+    :param route: the route.
+    :param endpoint: the endpoint instance.
+    :type route: :class:`Route`
+    :type endpoint: :class:`mention.base.Mention`
+
+    :rtype: dict
+    """
+    data = {}
+    for field, attribute in route.body:
+        value = getattr(endpoint, attribute, None)
+        if _has_value(value):
+            data[field] = value
+    return data
+
+
+_ALERT = "/accounts/{account_id}/alerts/{alert_id}"
+_MENTION = _ALERT + "/mentions/{mention_id}"
+
+_ALERT_BODY = ("name", ("query", "queryd"), "languages", "countries",
+               "sources", "blocked_sites", "noise_detection", "reviews_pages")
+
+APP_DATA = Route("GET", "/app/data")
+
+FETCH_AN_ALERT = Route("GET", _ALERT)
+
+FETCH_ALERTS = Route("GET", "/accounts/{account_id}/alerts", items="alerts")
+
+CREATE_AN_ALERT = Route("POST", "/accounts/{account_id}/alerts/",
+                        body=_ALERT_BODY)
+
+UPDATE_AN_ALERT = Route("PUT", _ALERT, body=_ALERT_BODY)
+
+FETCH_A_MENTION = Route("GET", _MENTION)
+
+FETCH_ALL_MENTIONS = Route(
+    "GET", _ALERT + "/mentions",
+    query=("since_id", "before_date", "not_before_date", "cursor", "unread",
+           "favorite", "folder", "q", "tone", "limit", "source", "countries",
+           "include_children", "sort", "languages", "timezone"),
+    items="mentions")
+
+FETCH_MENTION_CHILDREN = Route("GET", _MENTION + "/children",
+                               query=("before_date", "limit"),
+                               items="children")
+
+CURATE_A_MENTION = Route("PUT", _MENTION,
+                         body=("favorite", "trashed", "read", "tags",
+                               "folder", "tone"))
+
+MARK_ALL_MENTIONS_AS_READ = Route("POST", _ALERT + "/mentions/markallread")
+
+STREAM_MENTIONS = Route("GET", "/accounts/{account_id}/mentions")
@@ -0,0 +1,453 @@
+"""Concurrent polling of the alerts of many accounts.
+
+A :class:`PollingScheduler` polls a set of :class:`Target`, each an alert
+of an account, with :class:`mention.base.FetchAllMentionsAPI`, following the
+`since_id` of the previous poll so that every new mention is fetched once.
+
+The targets sharing an `access_token` share its rate budget, a
+:class:`mention.ratelimit.TokenBucket`. Within a token, the polls are
+handed out by stride scheduling: a target of weight 2 is polled twice as
+often as a target of weight 1 when the budget is the limit. Each token also
+has a cap on the polls in flight, so a slow account only holds a few of the
+workers and the other accounts keep being polled.
+
+The interval between two polls of a target is fixed, or follows the arrival
+rate of its mentions with an :class:`AdaptiveInterval`: busy alerts are
+polled more often and quiet alerts less often, for the same number of polls.
+
+:meth:`PollingScheduler.report` gives the freshness lag of every target,
+the time since its last successful poll.
+
+:Example:
+
+>>> targets = [Target(token, account_id, alert_id, weight=2)
+...            for token, account_id, alert_id in accounts]
+>>> scheduler = PollingScheduler(targets, rate=5, interval=30,
+...                              on_mentions=store)
+>>> scheduler.start()
+>>> scheduler.report()[(account_id, alert_id)]["lag"]
+12.5
+"""
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mention import base
+from mention.ratelimit import TokenBucket
+
+
+class Target(object):
+    """An alert to poll.
+
+    :param access_token: Mention API `access_token`.
+    :param account_id: ID of the account.
+    :param alert_id: ID of the alert.
+    :param weight: share of the rate budget of the token, relative to the
+     other targets of the token.
+    :param since_id: ID of the newest mention already fetched, None to start
+     with the latest page.
+    :type access_token: str
+    :type account_id: str
+    :type alert_id: str
+    :type weight: float
+    :type since_id: str
+    """
+
+    def __init__(self, access_token, account_id, alert_id, weight=1.0,
+                 since_id=None):
+        self.access_token = access_token
+        self.account_id = account_id
+        self.alert_id = alert_id
+        self.weight = float(weight)
+        self.since_id = since_id
+        #: Number of successful polls.
+        self.polls = 0
+        #: Number of mentions fetched.
+        self.mentions = 0
+        #: Number of failed polls.
+        self.errors = 0
+        #: Exception of the last failed poll.
+        self.last_error = None
+        #: Time of the last successful poll, on the clock of the scheduler.
+        self.polled_at = None
+        #: Estimated number of new mentions per second, if the interval is
+        #: adaptive.
+        self.rate = None
+        #: Seconds until the next poll.
+        self.interval = None
+        self._pass = 0.0
+        self._due = 0.0
+        self._busy = False
+
+    @property
+    def key(self):
+        """`(account_id, alert_id)` of the target."""
+        return (self.account_id, self.alert_id)
+
+    def __repr__(self):
+        return "Target({0!r}, {1!r}, weight={2})".format(
+            self.account_id, self.alert_id, self.weight)
+
+
+class FixedInterval(object):
+    """Polls every target at the same interval.
+
+    :param seconds: minimum number of seconds between two polls of a target.
+    :type seconds: float
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def update(self, target, mentions, seconds, full):
+        """Returns the interval until the next poll of a target.
+
+        :param target: the target just polled.
+        :param mentions: number of new mentions of the poll, None if it
+         failed.
+        :param seconds: seconds since the previous successful poll, None if
+         there was none.
+        :param full: whether the poll returned a full page, i.e. more new
+         mentions are waiting.
+        :type target: :class:`Target`
+        :type mentions: int
+        :type seconds: float
+        :type full: bool
+        :rtype: float
+        """
+        return self.seconds
+
+
+class AdaptiveInterval(object):
+    """Polling intervals following the arrival rate of the mentions.
+
+    The rate of each target is estimated from the new mentions of its polls,
+    with an exponential moving average over time. A mention waits on average
+    half the interval of its target, so for a budget of polls per second the
+    average lag of the mentions is smallest when the interval of each target
+    is inversely proportional to the square root of its rate:
+    `interval = sum(sqrt(rates)) / (budget * sqrt(rate))`.
+
+    The intervals are kept between `min_interval` and `max_interval`. A
+    target without estimate is polled after `initial_interval`, and a target
+    whose poll returned a full page after `min_interval`.
+
+    :param budget: polls per second shared by all the targets.
+    :param min_interval: shortest interval, in seconds.
+    :param max_interval: longest interval, in seconds, reached by idle
+     targets.
+    :param half_life: seconds after which an observation of the rate counts
+     for half as much.
+    :param initial_interval: interval of the targets without estimate,
+     `min_interval` if omitted.
+    :type budget: float
+    :type min_interval: float
+    :type max_interval: float
+    :type half_life: float
+    :type initial_interval: float
+    """
+
+    def __init__(self, budget, min_interval=10.0, max_interval=900.0,
+                 half_life=3600.0, initial_interval=None):
+        if budget <= 0:
+            raise ValueError("budget must be positive")
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.half_life = half_life
+        self.initial_interval = (min_interval if initial_interval is None
+                                 else initial_interval)
+        self._roots = {}
+        self._total = 0.0
+
+    def observe(self, target, mentions, seconds):
+        """Updates the rate of a target with the new mentions of a poll.
+
+        :param target: the target polled.
+        :param mentions: number of new mentions.
+        :param seconds: seconds since the previous poll.
+        :type target: :class:`Target`
+        :type mentions: int
+        :type seconds: float
+        """
+        if seconds <= 0:
+            return
+        rate = mentions / seconds
+        if target.rate is not None:
+            weight = 0.5 ** (seconds / self.half_life)
+            rate = weight * target.rate + (1 - weight) * rate
+        target.rate = rate
+        root = math.sqrt(rate)
+        self._total += root - self._roots.get(target.key, 0.0)
+        self._roots[target.key] = root
+
+    def interval(self, target):
+        """Returns the interval of a target from the current estimates.
+
+        :param target: the target.
+        :type target: :class:`Target`
+        :rtype: float
+        """
+        root = self._roots.get(target.key)
+        if root is None:
+            return self.initial_interval
+        if root <= 0:
+            return self.max_interval
+        interval = self._total / (self.budget * root)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def update(self, target, mentions, seconds, full):
+        """Returns the interval until the next poll of a target, see
+        :meth:`FixedInterval.update`."""
+        if mentions is not None and seconds is not None:
+            self.observe(target, mentions, seconds)
+        if full:
+            return self.min_interval
+        return self.interval(target)
+
+
+class _Token(object):
+    """Targets sharing an access token, and its budget."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.targets = []
+        self.in_flight = 0
+        self.virtual_time = 0.0
+
+    def next_target(self, now):
+        """Returns the ready target with the smallest pass, or None."""
+        found = None
+        for target in self.targets:
+            if target._busy or target._due > now:
+                continue
+            if found is None or target._pass < found._pass:
+                found = target
+        return found
+
+    def start(self, target):
+        # A target that has been idle restarts from the current virtual
+        # time, so it can not catch up in a burst.
+        start = max(target._pass, self.virtual_time)
+        self.virtual_time = start
+        target._pass = start + 1.0 / target.weight
+        target._busy = True
+        self.in_flight += 1
+
+
+class PollingScheduler(object):
+    """Polls targets concurrently, sharing the budget of each token fairly.
+
+    :param targets: the alerts to poll.
+    :param rate: polls per second allowed per access token.
+    :param burst: largest burst of polls per access token.
+    :param interval: minimum number of seconds between two polls of a
+     target, or the policy giving the interval of each target.
+    :param workers: number of polls in flight.
+    :param per_token: maximum number of polls in flight per access token.
+    :param limit: number of mentions per poll, up to 1000.
+    :param on_mentions: called from the workers with the target and the
+     list of new mentions of each successful poll. If it raises, the poll
+     fails, and the target keeps its `since_id` and the mentions stay out
+     of `seen`, to be handed over again by the next poll.
+    :param transport: transport of the requests, the default one if
+     omitted.
+    :param seen: ids of the mentions already fetched, skipped by the polls,
+     e.g. shared with a backfill of the same alerts.
+    :param clock: function returning the current time in seconds.
+    :type targets: list
+    :type rate: float
+    :type burst: float
+    :type interval: float or :class:`AdaptiveInterval`
+    :type workers: int
+    :type per_token: int
+    :type limit: str
+    :type on_mentions: callable
+    :type transport: :class:`mention.transport.Transport`
+    :type seen: :class:`mention.dedupe.SeenIds`
+    :type clock: callable
+    """
+
+    def __init__(self,
+                 targets,
+                 rate=1.0,
+                 burst=5,
+                 interval=60.0,
+                 workers=16,
+                 per_token=4,
+                 limit="100",
+                 on_mentions=None,
+                 transport=None,
+                 seen=None,
+                 clock=time.monotonic):
+        self.targets = list(targets)
+        if isinstance(interval, (int, float)):
+            interval = FixedInterval(interval)
+        self.interval = interval
+        self.workers = workers
+        self.per_token = per_token
+        self.limit = limit
+        self.on_mentions = on_mentions
+        self.transport = transport
+        self.seen = seen
+        self._clock = clock
+        self._tokens = {}
+        for target in self.targets:
+            token = self._tokens.get(target.access_token)
+            if token is None:
+                token = self._tokens[target.access_token] = _Token(
+                    TokenBucket(rate, burst, clock=clock))
+            token.targets.append(target)
+        self._in_flight = 0
+        self._turn = 0
+        self._started = None
+        self._stopped = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def _dispatch(self, pool):
+        """Starts the polls that are ready and within budget.
+
+        :return: seconds until a poll may become ready.
+        :rtype: float
+        """
+        now = self._clock()
+        wait = 1.0
+        # The tokens take turns at the free workers.
+        tokens = list(self._tokens.values())
+        if not tokens:
+            return wait
+        self._turn = (self._turn + 1) % len(tokens)
+        for token in tokens[self._turn:] + tokens[:self._turn]:
+            while (self._in_flight < self.workers and
+                   token.in_flight < self.per_token):
+                target = token.next_target(now)
+                if target is None:
+                    break
+                if not token.bucket.try_acquire():
+                    wait = min(wait, 1.0 / token.bucket.rate
+                               if token.bucket.rate else 1.0)
+                    break
+                token.start(target)
+                self._in_flight += 1
+                pool.submit(self._poll, token, target)
+            for target in token.targets:
+                if not target._busy and target._due > now:
+                    wait = min(wait, target._due - now)
+        return wait
+
+    def _poll(self, token, target):
+        client = base.FetchAllMentionsAPI(
+            target.access_token, target.account_id, target.alert_id,
+            since_id=target.since_id, limit=self.limit)
+        if self.transport is not None:
+            client.transport = self.transport
+        mentions = None
+        full = False
+        try:
+            page = client.query()
+            found = page["mentions"]
+            full = len(found) >= int(self.limit)
+            if self.seen is not None:
+                # The ids are added once the mentions are handed over, so a
+                # failed callback gets them again on the next poll.
+                found = [mention for mention in found
+                         if mention["id"] not in self.seen]
+            if self.on_mentions is not None and found:
+                self.on_mentions(target, found)
+            if self.seen is not None:
+                found = list(self.seen.filter(found))
+            pull = page.get("_links", {}).get("pull")
+            if pull:
+                target.since_id = pull["params"]["since_id"]
+            mentions = found
+            target.polls += 1
+            target.mentions += len(mentions)
+        except Exception as error:
+            target.errors += 1
+            target.last_error = error
+        finally:
+            with self._condition:
+                target._busy = False
+                token.in_flight -= 1
+                self._in_flight -= 1
+                now = self._clock()
+                seconds = None
+                if mentions is not None:
+                    if target.polled_at is not None:
+                        seconds = now - target.polled_at
+                    target.polled_at = now
+                target.interval = self.interval.update(
+                    target, None if mentions is None else len(mentions),
+                    seconds, full)
+                target._due = now + target.interval
+                self._condition.notify()
+
+    def run(self, duration=None):
+        """Polls the targets until :meth:`stop` is called or the duration
+        has elapsed, then waits for the polls in flight.
+
+        :param duration: seconds to run, None to run until stopped.
+        :type duration: float
+        """
+        self._started = self._clock()
+        stop_at = None if duration is None else self._started + duration
+        with ThreadPoolExecutor(self.workers) as pool:
+            with self._condition:
+                while not self._stopped:
+                    wait = self._dispatch(pool)
+                    if stop_at is not None:
+                        left = stop_at - self._clock()
+                        if left <= 0:
+                            break
+                        wait = min(wait, left)
+                    self._condition.wait(wait)
+
+    def start(self):
+        """Runs the scheduler on a background thread.
+
+        :return: the scheduler.
+        :rtype: :class:`PollingScheduler`
+        """
+        self._stopped = False
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the scheduler and waits for the polls in flight."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self):
+        """Returns the progress and freshness of every target.
+
+        :return: for each `(account_id, alert_id)`, the weight, the numbers
+         of polls, mentions and errors, the `since_id`, the estimated rate
+         of new mentions, the interval until the next poll and the freshness
+         lag: the seconds since the last successful poll, or since the
+         scheduler started if there was none.
+        :rtype: dict
+        """
+        now = self._clock()
+        report = {}
+        for target in self.targets:
+            polled_at = target.polled_at
+            if polled_at is None:
+                polled_at = now if self._started is None else self._started
+            report[target.key] = {
+                "weight": target.weight,
+                "polls": target.polls,
+                "mentions": target.mentions,
+                "errors": target.errors,
+                "since_id": target.since_id,
+                "rate": target.rate,
+                "interval": target.interval,
+                "lag": now - polled_at,
+            }
+        return report
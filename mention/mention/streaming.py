@@ -0,0 +1,234 @@
+"""Incremental parsing of large JSON responses.
+
+A page of 1000 mentions is several megabytes of JSON. Instead of buffering
+the whole body and decoding it at once, :class:`JSONArrayStream` decodes the
+items of one array of the top level object as the bytes arrive and yields
+each item right away. Only the current item and the unparsed tail of the
+last chunk are kept in memory. The other members of the object, such as
+`_links`, are collected in :attr:`JSONArrayStream.metadata`.
+
+:Example:
+
+>>> stream = FetchAllMentionsAPI(access_token, account_id, alert_id,
+...                              limit='1000').query_stream()
+>>> for mention in stream:
+...     process(mention)
+>>> cursor = stream.metadata['_links']['more']['params']['cursor']
+"""
+import codecs
+import json
+from json.decoder import scanstring
+
+#: Size of the chunks read from the response body.
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+_decoder = json.JSONDecoder()
+
+_CONTINUE = object()
+_DONE = object()
+
+
+class _NeedMoreData(Exception):
+    pass
+
+
+class JSONArrayStream(object):
+    """Iterates over the items of an array member of a streamed JSON object.
+
+    :param chunks: iterable of the bytes of the JSON document.
+    :param key: name of the array member whose items are yielded.
+    :type chunks: iterable
+    :type key: str
+    """
+
+    def __init__(self, chunks, key):
+        self.key = key
+        self.metadata = {}
+        self.count = 0
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._state = self._start
+        self._member = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                item = self._state()
+            except _NeedMoreData:
+                if self._eof:
+                    raise ValueError("Truncated JSON document")
+                self._read()
+                continue
+            if item is _CONTINUE:
+                continue
+            if item is _DONE:
+                raise StopIteration
+            self.count += 1
+            return item
+
+    @property
+    def complete(self):
+        """Whether the whole document has been parsed."""
+        return self._state == self._done
+
+    def _read(self):
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buffer += self._text.decode(b"", True)
+        else:
+            self._buffer += self._text.decode(chunk)
+
+    def _skip(self):
+        """Skips whitespace and returns the next character."""
+        buffer = self._buffer
+        pos = self._pos
+        length = len(buffer)
+        while pos < length and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        if pos == length:
+            raise _NeedMoreData
+        return buffer[pos]
+
+    def _value(self):
+        """Decodes the JSON value at the current position."""
+        self._skip()
+        try:
+            value, end = _decoder.raw_decode(self._buffer, self._pos)
+        except ValueError:
+            if self._eof:
+                raise
+            raise _NeedMoreData
+        if not self._eof and (end == len(self._buffer) or
+                              self._buffer[end] not in _DELIMITERS):
+            # A number such as `2.` could continue in the next chunk.
+            raise _NeedMoreData
+        self._pos = end
+        return value
+
+    def _start(self):
+        if self._skip() != "{":
+            raise ValueError("Expected a JSON object")
+        self._pos += 1
+        self._state = self._first_member
+        return _CONTINUE
+
+    def _first_member(self):
+        if self._skip() == "}":
+            self._pos += 1
+            self._state = self._done
+            return _CONTINUE
+        self._state = self._member_name
+        return _CONTINUE
+
+    def _next_member(self):
+        char = self._skip()
+        self._pos += 1
+        if char == "}":
+            self._state = self._done
+        elif char == ",":
+            self._state = self._member_name
+        else:
+            raise ValueError("Expected ',' or '}' in JSON object")
+        return _CONTINUE
+
+    def _member_name(self):
+        if self._skip() != '"':
+            raise ValueError("Expected a member name in JSON object")
+        try:
+            name, end = scanstring(self._buffer, self._pos + 1)
+        except ValueError:
+            raise _NeedMoreData
+        buffer = self._buffer
+        while end < len(buffer) and buffer[end] in _WHITESPACE:
+            end += 1
+        if end == len(buffer):
+            raise _NeedMoreData
+        if buffer[end] != ":":
+            raise ValueError("Expected ':' in JSON object")
+        self._pos = end + 1
+        self._member = name
+        self._state = self._member_value
+        return _CONTINUE
+
+    def _member_value(self):
+        if self._member == self.key and self._skip() == "[":
+            self._pos += 1
+            self._state = self._first_item
+            return _CONTINUE
+        self.metadata[self._member] = self._value()
+        self._state = self._next_member
+        return _CONTINUE
+
+    def _first_item(self):
+        if self._skip() == "]":
+            self._pos += 1
+            self._state = self._next_member
+            return _CONTINUE
+        self._state = self._item
+        return _CONTINUE
+
+    def _item(self):
+        item = self._value()
+        self._state = self._next_item
+        return item
+
+    def _next_item(self):
+        char = self._skip()
+        self._pos += 1
+        if char == "]":
+            self._state = self._next_member
+        elif char == ",":
+            self._state = self._item
+        else:
+            raise ValueError("Expected ',' or ']' in JSON array")
+        return _CONTINUE
+
+    def _done(self):
+        # Reads to the end of the chunks, so that their producer finishes
+        # and releases the connection.
+        while not self._eof:
+            self._read()
+        if self._buffer[self._pos:].strip(_WHITESPACE):
+            raise ValueError("Extra data after JSON document")
+        return _DONE
+
+
+def json_lines(chunks):
+    """Decodes a streamed body made of one JSON document per line.
+
+    Blank lines, sent by some servers to keep the connection open, are
+    skipped.
+
+    :param chunks: iterable of the bytes of the body.
+    :type chunks: iterable
+
+    :return: an iterator over the decoded lines.
+    :rtype: generator
+    """
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        if b"\n" not in chunk:
+            continue
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
@@ -0,0 +1,124 @@
+"""Optional tracing of Mention API calls.
+
+Spans are emitted through OpenTelemetry when the ``opentelemetry-api``
+package is installed. Otherwise every span is a no-op, so tracing costs
+nothing for users who do not need it. The tracing SDK is only imported the
+first time a span is started, never at ``import mention`` time.
+
+:Example:
+
+>>> from mention import tracing
+>>> with tracing.span("backfill", alert_id="1849085") as parent:
+...     data = FetchAllMentionsAPI(access_token, account_id, alert_id).query()
+"""
+from contextlib import contextmanager
+
+_tracer = None
+
+
+class _NoopSpan(object):
+    """Span used when no tracing SDK is available."""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+class _NoopTracer(object):
+    """Tracer used when no tracing SDK is available."""
+
+    _span = _NoopSpan()
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        yield self._span
+
+
+def get_tracer():
+    """Returns the tracer used for Mention API spans.
+
+    The OpenTelemetry tracer is looked up lazily on first use and cached.
+
+    :return: an OpenTelemetry tracer or a no-op tracer.
+    :rtype: object
+    """
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            _tracer = _NoopTracer()
+        else:
+            _tracer = trace.get_tracer("mention")
+    return _tracer
+
+
+def set_tracer(tracer):
+    """Sets the tracer used for Mention API spans.
+
+    :param tracer: any object with an OpenTelemetry compatible
+     `start_as_current_span` method, or None to restore the default lookup.
+    :type tracer: object
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def set_attributes(current, **attributes):
+    """Sets the attributes on a span, skipping those without a value.
+
+    :param current: span returned by :func:`span`.
+    :type current: object
+    """
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute("mention." + key, value)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Starts a span that becomes the parent of spans started inside it.
+
+    :param name: name of the span, e.g. the endpoint class name.
+    :param attributes: span attributes, prefixed with `mention.`. Attributes
+     whose value is None are skipped.
+    :type name: str
+    """
+    with get_tracer().start_as_current_span(name) as current:
+        set_attributes(current, **attributes)
+        yield current
+
+
+def query_span(endpoint):
+    """Starts the span around a single `query()` call of an endpoint.
+
+    :param endpoint: the endpoint instance being queried.
+    :type endpoint: :class:`mention.base.Mention`
+    """
+    return span("mention." + type(endpoint).__name__,
+                endpoint=type(endpoint).__name__,
+                alert_id=getattr(endpoint, "alert_id", None),
+                cursor=getattr(endpoint, "cursor", None),
+                page=getattr(endpoint, "page", None),
+                attempt=getattr(endpoint, "attempt", None))
+
+
+def record_response(current, response):
+    """Records the outcome of an HTTP response on a span, along with what
+    the transports noted on it: the number of requests sent for it, hedges
+    included, in `attempts`, and whether it was the probe of a half-open
+    circuit in `circuit_probe`.
+
+    :param current: span returned by :func:`span`.
+    :param response: the HTTP response.
+    :type current: object
+    :type response: :class:`requests.Response`
+    """
+    set_attributes(current,
+                   status_code=response.status_code,
+                   response_size=len(response.content),
+                   wire_size=getattr(response, "wire_size", None),
+                   attempts=getattr(response, "attempts", None),
+                   circuit_probe=getattr(response, "circuit_probe", None))
@@ -0,0 +1,655 @@
+"""Transports used by the endpoint classes to send HTTP requests.
+
+Every endpoint class sends its request through a transport. By default this
+is a :class:`RequestsTransport` shared by all endpoints, which keeps a pooled
+`requests` session. A different transport can be set on the
+:class:`mention.base.Mention` class, on a single endpoint instance, or as the
+process wide default with :func:`set_default_transport`.
+
+:class:`RecordingTransport` and :class:`ReplayTransport` record real
+request/response pairs to a compact cassette file and play them back, which
+makes performance tests deterministic.
+
+:class:`HTTP2Transport` multiplexes concurrent requests over a few HTTP/2
+connections; it needs the optional `httpx` and `h2` packages.
+
+:Example:
+
+>>> from mention import transport
+>>> with transport.RecordingTransport("backfill.cassette") as recorder:
+...     FetchAllMentionsAPI.transport = recorder
+...     data = FetchAllMentionsAPI(access_token, account_id, alert_id).query()
+
+>>> FetchAllMentionsAPI.transport = transport.ReplayTransport(
+...     "backfill.cassette", realtime=False)
+"""
+import base64
+import gzip
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from mention import compression, streaming
+from mention.exceptions import (RequestTimeoutException,
+                                UnrecordedRequestException)
+
+_default = None
+_default_lock = threading.Lock()
+
+
+class Transport(object):
+    """Base class of the transports.
+
+    A transport sends a request for an endpoint and returns a
+    :class:`requests.Response`.
+    """
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        """Sends a request.
+
+        :param method: HTTP method.
+        :param url: full url of the request.
+        :param access_token: Mention API `access_token`.
+        :param data: body of the request.
+        :param stream: if True, the body is not read before returning, so it
+         can be consumed incrementally with `iter_content`.
+        :param timeout: seconds to wait for the connection and for each read
+         of the response, or a `(connect, read)` tuple. None waits forever.
+        :type method: str
+        :type url: str
+        :type access_token: str
+        :type data: str
+        :type stream: bool
+        :type timeout: float or tuple
+
+        :return: the response.
+        :rtype: :class:`requests.Response`
+
+        :raises RequestTimeoutException: if the server does not answer in
+         time.
+        """
+        raise NotImplementedError
+
+    async def arequest(self, method, url, access_token, data=None,
+                       timeout=None):
+        """Sends a request from a coroutine.
+
+        The default implementation runs :meth:`request` in the default
+        executor of the running event loop.
+
+        :param method: HTTP method.
+        :param url: full url of the request.
+        :param access_token: Mention API `access_token`.
+        :param data: body of the request.
+        :param timeout: timeouts of the request, see :meth:`request`.
+        :type method: str
+        :type url: str
+        :type access_token: str
+        :type data: str
+        :type timeout: float or tuple
+
+        :return: the response, with its body read.
+        :rtype: :class:`requests.Response`
+        """
+        import asyncio
+        from functools import partial
+
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.request, method, url, access_token, data,
+                          timeout=timeout))
+
+    def close(self):
+        """Releases the resources held by the transport."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class RequestsTransport(Transport):
+    """Sends requests through a pooled :class:`requests.Session`.
+
+    :param session: session to use, a new one is created if omitted.
+    :param compression: True to accept every available content coding,
+     see :mod:`mention.compression`, a value of the `Accept-Encoding`
+     header such as ``"gzip"``, or False for uncompressed responses.
+    :type session: :class:`requests.Session`
+    :type compression: bool or str
+    """
+
+    def __init__(self, session=None, compression=True):
+        if session is None:
+            import requests
+            session = requests.Session()
+        self.session = session
+        self.compression = compression
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        from requests.exceptions import Timeout
+        from requests_oauth2 import OAuth2BearerToken
+        from urllib3.exceptions import ReadTimeoutError
+
+        try:
+            response = self.session.request(
+                method, url, data=data, stream=True, timeout=timeout,
+                headers={"Accept-Encoding":
+                         _accept_encoding(self.compression)},
+                auth=OAuth2BearerToken(access_token))
+        except Timeout as error:
+            raise RequestTimeoutException(str(error)) from error
+        chunks = _timed_out(response.raw.stream(_chunk_size(response.headers),
+                                                decode_content=False),
+                            ReadTimeoutError, response.close)
+        return _DecodedResponse(response, chunks, response.raw.release_conn,
+                                stream)
+
+    def close(self):
+        self.session.close()
+
+
+class HTTP2Transport(Transport):
+    """Sends requests over HTTP/2 with `httpx`, multiplexing concurrent
+    requests over a few connections instead of opening one connection per
+    request in flight.
+
+    The transport can be shared by threads through :meth:`request`, and by
+    coroutines through :meth:`arequest`, e.g. with
+    :meth:`mention.base.Mention.aquery`. The threads share one connection
+    pool and the coroutines another, which is replaced when the transport
+    is used from a new event loop.
+
+    Requires the optional `httpx` and `h2` packages, e.g.
+    ``pip install mention[http2]``.
+
+    :Example:
+
+    >>> Mention.transport = HTTP2Transport()
+    >>> with ThreadPoolExecutor(64) as pool:
+    ...     pages = list(pool.map(FetchAllMentionsAPI.query, clients))
+
+    :param prior_knowledge: if True, HTTP/2 is used without negotiation,
+     which plain `http://` urls such as a local fake server need. Otherwise
+     HTTP/2 is negotiated during the TLS handshake, falling back to
+     HTTP/1.1.
+    :param max_connections: maximum number of connections of each pool.
+    :param timeout: timeout of the requests in seconds.
+    :param compression: True to accept every available content coding,
+     see :mod:`mention.compression`, a value of the `Accept-Encoding`
+     header such as ``"gzip"``, or False for uncompressed responses.
+    :type prior_knowledge: bool
+    :type max_connections: int
+    :type timeout: float
+    :type compression: bool or str
+    """
+
+    def __init__(self, prior_knowledge=False, max_connections=4,
+                 timeout=30.0, compression=True):
+        import httpx
+
+        self.compression = compression
+
+        self._options = dict(
+            http1=not prior_knowledge, http2=True, timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections))
+        self.client = httpx.Client(**self._options)
+        self.async_client = None
+        self._loop = None
+
+    def _headers(self, access_token):
+        return {"Authorization": "Bearer " + access_token,
+                "Accept-Encoding": _accept_encoding(self.compression)}
+
+    def _build_request(self, client, method, url, access_token, data,
+                       timeout):
+        import httpx
+
+        options = {}
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            options["timeout"] = httpx.Timeout(read, connect=connect)
+        elif timeout is not None:
+            options["timeout"] = httpx.Timeout(timeout)
+        return client.build_request(method, url, content=data,
+                                    headers=self._headers(access_token),
+                                    **options)
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        import httpx
+
+        request = self._build_request(self.client, method, url, access_token,
+                                      data, timeout)
+        try:
+            response = self.client.send(request, stream=True)
+        except httpx.TimeoutException as error:
+            raise RequestTimeoutException(str(error)) from error
+        chunks = _timed_out(response.iter_raw(_chunk_size(response.headers)),
+                            httpx.TimeoutException, response.close)
+        return _DecodedResponse(response, chunks, response.close, stream)
+
+    async def arequest(self, method, url, access_token, data=None,
+                       timeout=None):
+        import asyncio
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self.async_client is None or self._loop is not loop:
+            # Connections of an async client belong to one event loop.
+            self.async_client = httpx.AsyncClient(**self._options)
+            self._loop = loop
+        request = self._build_request(self.async_client, method, url,
+                                      access_token, data, timeout)
+        try:
+            response = await self.async_client.send(request, stream=True)
+            try:
+                chunks = [chunk async for chunk in response.aiter_raw()]
+            finally:
+                await response.aclose()
+        except httpx.TimeoutException as error:
+            raise RequestTimeoutException(str(error)) from error
+        return _DecodedResponse(response, chunks, None, False)
+
+    def close(self):
+        self.client.close()
+
+    async def aclose(self):
+        """Closes the connections of both APIs."""
+        import asyncio
+
+        self.client.close()
+        if (self.async_client is not None and
+                self._loop is asyncio.get_running_loop()):
+            await self.async_client.aclose()
+        self.async_client = None
+        self._loop = None
+
+
+def _chunk_size(headers):
+    # Compressed bodies are read in smaller chunks, so that each chunk
+    # decompresses to about CHUNK_SIZE bytes.
+    if headers.get("Content-Encoding", "identity") == "identity":
+        return streaming.CHUNK_SIZE
+    return streaming.CHUNK_SIZE // 8
+
+
+def _timed_out(chunks, timeouts, close):
+    """Raises :class:`RequestTimeoutException` when a read of the body times
+    out, closing the connection that is left in an unknown state."""
+    try:
+        for chunk in chunks:
+            yield chunk
+    except timeouts as error:
+        close()
+        raise RequestTimeoutException(str(error)) from error
+
+
+def _accept_encoding(codings):
+    if codings is True:
+        return compression.accept_encoding()
+    return codings or "identity"
+
+
+class _DecodedResponse(object):
+    """Exposes a `requests` or `httpx` response with the part of the
+    :class:`requests.Response` interface used by the endpoints.
+
+    The body is decompressed from the raw chunks while it is read, see
+    :class:`mention.compression.DecodingStream`.
+
+    :param response: the underlying response.
+    :param chunks: raw chunks of the body.
+    :param release: called once the body has been read completely, to
+     return the connection to its pool.
+    :param stream: if False, the body is read before returning.
+    """
+
+    def __init__(self, response, chunks, release, stream):
+        self._response = response
+        self._release = release
+        self._content = None
+        self.body = compression.DecodingStream(
+            chunks, response.headers.get("Content-Encoding"))
+        if not stream:
+            self.content
+
+    @property
+    def status_code(self):
+        return self._response.status_code
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+    @property
+    def url(self):
+        return str(self._response.url)
+
+    @property
+    def encoding(self):
+        return self._response.encoding
+
+    @property
+    def elapsed(self):
+        return self._response.elapsed
+
+    @property
+    def http_version(self):
+        return getattr(self._response, "http_version", "HTTP/1.1")
+
+    @property
+    def wire_size(self):
+        """Bytes of the body received, before decompression."""
+        return self.body.wire_size
+
+    @property
+    def size(self):
+        """Bytes of the body after decompression."""
+        return self.body.size
+
+    def _read(self):
+        for chunk in self.body:
+            yield chunk
+        if self._release is not None:
+            self._release()
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self._read())
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        if self._content is not None:
+            return iter([self._content])
+        return self._read()
+
+    def iter_lines(self):
+        pending = b""
+        for chunk in self.iter_content():
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line:
+                    yield line
+        if pending:
+            yield pending
+
+    def raise_for_status(self):
+        self._response.raise_for_status()
+
+    def close(self):
+        self._response.close()
+
+
+def default_transport():
+    """Returns the transport used by endpoints that do not set their own.
+
+    :rtype: :class:`Transport`
+    """
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = RequestsTransport()
+    return _default
+
+
+def set_default_transport(transport):
+    """Sets the transport used by endpoints that do not set their own.
+
+    :param transport: the transport, or None to restore the default
+     :class:`RequestsTransport`.
+    :type transport: :class:`Transport`
+    """
+    global _default
+    _default = transport
+
+
+def _key(method, url, data):
+    """Identifies a request independently of the host it was sent to."""
+    parts = urlsplit(url)
+    return method, parts.path.split("/api", 1)[-1], parts.query, data or ""
+
+
+#: Headers that are not recorded: the bodies are recorded decompressed, and
+#: the cookies like the access tokens are secrets.
+_UNRECORDED_HEADERS = frozenset(["content-encoding", "content-length",
+                                 "transfer-encoding", "connection",
+                                 "set-cookie"])
+
+
+class RecordingTransport(Transport):
+    """Records the requests sent through another transport to a cassette.
+
+    A cassette is a gzip compressed file with one JSON record per request.
+    Bodies are stored as text when they are valid UTF-8 and as base64
+    otherwise, along with the size and arrival time of each chunk, so that a
+    streamed response is replayed in the same chunks at the same pace. A
+    record is written once the body has been read or the response closed.
+    Access tokens and cookies are not recorded.
+
+    :param path: path of the cassette file.
+    :param transport: transport that sends the requests, the default
+     transport if omitted.
+    :type path: str
+    :type transport: :class:`Transport`
+    """
+
+    def __init__(self, path, transport=None):
+        self.path = path
+        self.transport = transport or default_transport()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        started = time.perf_counter()
+        # The body is always streamed, to time its chunks.
+        response = self.transport.request(method, url, access_token, data,
+                                          stream=True, timeout=timeout)
+        record = {
+            "method": method,
+            "url": url,
+            "data": data,
+            "status": response.status_code,
+            "headers": dict((name, value) for name, value
+                            in response.headers.items()
+                            if name.lower() not in _UNRECORDED_HEADERS),
+            "elapsed": round(time.perf_counter() - started, 6),
+        }
+        response = _RecordedResponse(self, record, response, started)
+        if not stream:
+            response.content
+        return response
+
+    def _write(self, record, content):
+        try:
+            record["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            record["body"] = base64.b64encode(content).decode("ascii")
+            record["encoding"] = "base64"
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class _RecordedResponse(object):
+    """Response of a :class:`RecordingTransport`, which records the chunks
+    of the body while they are read.
+
+    :param recorder: the transport writing the record.
+    :param record: the record of the request, without its body.
+    :param response: the response of the underlying transport.
+    :param started: time the request was sent.
+    """
+
+    def __init__(self, recorder, record, response, started):
+        self._recorder = recorder
+        self._record = record
+        self._response = response
+        self._started = started
+        self._chunks = []
+        self._content = None
+        record["chunks"] = []
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def _save(self):
+        if self._recorder is not None:
+            recorder, self._recorder = self._recorder, None
+            recorder._write(self._record, b"".join(self._chunks))
+
+    def iter_content(self, chunk_size=1):
+        if self._content is not None:
+            return iter([self._content])
+        return self._read(chunk_size)
+
+    def _read(self, chunk_size):
+        for chunk in self._response.iter_content(chunk_size):
+            if chunk:
+                self._chunks.append(chunk)
+                self._record["chunks"].append(
+                    [round(time.perf_counter() - self._started, 6),
+                     len(chunk)])
+            yield chunk
+        self._save()
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = b"".join(self._read(streaming.CHUNK_SIZE))
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        # A body closed before its end is recorded as it was received.
+        self._save()
+        self._response.close()
+
+
+class _ReplayedBody(object):
+    """Raw body of a replayed response, in the chunks of the recording."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def stream(self, amount=None, decode_content=True):
+        return self._chunks
+
+    def close(self):
+        self._chunks.close()
+
+
+class ReplayTransport(Transport):
+    """Plays back the responses recorded in a cassette.
+
+    Requests are matched on method, path, query string and body, ignoring
+    the host. Repeated requests are answered with the recorded responses in
+    order.
+
+    :param path: path of the cassette file.
+    :param realtime: if True, every response and every chunk of its body
+     is delayed by the time it originally took, and a wait longer than the
+     read timeout of the request raises :class:`RequestTimeoutException`;
+     otherwise responses are returned as fast as possible.
+    :param loop: if True, the recorded responses of a request are replayed
+     again from the start once exhausted.
+
+    :type path: str
+    :type realtime: bool
+    :type loop: bool
+    """
+
+    def __init__(self, path, realtime=False, loop=True):
+        self.realtime = realtime
+        self.loop = loop
+        self._recorded = defaultdict(list)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            for line in cassette:
+                record = json.loads(line)
+                key = _key(record["method"], record["url"], record["data"])
+                self._recorded[key].append(record)
+
+    def _next(self, key):
+        with self._lock:
+            pending = self._pending.get(key)
+            if not pending:
+                if key not in self._recorded or (
+                        pending is not None and not self.loop):
+                    raise UnrecordedRequestException(
+                        "No recorded response for {0} {1}".format(*key))
+                pending = self._pending[key] = deque(self._recorded[key])
+            return pending.popleft()
+
+    def _wait(self, seconds, timeout):
+        if not self.realtime:
+            return
+        read = timeout[1] if isinstance(timeout, tuple) else timeout
+        if read is not None and seconds > read:
+            time.sleep(read)
+            raise RequestTimeoutException(
+                "Read timed out after {0}s".format(read))
+        time.sleep(max(seconds, 0))
+
+    def _chunks(self, record, content, timeout):
+        # Records without chunks get their body with the headers.
+        chunks = record.get("chunks") or [[record["elapsed"], len(content)]]
+        previous = record["elapsed"]
+        offset = 0
+        for at, size in chunks:
+            self._wait(at - previous, timeout)
+            previous = at
+            yield content[offset:offset + size]
+            offset += size
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        import requests
+
+        record = self._next(_key(method, url, data))
+        self._wait(record["elapsed"], timeout)
+
+        body = record["body"]
+        if record.get("encoding") == "base64":
+            content = base64.b64decode(body)
+        else:
+            content = body.encode("utf-8")
+
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.headers.update(record["headers"])
+        response.url = url
+        response.encoding = "utf-8"
+        response.elapsed = timedelta(seconds=record["elapsed"])
+        response.raw = _ReplayedBody(self._chunks(record, content, timeout))
+        if not stream:
+            response.content
+        return response
@@ -1,16 +1,86 @@
-def transform_date(date):
-    """Encodes date and timke into url format.
+from datetime import date as _date, datetime, time, timezone
+from functools import lru_cache
+
+from mention.routes import encode
+
+
+def format_date(date):
+    """Formats a date and time as expected by the API, in ISO 8601 format
+    with a timezone.
+
+    Naive datetimes and strings in 'yyyy-MM-dd HH:mm' format are taken as
+    UTC, dates as midnight UTC. Strings in ISO 8601 format are validated,
+    and taken as UTC if they have no offset. Results are memoized, since
+    windowed backfills format the same boundaries for many endpoints.
+
+    :Example:
+
+    >>> format_date('2018-11-25 12:00')
+    '2018-11-25T12:00:00+00:00'
+    >>> from datetime import datetime, timedelta, timezone
+    >>> format_date(datetime(2018, 11, 25, 12,
+    ...                      tzinfo=timezone(timedelta(hours=1))))
+    '2018-11-25T12:00:00+01:00'
 
     :param date: Date and time.
-    :type date: str
+    :type date: datetime, date or str
+
+    :return: date in ISO 8601 format.
+    :rtype: str
+
+    :raises ValueError: if a string is not a valid date in either format.
+    """
+    if isinstance(date, datetime):
+        # Aware datetimes of the same instant are equal whatever their
+        # timezone, so the offset is part of the cache key.
+        return _format_datetime(date, date.utcoffset())
+    if isinstance(date, _date):
+        return _format_datetime(datetime.combine(date, time()), None)
+    return _format_string(date)
+
+
+@lru_cache(maxsize=4096)
+def _format_datetime(date, offset):
+    if offset is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.isoformat()
+
+
+@lru_cache(maxsize=4096)
+def _format_string(date):
+    if "T" in date:
+        if date.endswith("Z"):
+            # Not read by fromisoformat before Python 3.11.
+            date = date[:-1] + "+00:00"
+        moment = datetime.fromisoformat(date)
+    else:
+        moment = datetime.strptime(date, "%Y-%m-%d %H:%M")
+    return _format_datetime(moment, moment.utcoffset())
+
+
+def transform_date(date):
+    """Encodes date and time into url format.
+
+    :param date: Date and time, see :func:`format_date`.
+    :type date: datetime, date or str
 
     :return: encoded date.
     :rtype: str
     """
-    index = date.find(' ')
-    date = (date[:index] + 'T' + date[index + 1:] +
-            ":00.12345+00:00").replace(':', '%3A').replace('+', '%2B')
-    return date
+    return encode(format_date(date))
+
+
+def transform_dates(dates):
+    """Encodes a sequence of dates into url format in one pass, e.g. the
+    boundaries of backfill windows.
+
+    :param dates: Dates and times, see :func:`format_date`.
+    :type dates: iterable
+
+    :return: the encoded dates.
+    :rtype: list
+    """
+    return [transform_date(date) for date in dates]
 
 
 def transform_boolean(value):
@@ -37,9 +107,9 @@ def transform_tone(tone):
     :return: number representation of tone.
     :rtype: str
     """
-    if 'negative':
+    if tone == 'negative':
         return '-1'
-    elif 'neutral':
+    elif tone == 'neutral':
         return '0'
     else:
         return '1'
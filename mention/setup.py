@@ -19,7 +19,13 @@ setup(
     description="A Python wrapper around the Mention API.",
     long_description=long_description,
     long_description_content_type="text/x-rst",
+    python_requires=">=3.9",
     install_requires=["requests", "requests_oauth2>=0.3.0"],
+    extras_require={
+        "tracing": ["opentelemetry-api"],
+        "http2": ["httpx[http2]"],
+        "compression": ["brotli", "zstandard"],
+    },
     project_urls={
         "Coverage": "https://codecov.io/gh/mazi76erX2/mention-python",
         "Documentation": "https://mention-python.readthedocs.io/en/latest/",
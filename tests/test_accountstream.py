@@ -0,0 +1,168 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.accountstream import AccountStream
+from mention.base import StreamMentionsAPI
+from mention.exceptions import InvalidResponseException
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.transport import Transport
+
+
+class _FailingTransport(Transport):
+
+    def __init__(self, error, stream=None, attempts=2):
+        self.error = error
+        self.stream = stream
+        self.attempts = attempts
+        self.sent = 0
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        self.sent += 1
+        if self.stream is not None and self.sent >= self.attempts:
+            self.stream.stop()
+        raise self.error
+
+
+class TestStreamMentionsAPI(unittest.TestCase):
+
+    def test_url(self):
+        client = StreamMentionsAPI("a", "123", ["1", 2, "3"],
+                                   since_ids={"1": "456", 3: 789})
+
+        self.assertEqual(
+            client.url,
+            "https://stream.mention.net/api/accounts/123/mentions?"
+            "alerts[]=1&alerts[]=2&alerts[]=3&"
+            "since_id[1]=456&since_id[3]=789")
+
+    def test_can_only_be_streamed(self):
+        with self.assertRaises(TypeError):
+            StreamMentionsAPI("a", "123", ["1"]).query()
+
+    def test_exported(self):
+        self.assertIs(mention.StreamMentionsAPI, StreamMentionsAPI)
+
+
+class TestAccountStream(unittest.TestCase):
+
+    def setUp(self):
+        self.data = SyntheticData(seed=9, alerts_per_account=3,
+                                  mentions_per_alert=20)
+        self.account_id = self.data.account_ids[0]
+        self.alert_ids = self.data.alert_ids(self.account_id)
+        self.server = FakeMentionServer(self.data, stream_rate=200,
+                                        stream_duration=0.1).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(self.server.redirect(StreamMentionsAPI).start().stop)
+
+    def ids(self, alert_id):
+        return [str(mention_id)
+                for mention_id in self.data.alert(self.account_id,
+                                                  alert_id).ids]
+
+    def stream(self, alerts, **kwargs):
+        return AccountStream("a", self.account_id, alerts, backoff=0.01,
+                             **kwargs)
+
+    def take(self, stream, count):
+        received = []
+        for alert, mention_ in stream:
+            received.append((alert, mention_))
+            if len(received) == count:
+                stream.stop()
+        return received
+
+    def test_mentions_are_routed_to_their_alert(self):
+        first, second, third = self.alert_ids
+        routed = defaultdict(list)
+        stream = self.stream([first, second])
+        stream.on(first, lambda m: routed[first].append(m))
+
+        def stop_after_some(mention_):
+            routed[second].append(mention_)
+            if len(routed[first]) + len(routed[second]) >= 60:
+                stream.stop()
+        stream.on(second, stop_after_some)
+        stream.run()
+
+        self.assertGreater(len(routed[first]), 0)
+        self.assertGreater(len(routed[second]), 0)
+        for alert in (first, second):
+            self.assertTrue(all(str(m["alert_id"]) == alert
+                                for m in routed[alert]))
+        self.assertNotIn(third, routed)
+
+    def test_resubscribes_from_each_since_id(self):
+        first, second, _ = self.alert_ids
+        since_ids = {first: self.ids(first)[9], second: self.ids(second)[14]}
+        stream = self.stream([first, second], since_ids=since_ids)
+
+        received = self.take(stream, 200)
+
+        self.assertGreater(stream.connections, 1)
+        by_alert = defaultdict(list)
+        for alert, mention_ in received:
+            by_alert[alert].append(mention_["id"])
+        # The backlog after each since_id comes first, then the new
+        # mentions, none twice across the connections.
+        self.assertEqual(by_alert[first][:10], self.ids(first)[10:20])
+        self.assertEqual(by_alert[second][:5], self.ids(second)[15:20])
+        for alert in (first, second):
+            ids = [int(mention_id) for mention_id in by_alert[alert]]
+            self.assertEqual(ids, sorted(set(ids)))
+            self.assertEqual(stream.since_ids[alert], by_alert[alert][-1])
+
+    def test_checkpoint(self):
+        first, second, _ = self.alert_ids
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "stream.json")
+        since_ids = {first: self.ids(first)[0], second: self.ids(second)[0]}
+
+        stream = self.stream([first, second], since_ids=since_ids,
+                             checkpoint=path, checkpoint_every=5)
+        received = self.take(stream, 12)
+        resumed = self.stream([first, second], since_ids=since_ids,
+                              checkpoint=path)
+
+        self.assertEqual(resumed.since_ids, stream.since_ids)
+        self.assertEqual(resumed.since_ids[first], received[-1][1]["id"])
+        next_alert, next_mention = next(iter(resumed))
+        self.assertEqual((next_alert, next_mention["id"]),
+                         (first, self.ids(first)[13]))
+
+    def test_unknown_alert_stops_the_stream(self):
+        stream = self.stream(["999999"])
+
+        with self.assertRaises(InvalidResponseException) as raised:
+            next(iter(stream))
+        self.assertEqual(raised.exception.status_code, 404)
+
+    def test_reconnects_after_a_lost_connection(self):
+        stream = self.stream(self.alert_ids)
+        stream.transport = _FailingTransport(ConnectionResetError(), stream)
+
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.connections, 2)
+        self.assertIsInstance(stream.last_error, ConnectionResetError)
+
+    def test_other_errors_are_raised(self):
+        stream = self.stream(self.alert_ids)
+        stream.transport = _FailingTransport(KeyError("since_id"))
+
+        with self.assertRaises(KeyError):
+            next(iter(stream))
+        self.assertEqual(stream.connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import breaker, routes
+from mention.exceptions import CircuitOpenException, RequestTimeoutException
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.transport import Transport
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class _ScriptedTransport(Transport):
+    """Answers with the given statuses, or raises the given exceptions."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.outcomes = []
+        self.sent = 0
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        self.sent += 1
+        outcome, seconds = self.outcomes.pop(0)
+        self.clock.now += seconds
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Response(outcome)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    url = "http://h/api/accounts/acc/alerts/1/mentions/2"
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.scripted = _ScriptedTransport(self.clock)
+        self.transport = breaker.CircuitBreakerTransport(
+            self.scripted, window=4, min_calls=4, open_seconds=10,
+            slow_call_seconds=1.0, clock=self.clock)
+
+    def send(self, outcome, seconds=0.0, url=None):
+        self.scripted.outcomes.append((outcome, seconds))
+        return self.transport.request("GET", url or self.url, "a")
+
+    def state(self):
+        key = ("h", "GET", routes.FETCH_A_MENTION.path)
+        return self.transport.snapshot()[key]
+
+    def test_opens_on_errors_and_latency(self):
+        self.send(200)
+        self.send(503)
+        self.assertRaises(RequestTimeoutException, self.send,
+                          RequestTimeoutException("timed out"))
+        self.send(200, seconds=2.0)
+
+        self.assertEqual(self.state()["state"], breaker.OPEN)
+        with self.assertRaises(CircuitOpenException) as raised:
+            self.send(200)
+        self.assertEqual(raised.exception.retry_after, 10)
+        self.assertEqual(self.scripted.sent, 4)
+        self.assertEqual(self.state()["rejected"], 1)
+
+    def test_stays_closed_below_threshold(self):
+        for status in (200, 200, 500, 200, 200, 404):
+            self.send(status)
+
+        self.assertEqual(self.state()["state"], breaker.CLOSED)
+        self.assertEqual(self.state()["failure_rate"], 0.25)
+
+    def test_half_open_probe(self):
+        for _ in range(4):
+            self.send(500)
+        self.clock.now += 10
+
+        self.send(500)
+        self.assertEqual(self.state()["state"], breaker.OPEN)
+        self.assertEqual(self.state()["opened"], 2)
+
+        self.clock.now += 10
+        self.assertTrue(self.send(200).circuit_probe)
+        self.assertEqual(self.state()["state"], breaker.CLOSED)
+        self.assertFalse(hasattr(self.send(200), "circuit_probe"))
+
+    def test_circuits_are_per_endpoint_and_host(self):
+        for _ in range(4):
+            self.send(500)
+
+        self.assertRaises(CircuitOpenException, self.transport.request,
+                          "GET", self.url.replace("/2", "/3"), "a")
+        self.send(200, url=self.url + "/children")
+        self.send(200, url=self.url.replace("//h/", "//other/"))
+        self.assertEqual(len(self.transport.snapshot()), 3)
+
+
+class TestCircuitBreakerTransport(unittest.TestCase):
+
+    def test_endpoint_fails_fast(self):
+        data = SyntheticData(seed=3, mentions_per_alert=10)
+        with FakeMentionServer(data, error_rate=1.0) as server:
+            account_id = data.account_ids[0]
+            client = mention.FetchAlertsAPI("a", account_id)
+            client.base_url = server.base_url
+            client.transport = breaker.CircuitBreakerTransport(min_calls=3)
+
+            for _ in range(3):
+                client.query()
+
+            self.assertRaises(CircuitOpenException, client.query)
+            state, = client.transport.snapshot().values()
+            self.assertEqual(state["state"], breaker.OPEN)
+
+
+if __name__ == '__main__':
+    unittest.main()
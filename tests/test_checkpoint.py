@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import operations, transport
+from mention.checkpoint import BackfillJob, Checkpoint
+from mention.exceptions import (InvalidCheckpointException,
+                                InvalidResponseException)
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+
+class _Crash(Exception):
+    pass
+
+
+class _CrashingTransport(transport.Transport):
+    """Fails every request after the first ones."""
+
+    def __init__(self, requests):
+        self.requests = requests
+        self.transport = transport.RequestsTransport()
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        if self.requests <= 0:
+            raise _Crash()
+        self.requests -= 1
+        return self.transport.request(method, url, access_token, data,
+                                      stream=stream, timeout=timeout)
+
+    def close(self):
+        self.transport.close()
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "job.checkpoint.json")
+
+    def test_save_replaces_the_state(self):
+        checkpoint = Checkpoint(self.path)
+        self.assertIsNone(checkpoint.load())
+
+        checkpoint.save({"cursor": "a"})
+        checkpoint.save({"cursor": "b"})
+
+        self.assertEqual(checkpoint.load(), {"cursor": "b"})
+        self.assertEqual(os.listdir(self.directory),
+                         ["job.checkpoint.json"])
+
+    def test_failed_save_keeps_the_previous_state(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.save({"cursor": "a"})
+
+        with self.assertRaises(TypeError):
+            checkpoint.save({"cursor": object()})
+
+        self.assertEqual(checkpoint.load(), {"cursor": "a"})
+        self.assertEqual(os.listdir(self.directory),
+                         ["job.checkpoint.json"])
+
+    def test_corrupt_checkpoint(self):
+        with open(self.path, "w") as checkpoint:
+            checkpoint.write('{"cursor": ')
+
+        with self.assertRaises(InvalidCheckpointException):
+            Checkpoint(self.path).load()
+
+
+class TestBackfillJob(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=7, mentions_per_alert=95)
+        cls.server = FakeMentionServer(cls.data).start()
+        cls.redirect = cls.server.redirect().start()
+        account_id = cls.data.account_ids[0]
+        cls.alert_ids = cls.data.alert_ids(account_id)
+        cls.account_id = account_id
+        cls.expected = operations.fetch_all_mentions(
+            cls.client(cls.alert_ids[0])).items
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    @classmethod
+    def client(cls, alert_id, **kwargs):
+        return mention.FetchAllMentionsAPI("a", cls.account_id, alert_id,
+                                           limit="10", **kwargs)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.output = os.path.join(self.directory, "mentions.jsonl")
+
+    def job(self, client=None):
+        return BackfillJob("job", client or self.client(self.alert_ids[0]),
+                           self.output, directory=self.directory)
+
+    def rows(self):
+        with open(self.output, "rb") as output:
+            return [json.loads(line) for line in output]
+
+    def test_run_to_completion(self):
+        state = self.job().run()
+
+        self.assertEqual(self.rows(), self.expected)
+        self.assertTrue(state["complete"])
+        self.assertEqual(state["pages"], len(self.expected) // 10 + 1)
+        self.assertEqual(state["mentions"], len(self.expected))
+        self.assertEqual(state["last_id"], self.expected[-1]["id"])
+        self.assertEqual(state["offset"], os.path.getsize(self.output))
+        self.assertEqual(self.job().state(), state)
+
+    def test_resume_after_max_pages(self):
+        state = self.job().run(max_pages=3)
+        self.assertFalse(state["complete"])
+        self.assertEqual(state["mentions"], 30)
+        self.assertEqual(state["last_id"], self.expected[29]["id"])
+
+        state = self.job().run()
+
+        self.assertTrue(state["complete"])
+        self.assertEqual(self.rows(), self.expected)
+
+    def test_resume_after_a_crash(self):
+        client = self.client(self.alert_ids[0])
+        client.transport = _CrashingTransport(4)
+        with self.assertRaises(_Crash):
+            self.job(client).run()
+        # A page written after the last checkpoint.
+        with open(self.output, "ab") as output:
+            output.write(b'{"id": "partial"')
+
+        self.job().run()
+
+        self.assertEqual(self.rows(), self.expected)
+
+    def test_error_page_keeps_the_checkpoint(self):
+        state = self.job().run(max_pages=2)
+        self.server.throttle_rate = 1.0
+        self.addCleanup(setattr, self.server, "throttle_rate", 0.0)
+
+        with self.assertRaises(InvalidResponseException) as raised:
+            self.job().run()
+
+        self.assertEqual(raised.exception.status_code, 429)
+        self.assertEqual(self.job().state(), state)
+        self.server.throttle_rate = 0.0
+        self.assertTrue(self.job().run()["complete"])
+        self.assertEqual(self.rows(), self.expected)
+
+    def test_complete_job_does_nothing(self):
+        self.job().run()
+        client = self.client(self.alert_ids[0])
+        client.transport = _CrashingTransport(0)
+
+        self.assertTrue(self.job(client).run()["complete"])
+        self.assertEqual(self.rows(), self.expected)
+
+    def test_checkpoint_of_another_query(self):
+        self.job().run(max_pages=1)
+
+        with self.assertRaises(InvalidCheckpointException):
+            self.job(self.client(self.alert_ids[1])).run()
+
+    def test_missing_output(self):
+        self.job().run(max_pages=1)
+        os.unlink(self.output)
+
+        with self.assertRaises(InvalidCheckpointException):
+            self.job().run()
+
+    def test_output_without_checkpoint_is_kept(self):
+        with open(self.output, "wb") as output:
+            output.write(b'{"id": "kept"}\n')
+
+        with self.assertRaises(InvalidCheckpointException):
+            self.job().run()
+        self.assertEqual(self.rows(), [{"id": "kept"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
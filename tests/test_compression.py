@@ -0,0 +1,128 @@
+import gzip
+import json
+import os
+import sys
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import compression, transport
+from mention.compression import DecodingStream
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+BODY = json.dumps({"mentions": [{"id": str(i), "title": "Mention " * 20}
+                                for i in range(200)]}).encode("utf-8")
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def compressors():
+    result = {
+        "identity": lambda body: body,
+        "gzip": gzip.compress,
+        "deflate": zlib.compress,
+    }
+    if "br" in compression.codecs():
+        import brotli
+        result["br"] = brotli.compress
+    if "zstd" in compression.codecs():
+        import zstandard
+        result["zstd"] = zstandard.ZstdCompressor().compress
+    return result
+
+
+class TestDecodingStream(unittest.TestCase):
+
+    def test_codings(self):
+        for coding, compress in compressors().items():
+            compressed = compress(BODY)
+            for size in (1, 1000, len(compressed)):
+                stream = DecodingStream(chunked(compressed, size), coding)
+
+                self.assertEqual(b"".join(stream), BODY, coding)
+                self.assertEqual(stream.wire_size, len(compressed))
+                self.assertEqual(stream.size, len(BODY))
+                self.assertTrue(stream.complete)
+
+    def test_raw_deflate(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(BODY) + compressor.flush()
+
+        self.assertEqual(b"".join(DecodingStream([compressed], "deflate")),
+                         BODY)
+
+    def test_unsupported(self):
+        self.assertRaises(ValueError, DecodingStream, [], "compress")
+
+    def test_accept_encoding(self):
+        codings = compression.accept_encoding().split(", ")
+
+        self.assertEqual(codings[-2:], ["gzip", "deflate"])
+
+
+class TestNegotiation(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=8, mentions_per_alert=300)
+        cls.server = FakeMentionServer(cls.data).start()
+        cls.redirect = cls.server.redirect().start()
+        account_id = cls.data.account_ids[0]
+        cls.ids = (account_id, cls.data.alert_ids(account_id)[0])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    def setUp(self):
+        compression.stats.reset()
+
+    def query(self, coding, stream=False):
+        with transport.RequestsTransport(compression=coding) as transport_:
+            client = mention.FetchAllMentionsAPI("a", *self.ids,
+                                                 limit="200")
+            client.transport = transport_
+            if stream:
+                return list(client.query_stream())
+            return client.query()
+
+    def test_every_coding_decodes_the_same_page(self):
+        expected = self.query(False)
+
+        for coding in compression.codecs():
+            self.assertEqual(self.query(coding), expected, coding)
+            self.assertEqual(self.query(coding, stream=True),
+                             expected["mentions"], coding)
+
+    def test_stats(self):
+        self.query(False)
+        identity = compression.stats.snapshot()[("FetchAllMentionsAPI",
+                                                 "200")]
+        compression.stats.reset()
+        self.query(True)
+        self.query(True, stream=True)
+        compressed = compression.stats.snapshot()[("FetchAllMentionsAPI",
+                                                   "200")]
+
+        self.assertEqual(identity["ratio"], 1.0)
+        self.assertEqual(compressed["requests"], 2)
+        self.assertEqual(compressed["bytes"], 2 * identity["bytes"])
+        self.assertGreater(compressed["ratio"], 3)
+
+    def test_refused_coding(self):
+        with transport.RequestsTransport(compression="gzip;q=0, deflate") \
+                as transport_:
+            response = transport_.request(
+                "GET", mention.FetchAlertsAPI("a", self.ids[0]).url, "a")
+
+        self.assertEqual(response.headers["Content-Encoding"], "deflate")
+
+
+if __name__ == '__main__':
+    unittest.main()
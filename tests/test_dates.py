@@ -0,0 +1,86 @@
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import utils
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+PARIS = timezone(timedelta(hours=1))
+
+
+class TestFormatDate(unittest.TestCase):
+
+    def test_string(self):
+        self.assertEqual(utils.format_date("2018-11-25 12:00"),
+                         "2018-11-25T12:00:00+00:00")
+        self.assertEqual(utils.format_date("2018-11-25T12:00:00+02:00"),
+                         "2018-11-25T12:00:00+02:00")
+        self.assertRaises(ValueError, utils.format_date, "25/11/2018")
+
+    def test_iso_string(self):
+        self.assertEqual(utils.format_date("2018-11-25T12:00"),
+                         "2018-11-25T12:00:00+00:00")
+        self.assertEqual(utils.format_date("2018-11-25T12:00:00Z"),
+                         "2018-11-25T12:00:00+00:00")
+        for invalid in ("2018-13-25T12:00", "Today", "2018-11-25T"):
+            self.assertRaises(ValueError, utils.format_date, invalid)
+
+    def test_datetime(self):
+        self.assertEqual(utils.format_date(datetime(2018, 11, 25, 12)),
+                         "2018-11-25T12:00:00+00:00")
+        self.assertEqual(utils.format_date(date(2018, 11, 25)),
+                         "2018-11-25T00:00:00+00:00")
+
+    def test_timezones_are_kept(self):
+        moment = datetime(2018, 11, 25, 12, tzinfo=PARIS)
+
+        self.assertEqual(utils.format_date(moment),
+                         "2018-11-25T12:00:00+01:00")
+        self.assertEqual(utils.format_date(moment.astimezone(timezone.utc)),
+                         "2018-11-25T11:00:00+00:00")
+
+    def test_transform_dates(self):
+        start = datetime(2018, 11, 25, tzinfo=PARIS)
+        windows = [start + timedelta(hours=i) for i in range(3)]
+
+        self.assertEqual(utils.transform_dates(windows),
+                         [utils.transform_date(moment) for moment in windows])
+        self.assertEqual(utils.transform_dates(windows)[1],
+                         "2018-11-25T01%3A00%3A00%2B01%3A00")
+
+
+class TestDateFilters(unittest.TestCase):
+
+    def test_aware_window_matches_utc_window(self):
+        data = SyntheticData(seed=5, mentions_per_alert=300)
+        with FakeMentionServer(data) as server, server.redirect():
+            account_id = data.account_ids[0]
+            alert_id = data.alert_ids(account_id)[0]
+            newest = mention.FetchAllMentionsAPI(
+                "a", account_id, alert_id, limit="1").query()
+            published = datetime.strptime(
+                newest["mentions"][0]["published_at"][:16],
+                "%Y-%m-%dT%H:%M")
+
+            def window(start, end):
+                return mention.FetchAllMentionsAPI(
+                    "a", account_id, alert_id, limit="1000",
+                    not_before_date=start, before_date=end).query()
+
+            utc = window(published - timedelta(hours=6), published)
+            aware = window(
+                (published - timedelta(hours=6)).replace(
+                    tzinfo=timezone.utc).astimezone(PARIS),
+                published.replace(tzinfo=timezone.utc).astimezone(PARIS))
+
+        self.assertTrue(utc["mentions"])
+        self.assertEqual(aware["mentions"], utc["mentions"])
+
+
+if __name__ == '__main__':
+    unittest.main()
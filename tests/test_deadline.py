@@ -0,0 +1,181 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import operations
+from mention.deadline import Deadline
+from mention.exceptions import (DeadlineExceededException,
+                                InvalidResponseException,
+                                RequestTimeoutException)
+from mention.fakeserver import FakeMentionServer, Redirect, SyntheticData
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = _Clock()
+        self.deadline = Deadline(10, clock=self.clock)
+
+    def test_timeouts_are_clamped(self):
+        self.clock.now += 7
+
+        self.assertEqual(self.deadline.remaining(), 3)
+        self.assertEqual(self.deadline.timeout((5.0, 2.0)), (3, 2.0))
+        self.assertEqual(self.deadline.timeout(1.0), 1.0)
+        self.assertEqual(self.deadline.timeout(), (3, 3))
+
+    def test_expired(self):
+        self.clock.now += 10
+
+        self.assertTrue(self.deadline.expired)
+        self.assertEqual(self.deadline.remaining(), 0)
+        self.assertRaises(DeadlineExceededException, self.deadline.timeout)
+
+
+class TestTimeouts(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=9, mentions_per_alert=60)
+        cls.server = FakeMentionServer(cls.data, latency=0.1).start()
+        cls.redirect = cls.server.redirect().start()
+        cls.account_id = cls.data.account_ids[0]
+        cls.alert_id = cls.data.alert_ids(cls.account_id)[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    def client(self, **kwargs):
+        return mention.FetchAllMentionsAPI("a", self.account_id,
+                                           self.alert_id, **kwargs)
+
+    def test_read_timeout(self):
+        client = self.client(limit="10")
+        client.timeout = (1.0, 0.02)
+
+        self.assertRaises(RequestTimeoutException, client.query)
+
+    def test_deadline(self):
+        client = self.client(limit="10")
+
+        self.assertEqual(len(client.query(deadline=Deadline(5))["mentions"]),
+                         10)
+        self.assertRaises(RequestTimeoutException, client.query,
+                          deadline=Deadline(0.02))
+        self.assertRaises(DeadlineExceededException, client.query,
+                          deadline=Deadline(0))
+
+    def test_async_deadline(self):
+        client = self.client(limit="10")
+
+        self.assertRaises(DeadlineExceededException, asyncio.run,
+                          client.aquery(deadline=Deadline(0.02)))
+
+    def test_partial_pagination_resumes_from_cursor(self):
+        expected = operations.fetch_all_mentions(self.client(limit="10"))
+        partial = operations.fetch_all_mentions(self.client(limit="10"),
+                                                deadline=0.25)
+
+        self.assertTrue(expected.complete)
+        self.assertGreater(expected.done, partial.done)
+        self.assertFalse(partial.complete)
+        self.assertIsInstance(partial.error, RequestTimeoutException)
+        self.assertEqual(len(partial.items), 10 * partial.done)
+
+        rest = operations.fetch_all_mentions(
+            self.client(limit="10", cursor=partial.cursor))
+
+        self.assertEqual(partial.items + rest.items, expected.items)
+
+    def test_expand_children(self):
+        ids = [mention_["id"] for mention_
+               in self.client(limit="8").query()["mentions"]]
+
+        result = operations.expand_children(
+            "a", self.account_id, self.alert_id, ids, workers=8)
+        partial = operations.expand_children(
+            "a", self.account_id, self.alert_id, ids, deadline=0.15,
+            workers=4)
+
+        self.assertTrue(result.complete)
+        self.assertEqual(list(result.items), ids)
+        self.assertFalse(partial.complete)
+        self.assertEqual(partial.total, 8)
+        self.assertEqual(sorted(list(partial.items) + partial.pending),
+                         sorted(ids))
+        for mention_id, children in partial.items.items():
+            self.assertEqual(children, result.items[mention_id])
+
+
+class TestFailures(unittest.TestCase):
+
+    def setUp(self):
+        self.data = SyntheticData(seed=9, mentions_per_alert=30)
+        self.server = FakeMentionServer(self.data).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(self.server.redirect().start().stop)
+        self.account_id = self.data.account_ids[0]
+        self.alert_id = self.data.alert_ids(self.account_id)[0]
+
+    def client(self, **kwargs):
+        return mention.FetchAllMentionsAPI("a", self.account_id,
+                                           self.alert_id, limit="10",
+                                           **kwargs)
+
+    def test_error_page_stops_pagination(self):
+        first = operations.fetch_all_mentions(self.client(), max_pages=1)
+        self.server.error_rate = 1.0
+
+        result = operations.fetch_all_mentions(
+            self.client(cursor=first.cursor))
+
+        self.assertFalse(result.complete)
+        self.assertEqual((result.done, result.items), (0, []))
+        self.assertEqual(result.cursor, first.cursor)
+        self.assertIsInstance(result.error, InvalidResponseException)
+        self.assertEqual(result.error.status_code, 500)
+
+    def test_error_responses_are_pending(self):
+        ids = [mention_["id"] for mention_
+               in self.client().query()["mentions"]]
+        self.server.throttle_rate = 1.0
+
+        result = operations.curate_mentions(
+            "a", self.account_id, self.alert_id, ids, read=True)
+
+        self.assertFalse(result.complete)
+        self.assertEqual(result.items, {})
+        self.assertEqual(result.pending, ids)
+        self.assertEqual(result.error.status_code, 429)
+
+    def test_connection_errors_are_pending(self):
+        ids = [mention_["id"] for mention_
+               in self.client().query()["mentions"]]
+
+        with Redirect("http://127.0.0.1:1/api"):
+            result = operations.expand_children(
+                "a", self.account_id, self.alert_id, ids)
+
+        self.assertFalse(result.complete)
+        self.assertEqual(result.pending, ids)
+        self.assertIsNotNone(result.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
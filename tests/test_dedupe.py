@@ -0,0 +1,116 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import operations
+from mention.dedupe import ScalableBloomFilter, SeenIds
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+_BASE = 1000000000000
+
+
+class TestSeenIds(unittest.TestCase):
+
+    def setUp(self):
+        self.seen = SeenIds(recent=1000, segment=250, capacity=1000,
+                            error_rate=0.01)
+
+    def test_add(self):
+        self.assertTrue(self.seen.add("1"))
+        self.assertFalse(self.seen.add("1"))
+        self.assertFalse(self.seen.add(1))
+        self.assertIn("1", self.seen)
+        self.assertNotIn("2", self.seen)
+        self.assertEqual(len(self.seen), 1)
+
+    def test_ids_that_are_not_numbers(self):
+        self.assertTrue(self.seen.add("tw:abc"))
+        self.assertFalse(self.seen.add("tw:abc"))
+        self.assertTrue(self.seen.add(str(1 << 70)))
+        self.assertIn(str(1 << 70), self.seen)
+
+    def test_old_ids_move_to_the_bloom_filter(self):
+        for index in range(5000):
+            self.seen.add(str(_BASE + index))
+
+        self.assertGreaterEqual(len(self.seen.bloom), 3750)
+        self.assertLessEqual(sum(len(ids) for ids in self.seen._segments),
+                             1000)
+        for index in range(5000):
+            self.assertIn(str(_BASE + index), self.seen)
+        false_positives = sum(str(_BASE + 10000 + index) in self.seen
+                              for index in range(10000))
+        self.assertLess(false_positives, 100)
+
+    def test_filter(self):
+        mentions = [{"id": "1"}, {"id": "2"}, {"id": "1"}, {"id": "3"}]
+
+        self.assertEqual(list(self.seen.filter(mentions)),
+                         [{"id": "1"}, {"id": "2"}, {"id": "3"}])
+        self.assertEqual(list(self.seen.filter(mentions)), [])
+
+    def test_save_and_load(self):
+        self.seen.add("tw:abc")
+        for index in range(3000):
+            self.seen.add(str(_BASE + 2 * index))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "seen.bin")
+
+        self.seen.save(path)
+        loaded = SeenIds.load(path)
+
+        self.assertEqual(loaded.to_bytes(), self.seen.to_bytes())
+        self.assertEqual(len(loaded), len(self.seen))
+        for index in range(3000):
+            self.assertIn(str(_BASE + 2 * index), loaded)
+        self.assertIn("tw:abc", loaded)
+        self.assertTrue(loaded.add(str(_BASE + 1)))
+
+    def test_load_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            SeenIds.from_bytes(b"\x00" * 64)
+
+
+class TestScalableBloomFilter(unittest.TestCase):
+
+    def test_grows_within_its_error_rate(self):
+        bloom = ScalableBloomFilter(capacity=500, error_rate=0.01)
+        for value in range(10000):
+            bloom.add(value)
+
+        self.assertGreater(len(bloom.filters), 3)
+        self.assertTrue(all(value in bloom for value in range(10000)))
+        false_positives = sum(value in bloom
+                              for value in range(10000, 30000))
+        self.assertLess(false_positives, 200)
+
+
+class TestFetchAllMentionsSeen(unittest.TestCase):
+
+    def test_overlapping_fetches(self):
+        data = SyntheticData(seed=8, mentions_per_alert=30)
+        account_id = data.account_ids[0]
+        alert_id = data.alert_ids(account_id)[0]
+        seen = SeenIds()
+        with FakeMentionServer(data) as server, server.redirect():
+            client = mention.FetchAllMentionsAPI("a", account_id, alert_id,
+                                                 limit="10")
+            first = operations.fetch_all_mentions(client, max_pages=2,
+                                                  seen=seen)
+            second = operations.fetch_all_mentions(client, seen=seen)
+
+        ids = [m["id"] for m in first.items + second.items]
+        self.assertEqual(len(first.items), 20)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len(ids), len(seen))
+
+
+if __name__ == '__main__':
+    unittest.main()
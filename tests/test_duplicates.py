@@ -0,0 +1,184 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.duplicates import (NearDuplicates, curate_duplicates, shingles,
+                                signature, similarity)
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+
+def _variant(mention, rng, changes=1, **fields):
+    """Copies a mention with a few words of its description replaced."""
+    words = mention["description"].split()
+    for _ in range(changes):
+        words[rng.randrange(len(words))] = "syndicated"
+    variant = dict(mention, description=" ".join(words))
+    variant.update(fields)
+    return variant
+
+
+class TestSignature(unittest.TestCase):
+
+    def test_estimates_the_jaccard_similarity(self):
+        rng = random.Random(1)
+        vocabulary = ["w{0}".format(index) for index in range(2000)]
+        for _ in range(20):
+            common = rng.sample(vocabulary, 200)
+            first = dict(title="", description=" ".join(
+                common + rng.sample(vocabulary, 100)))
+            second = dict(title="", description=" ".join(
+                common + rng.sample(vocabulary, 100)))
+            first_shingles = shingles(first, size=1)
+            second_shingles = shingles(second, size=1)
+            jaccard = len(first_shingles & second_shingles) / float(
+                len(first_shingles | second_shingles))
+
+            estimate = similarity(signature(first_shingles, 256),
+                                  signature(second_shingles, 256))
+            self.assertAlmostEqual(estimate, jaccard, delta=0.12)
+
+    def test_short_and_empty_texts(self):
+        self.assertEqual(len(shingles({"title": "SpaceX",
+                                       "description": "Mars"})), 2)
+        self.assertIsNone(signature(shingles({"title": "", "id": "1"})))
+        short = signature(shingles({"title": "Launch today"}))
+        self.assertEqual(similarity(short, short), 1.0)
+
+    def test_num_perm_not_a_power_of_two(self):
+        hashes = {(1 << 64) - 1, 1 << 63, 0}
+        for num_perm in (48, 24, 100):
+            values = signature(hashes, num_perm)
+            self.assertEqual(len(values), num_perm)
+            self.assertEqual(similarity(values, signature(hashes, num_perm)),
+                             1.0)
+
+
+class TestNearDuplicates(unittest.TestCase):
+
+    def setUp(self):
+        self.data = SyntheticData(seed=4, alerts_per_account=2,
+                                  mentions_per_alert=300, duplicate_rate=0)
+        self.account_id = self.data.account_ids[0]
+        self.alert_ids = self.data.alert_ids(self.account_id)
+        self.mentions = []
+        for alert_id in self.alert_ids:
+            alert = self.data.alert(self.account_id, alert_id)
+            self.mentions.extend(alert.mentions[mention_id]
+                                 for mention_id in alert.ids)
+        self.rng = random.Random(4)
+
+    def test_clusters(self):
+        # A word changed in twenty is a similarity of 0.8, estimated within
+        # 0.15 or so with 64 values.
+        detector = NearDuplicates(threshold=0.6)
+        originals = self.mentions[:20]
+        variants = {}
+        for index, original in enumerate(originals):
+            variants[original["id"]] = [
+                _variant(original, self.rng, id="v{0}-{1}".format(index, copy))
+                for copy in range(3)]
+
+        copies = [copy for copies in variants.values() for copy in copies]
+        self.rng.shuffle(copies)
+        unique = list(detector.filter(self.mentions + copies))
+
+        self.assertEqual(unique, self.mentions)
+        self.assertEqual(len(detector), len(self.mentions) + len(copies))
+        clusters = detector.clusters()
+        self.assertEqual(len(clusters), len(originals))
+        for original in originals:
+            self.assertEqual(sorted(clusters[original["id"]]),
+                             sorted([original["id"]] +
+                                    [copy["id"] for copy
+                                     in variants[original["id"]]]))
+            self.assertEqual(detector.original(
+                variants[original["id"]][0]["id"]), original["id"])
+        # Adding again reports the same cluster.
+        copy = variants[originals[0]["id"]][1]
+        self.assertEqual(detector.add(copy), originals[0]["id"])
+        self.assertIsNone(detector.add(originals[0]))
+
+    def test_query(self):
+        detector = NearDuplicates()
+        for mention_ in self.mentions:
+            detector.add(mention_)
+        original = self.mentions[7]
+
+        found = detector.query(_variant(original, self.rng, id="new"))
+        self.assertEqual([mention_id for mention_id, _ in found],
+                         [original["id"]])
+        self.assertGreaterEqual(found[0][1], 0.7)
+        self.assertEqual(detector.query(dict(original, description="")), [])
+        self.assertEqual(len(detector), len(self.mentions))
+
+    def test_mention_without_alert(self):
+        detector = NearDuplicates()
+        mention_ = dict(self.mentions[0])
+        del mention_["alert_id"]
+
+        with self.assertRaises(ValueError):
+            detector.add(mention_)
+        self.assertEqual(len(detector), 0)
+
+    def test_maxlen_and_remove(self):
+        detector = NearDuplicates(maxlen=100)
+        for mention_ in self.mentions[:150]:
+            detector.add(mention_)
+        old, recent = self.mentions[10], self.mentions[120]
+
+        self.assertEqual(len(detector), 100)
+        self.assertNotIn(old["id"], detector)
+        self.assertIsNone(detector.add(_variant(old, self.rng, id="o")))
+        self.assertEqual(detector.add(_variant(recent, self.rng, id="r")),
+                         recent["id"])
+        detector.remove(recent["id"])
+        self.assertEqual(detector.cluster("r"), ["r"])
+        self.assertEqual(detector.original("r"), recent["id"])
+        self.assertEqual(len(detector), 99)
+
+    def test_curate_duplicates(self):
+        first, second = self.alert_ids
+        first_store = self.data.alert(self.account_id, first)
+        second_store = self.data.alert(self.account_id, second)
+        original = first_store.mentions[first_store.ids[5]]
+        copies = [first_store.ids[50], first_store.ids[60],
+                  second_store.ids[70]]
+        for store, mention_id in zip((first_store, first_store,
+                                      second_store), copies):
+            store.mentions[mention_id].update(
+                _variant(original, self.rng, id=str(mention_id),
+                         alert_id=store.mentions[mention_id]["alert_id"]))
+            store.invalidate(mention_id)
+        detector = NearDuplicates()
+        for mention_ in self.mentions:
+            detector.add(mention_)
+        self.assertEqual(detector.duplicates(str(copies[2])),
+                         {int(first): [str(copies[0]), str(copies[1])],
+                          int(second): [str(copies[2])]})
+
+        with FakeMentionServer(self.data) as server, server.redirect():
+            result = curate_duplicates("a", self.account_id, detector,
+                                       original["id"], trashed=True)
+            server.error_rate = 1.0
+            failed = curate_duplicates("a", self.account_id, detector,
+                                       original["id"], read=True)
+
+        self.assertTrue(result.complete)
+        self.assertEqual(sorted(result.items),
+                         sorted(str(mention_id) for mention_id in copies))
+        for store, mention_id in zip((first_store, first_store,
+                                      second_store), copies):
+            self.assertEqual(store.mentions[mention_id]["folder"], "trash")
+        self.assertEqual(original["folder"], "inbox")
+        self.assertFalse(failed.complete)
+        self.assertEqual(failed.items, {})
+        self.assertEqual(sorted(failed.pending), sorted(result.items))
+        self.assertEqual(failed.error.status_code, 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
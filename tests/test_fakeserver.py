@@ -0,0 +1,98 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import requests
+
+import mention
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+
+class TestSyntheticData(unittest.TestCase):
+
+    def test_seeded(self):
+        first = SyntheticData(seed=3, mentions_per_alert=20)
+        second = SyntheticData(seed=3, mentions_per_alert=20)
+
+        self.assertEqual(first.account_ids, second.account_ids)
+        self.assertEqual(sorted(first.alerts), sorted(second.alerts))
+        for alert_id, store in first.alerts.items():
+            self.assertEqual(store.ids, second.alerts[alert_id].ids)
+
+
+class TestFakeMentionServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeMentionServer(
+            SyntheticData(seed=1, mentions_per_alert=50)).start()
+        self.redirect = self.server.redirect().start()
+        self.account_id = self.server.data.account_ids[0]
+        self.alert_id = self.server.data.alert_ids(self.account_id)[0]
+        self.ids = self.server.data.alerts[self.alert_id].ids
+
+    def tearDown(self):
+        self.redirect.stop()
+        self.server.stop()
+
+    def test_cursor_pagination(self):
+        seen = []
+        cursor = None
+        while True:
+            page = mention.FetchAllMentionsAPI("a", self.account_id,
+                                               self.alert_id, limit="7",
+                                               cursor=cursor).query()
+            seen.extend(int(item["id"]) for item in page["mentions"])
+            if "more" not in page["_links"]:
+                break
+            cursor = page["_links"]["more"]["params"]["cursor"]
+
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+
+    def test_since_id(self):
+        page = mention.FetchAllMentionsAPI("a", self.account_id,
+                                           self.alert_id, limit="3",
+                                           since_id=str(self.ids[-5])).query()
+
+        self.assertEqual([int(item["id"]) for item in page["mentions"]],
+                         self.ids[-4:-1])
+        self.assertEqual(page["_links"]["pull"]["params"]["since_id"],
+                         str(self.ids[-2]))
+
+    def test_curate(self):
+        mention_id = str(self.ids[0])
+        mention.CurateAMentionAPI("a", self.account_id, self.alert_id,
+                                  mention_id, trashed=True).query()
+
+        data = mention.FetchAMentionAPI("a", self.account_id, self.alert_id,
+                                        mention_id).query()
+        self.assertEqual(data["mention"]["folder"], "trash")
+
+    def test_unknown_alert(self):
+        data = mention.FetchAnAlertAPI("a", self.account_id, "0").query()
+
+        self.assertEqual(data["code"], 404)
+
+    def test_throttling(self):
+        self.server.throttle_rate = 1.0
+        response = requests.get(self.server.base_url + "/app/data")
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+    def test_stream(self):
+        self.server.app.stream_rate = 0
+        url = "{0}/accounts/{1}/mentions?alerts[]={2}&since_id[{2}]={3}"
+        response = requests.get(url.format(self.server.base_url,
+                                           self.account_id, self.alert_id,
+                                           self.ids[-3]), stream=True)
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+        self.assertEqual([int(line["id"]) for line in lines], self.ids[-2:])
+
+
+if __name__ == '__main__':
+    unittest.main()
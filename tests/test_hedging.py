@@ -0,0 +1,215 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention import hedging, ratelimit
+from mention.transport import Transport
+
+URL = "http://h/api/accounts/acc/alerts/1/mentions/2"
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Response(object):
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _SlowTransport(Transport):
+    """Answers after the given delays, numbering the requests."""
+
+    def __init__(self):
+        self.delays = []
+        self.sent = 0
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        with self._lock:
+            number = self.sent
+            self.sent += 1
+            self.threads.append(threading.current_thread())
+            delay = self.delays.pop(0) if self.delays else 0.001
+        time.sleep(delay)
+        return _Response(number)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_refill(self):
+        clock = _Clock()
+        bucket = ratelimit.TokenBucket(rate=2, capacity=3, clock=clock)
+
+        self.assertTrue(bucket.try_acquire(3))
+        self.assertFalse(bucket.try_acquire())
+        clock.now += 0.5
+        self.assertTrue(bucket.try_acquire())
+        clock.now += 10
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_acquire_waits(self):
+        bucket = ratelimit.TokenBucket(rate=100, capacity=1)
+        started = time.perf_counter()
+
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertGreater(time.perf_counter() - started, 0.005)
+        self.assertFalse(bucket.acquire(timeout=0))
+
+    def test_release(self):
+        clock = _Clock()
+        bucket = ratelimit.TokenBucket(rate=1, capacity=2, clock=clock)
+
+        self.assertTrue(bucket.try_acquire(2))
+        bucket.release()
+        self.assertEqual(bucket.tokens, 1)
+        bucket.release(5)
+        self.assertEqual(bucket.tokens, 2)
+
+
+class TestHedgingTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.slow = _SlowTransport()
+        self.transport = hedging.HedgingTransport(self.slow, min_samples=5)
+
+    def tearDown(self):
+        self.transport.close()
+
+    def warm_up(self):
+        for _ in range(5):
+            self.transport.request("GET", URL, "a")
+
+    def rate_limited(self, bucket, budget=None):
+        self.transport.close()
+        self.transport = hedging.HedgingTransport(
+            ratelimit.RateLimitedTransport(bucket, self.slow), budget=budget,
+            min_samples=5)
+
+    def stats(self):
+        return list(self.transport.snapshot().values())[0]
+
+    def test_slow_request_is_hedged(self):
+        self.warm_up()
+        self.slow.delays = [0.5]
+        started = time.perf_counter()
+
+        response = self.transport.request("GET", URL, "a")
+
+        self.assertLess(time.perf_counter() - started, 0.3)
+        self.assertEqual(response.number, 6)
+        self.assertEqual(response.attempts, 2)
+        self.assertEqual(self.stats()["hedged"], 1)
+        self.assertEqual(self.stats()["hedge_wins"], 1)
+
+    def test_fast_request_is_not_hedged(self):
+        self.warm_up()
+        self.transport.request("GET", URL, "a")
+
+        self.assertEqual(self.slow.sent, 6)
+        self.assertEqual(self.stats()["hedged"], 0)
+
+    def test_hedges_are_capped_by_the_budget(self):
+        self.transport.budget = ratelimit.TokenBucket(rate=0, capacity=1)
+        self.warm_up()
+        self.slow.delays = [0.05, 0.05]
+
+        self.transport.request("GET", URL, "a")
+        self.transport.request("GET", URL, "a")
+
+        self.assertEqual(self.stats()["hedged"], 1)
+        self.assertEqual(self.slow.sent, 8)
+
+    def test_shared_rate_limit_bucket(self):
+        # Enough tokens for the requests and a single hedge, which must not
+        # take a second token or wait for the bucket to refill.
+        bucket = ratelimit.TokenBucket(rate=0.001, capacity=7)
+        self.rate_limited(bucket, budget=bucket)
+        self.warm_up()
+        self.slow.delays = [0.5]
+        started = time.perf_counter()
+
+        response = self.transport.request("GET", URL, "a")
+
+        self.assertLess(time.perf_counter() - started, 0.3)
+        self.assertEqual(response.number, 6)
+        self.assertEqual(self.stats()["hedge_wins"], 1)
+        self.assertLess(bucket.tokens, 1)
+
+    def test_hedges_do_not_wait_for_the_rate_limit(self):
+        self.rate_limited(ratelimit.TokenBucket(rate=0.001, capacity=6))
+        self.warm_up()
+        self.slow.delays = [0.05]
+
+        self.transport.request("GET", URL, "a")
+
+        self.assertEqual(self.stats()["hedged"], 0)
+        self.assertEqual(self.slow.sent, 6)
+
+    def test_refused_hedge_keeps_the_budget(self):
+        budget = ratelimit.TokenBucket(rate=0, capacity=5)
+        self.rate_limited(ratelimit.TokenBucket(rate=0.001, capacity=7),
+                          budget=budget)
+        self.warm_up()
+        # The rate limit has a token left when the request is sent, none
+        # when the hedge is due.
+        self.slow.delays = [0.05]
+        self.transport.transport.bucket.try_acquire()
+
+        self.transport.request("GET", URL, "a")
+
+        self.assertEqual(self.stats()["hedged"], 0)
+        self.assertEqual(budget.tokens, 5)
+
+    def test_requests_without_hedge_run_on_the_calling_thread(self):
+        self.warm_up()
+        self.transport.budget = ratelimit.TokenBucket(rate=0, capacity=0)
+        self.transport.request("GET", URL, "a")
+
+        self.assertEqual(set(self.slow.threads),
+                         {threading.current_thread()})
+
+    def test_only_gets_are_hedged(self):
+        self.warm_up()
+        self.slow.delays = [0.05]
+
+        self.transport.request("PUT", URL, "a")
+
+        self.assertEqual(self.slow.sent, 6)
+
+    def test_async(self):
+        self.warm_up()
+        self.slow.delays = [0.5]
+
+        async def timed():
+            started = time.perf_counter()
+            response = await self.transport.arequest("GET", URL, "a")
+            return response, time.perf_counter() - started
+
+        response, elapsed = asyncio.run(timed())
+
+        self.assertLess(elapsed, 0.3)
+        self.assertEqual(response.number, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
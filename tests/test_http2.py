@@ -0,0 +1,112 @@
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.transport import Transport
+
+try:
+    import h2
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class _Response(object):
+    status_code = 200
+    content = b'{"alerts": []}'
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _ThreadTransport(Transport):
+
+    def __init__(self):
+        self.calls = []
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        self.calls.append((method, url, access_token, data))
+        return _Response()
+
+
+class TestAsyncQuery(unittest.TestCase):
+
+    def test_default_arequest_runs_request(self):
+        client = mention.FetchAlertsAPI("a", "acc")
+        client.transport = _ThreadTransport()
+
+        self.assertEqual(asyncio.run(client.aquery()), {"alerts": []})
+        self.assertEqual(client.transport.calls,
+                         [("GET", client.url, "a", None)])
+
+
+@unittest.skipIf(httpx is None, "httpx and h2 are not installed")
+class TestHTTP2Transport(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=6, mentions_per_alert=200)
+        cls.server = FakeMentionServer(cls.data, latency=0.01).start()
+        cls.redirect = cls.server.redirect().start()
+        cls.account_id = cls.data.account_ids[0]
+        cls.alert_id = cls.data.alert_ids(cls.account_id)[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    def setUp(self):
+        self.transport = mention.transport.HTTP2Transport(
+            prior_knowledge=True)
+
+    def tearDown(self):
+        asyncio.run(self.transport.aclose())
+
+    def client(self, **kwargs):
+        client = mention.FetchAllMentionsAPI("a", self.account_id,
+                                             self.alert_id, **kwargs)
+        client.transport = self.transport
+        return client
+
+    def test_query(self):
+        expected = mention.FetchAllMentionsAPI(
+            "a", self.account_id, self.alert_id, limit="50").query()
+        client = self.client(limit="50")
+        response = self.transport.request("GET", client.url, "a")
+
+        self.assertEqual(response.http_version, "HTTP/2")
+        self.assertEqual(client.query(), expected)
+        self.assertEqual(list(client.query_stream()), expected["mentions"])
+
+    def test_post(self):
+        client = mention.CreateAnAlertAPI("a", self.account_id, "http2",
+                                          {"type": "basic"}, ["en"])
+        client.transport = self.transport
+
+        self.assertEqual(client.query()["alert"]["name"], "http2")
+
+    def test_concurrent_requests_share_a_connection(self):
+        clients = [self.client(limit="10") for _ in range(20)]
+        connections = self.server.connections
+
+        async def fetch():
+            return await asyncio.gather(*[client.aquery()
+                                          for client in clients])
+
+        pages = asyncio.run(fetch())
+
+        self.assertEqual([len(page["mentions"]) for page in pages], [10] * 20)
+        self.assertEqual(self.server.connections - connections, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import queue
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.hub import BLOCK, DROP_OLDEST, SPILL, Hub
+
+
+def _mentions(count):
+    return [{"id": str(index), "title": "mention {0}".format(index)}
+            for index in range(count)]
+
+
+class TestHub(unittest.TestCase):
+
+    def test_source_is_read_once_for_every_subscriber(self):
+        opened = []
+
+        def source():
+            opened.append(True)
+            for mention in _mentions(100):
+                yield mention
+
+        hub = Hub()
+        subscriptions = [hub.subscribe(name, maxsize=10)
+                         for name in ("alerting", "indexing", "archive")]
+        received = dict((s.name, []) for s in subscriptions)
+        consumers = [threading.Thread(target=lambda s=s: received[s.name]
+                                      .extend(s))
+                     for s in subscriptions]
+        for consumer in consumers:
+            consumer.start()
+        hub.start(source())
+        for consumer in consumers:
+            consumer.join(5)
+
+        self.assertEqual(len(opened), 1)
+        for mentions in received.values():
+            self.assertEqual(mentions, _mentions(100))
+        self.assertEqual(hub.stats()["archive"]["lag"], 0)
+
+    def test_drop_oldest(self):
+        hub = Hub()
+        subscription = hub.subscribe("alerting", maxsize=5,
+                                     overflow=DROP_OLDEST)
+        for mention in _mentions(20):
+            hub.publish(mention)
+
+        stats = subscription.stats()
+        self.assertEqual((stats["dropped"], stats["queued"], stats["lag"]),
+                         (15, 5, 5))
+        hub.close()
+        self.assertEqual(list(subscription), _mentions(20)[15:])
+
+    def test_spill_keeps_the_order(self):
+        hub = Hub()
+        subscription = hub.subscribe("archive", maxsize=5, overflow=SPILL)
+        mentions = _mentions(50)
+        for mention in mentions[:30]:
+            hub.publish(mention)
+        stats = subscription.stats()
+        self.assertEqual((stats["spilled"], stats["queued"],
+                          stats["on_disk"], stats["lag"]), (25, 5, 25, 30))
+        directory = subscription._spill.directory
+
+        received = [subscription.get() for _ in range(12)]
+        for mention in mentions[30:]:
+            hub.publish(mention)
+        hub.close()
+        received.extend(subscription)
+
+        self.assertEqual(received, mentions)
+        self.assertEqual(subscription.stats()["lag"], 0)
+        self.assertFalse(os.path.exists(directory))
+
+    def test_block_waits_for_the_consumer(self):
+        hub = Hub()
+        subscription = hub.subscribe("indexing", maxsize=2, overflow=BLOCK)
+        publisher = threading.Thread(target=hub.run, args=(_mentions(5),))
+        publisher.start()
+        time.sleep(0.05)
+        self.assertTrue(publisher.is_alive())
+        self.assertEqual(subscription.stats()["queued"], 2)
+
+        received = list(subscription)
+        publisher.join(1)
+
+        self.assertEqual(received, _mentions(5))
+        self.assertGreater(subscription.stats()["blocked"], 0)
+
+    def test_stop_does_not_wait_for_a_gone_consumer(self):
+        hub = Hub()
+        subscription = hub.subscribe("indexing", maxsize=2, overflow=BLOCK)
+        hub.start(iter(_mentions(5)))
+        time.sleep(0.05)
+        self.assertEqual(subscription.stats()["queued"], 2)
+
+        stopper = threading.Thread(target=hub.stop, daemon=True)
+        stopper.start()
+        stopper.join(1)
+
+        self.assertFalse(stopper.is_alive())
+        self.assertEqual(list(subscription), _mentions(2))
+
+    def test_get_timeout_and_unsubscribe(self):
+        hub = Hub()
+        subscription = hub.subscribe("alerting")
+        with self.assertRaises(queue.Empty):
+            subscription.get(timeout=0.01)
+
+        subscription.close()
+        hub.publish(_mentions(1)[0])
+
+        self.assertEqual(hub.stats(), {})
+        self.assertEqual(subscription.published, 0)
+
+    def test_unknown_overflow(self):
+        with self.assertRaises(ValueError):
+            Hub().subscribe("alerting", overflow="grow")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.journal import JournalReader, JournalWriter
+
+
+def _mention(index, **fields):
+    mention = {"id": str(1000000 + index),
+               "title": "mention {0}".format(index)}
+    mention.update(fields)
+    return mention
+
+
+def _read(directory, mention_id):
+    with JournalReader(directory) as reader:
+        return len(reader), reader.mention(mention_id)
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, mentions, **kwargs):
+        with JournalWriter(self.directory, **kwargs) as writer:
+            return [writer.append(mention) for mention in mentions]
+
+    def test_read_by_seq_range_and_id(self):
+        mentions = [_mention(index) for index in range(50)]
+        self.assertEqual(self.write(mentions), list(range(50)))
+
+        with JournalReader(self.directory) as reader:
+            self.assertEqual(len(reader), 50)
+            self.assertEqual(json.loads(bytes(reader.get(7, verify=True))),
+                             mentions[7])
+            self.assertEqual([json.loads(bytes(record))
+                              for _, record in reader.records(10, 13)],
+                             mentions[10:13])
+            self.assertEqual(reader.lookup(mentions[20]["id"]), 20)
+            self.assertEqual(reader.mention(mentions[30]["id"]),
+                             mentions[30])
+            self.assertIsNone(reader.lookup("42"))
+            with self.assertRaises(IndexError):
+                reader.get(50)
+
+    def test_segments(self):
+        mentions = [_mention(index) for index in range(300)]
+        self.write(mentions[:200], segment_bytes=2048)
+        # The writer reopens the journal and goes on.
+        self.write(mentions[200:] + [_mention(5, title="updated")],
+                   segment_bytes=2048)
+
+        segments = [name for name in os.listdir(self.directory)
+                    if name.endswith(".log")]
+        self.assertGreater(len(segments), 5)
+        with JournalReader(self.directory) as reader:
+            self.assertEqual(len(reader), 301)
+            self.assertEqual([json.loads(bytes(record))
+                              for _, record in reader.records()],
+                             mentions + [_mention(5, title="updated")])
+            for index in range(1, 300, 7):
+                self.assertEqual(reader.lookup(mentions[index]["id"]), index)
+            self.assertEqual(reader.mention(mentions[5]["id"])["title"],
+                             "updated")
+
+    def test_records_are_visible_once_flushed(self):
+        writer = JournalWriter(self.directory, fsync_every=10,
+                               fsync_interval=3600)
+        reader = JournalReader(self.directory)
+        self.addCleanup(reader.close)
+        for index in range(9):
+            writer.append(_mention(index))
+        self.assertEqual(reader.refresh(), 0)
+
+        writer.append(_mention(9))
+        self.assertEqual(reader.refresh(), 10)
+        writer.append(_mention(10))
+        writer.flush(fsync=False)
+        self.assertEqual(reader.refresh(), 11)
+        self.assertEqual(reader.mention(_mention(10)["id"]), _mention(10))
+        writer.close()
+
+    def test_reader_in_another_process(self):
+        self.write([_mention(index) for index in range(20)])
+
+        with multiprocessing.Pool(1) as pool:
+            count, mention = pool.apply(_read, (self.directory,
+                                                _mention(12)["id"]))
+
+        self.assertEqual(count, 20)
+        self.assertEqual(mention, _mention(12))
+
+    def test_writer_recovers_from_a_torn_write(self):
+        self.write([_mention(index) for index in range(10)])
+        base = os.path.join(self.directory, "{0:020d}".format(0))
+        with open(base + ".log", "ab") as log:
+            log.write(b"\x50\x00\x00\x00garbage")
+        with open(base + ".ids", "ab") as ids:
+            ids.write(b"\x01" * 8)
+        with open(base + ".idx", "ab") as idx:
+            idx.write(b"\x02" * 5)
+
+        self.assertEqual(self.write([_mention(10)]), [10])
+        with JournalReader(self.directory) as reader:
+            self.assertEqual([json.loads(bytes(record))
+                              for _, record in reader.records()],
+                             [_mention(index) for index in range(11)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.exceptions import InvalidQueryException
+from mention.fakeserver import SyntheticData
+from mention.keywords import (Automaton, KeywordFilter, KeywordMatch,
+                              compile_query, words)
+
+QUERYD = {
+    "type": "basic",
+    "included_keywords": ["NASA", "Arianespace", "SpaceX", "Pockocmoc"],
+    "required_keywords": ["mars"],
+    "excluded_keywords": ["nose", "fil d'ariane"],
+}
+
+
+class TestAutomaton(unittest.TestCase):
+
+    def test_words(self):
+        self.assertEqual(words(u"L'Élysée, SPACE-X à Mars!"),
+                         ["l", "elysee", "space", "x", "a", "mars"])
+        self.assertEqual(words(None), [])
+
+    def test_overlapping_keywords(self):
+        automaton = Automaton(["new york", "york times", "times",
+                               "new york times square", "square"])
+
+        self.assertEqual(automaton.search("The New York Times building"),
+                         {0, 1, 2})
+        self.assertEqual(automaton.search("new york times squares"),
+                         {0, 1, 2})
+        self.assertEqual(automaton.search("new new york times square"),
+                         {0, 1, 2, 3, 4})
+        self.assertEqual(automaton.search("newyork york"), set())
+
+    def test_keywords_do_not_span_fields(self):
+        automaton = Automaton(["new york"])
+
+        self.assertEqual(automaton.search_mention(
+            {"title": "Brand new", "description": "York"}), set())
+        self.assertEqual(automaton.search_mention(
+            {"title": None, "description": "in New York"}), {0})
+
+
+class TestKeywordQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.query = compile_query(QUERYD)
+
+    def match(self, title, description=""):
+        return self.query.match({"title": title,
+                                 "description": description})
+
+    def test_rules(self):
+        self.assertEqual(
+            self.match("SpaceX and NASA", "Landing on MARS"),
+            KeywordMatch(True, ("NASA", "SpaceX"), ("mars",), ()))
+        # No required keyword.
+        self.assertFalse(self.match("SpaceX and NASA", "On the moon"))
+        # No included keyword.
+        self.assertFalse(self.match("Landing on Mars"))
+        # An excluded keyword.
+        self.assertEqual(
+            self.match("Mars", u"Le fil d'Ariane de NASA"),
+            KeywordMatch(False, ("NASA",), ("mars",), ("fil d'ariane",)))
+        # Whole words only.
+        self.assertFalse(self.match("Marsupial NASAL spray"))
+
+    def test_only_required_keywords(self):
+        query = compile_query({"type": "basic",
+                               "required_keywords": ["mars", "rover"]})
+
+        self.assertTrue(query.match({"title": "Mars rover"}))
+        self.assertFalse(query.match({"title": "Mars"}))
+
+    def test_invalid_queries(self):
+        with self.assertRaises(InvalidQueryException):
+            compile_query({"type": "advanced", "query_string": "NASA"})
+        with self.assertRaises(InvalidQueryException):
+            compile_query({"type": "basic", "excluded_keywords": ["a"]})
+        with self.assertRaises(InvalidQueryException):
+            compile_query({"type": "basic", "included_keywords": ["!!"]})
+
+
+class TestKeywordFilter(unittest.TestCase):
+
+    def test_same_results_as_each_query(self):
+        data = SyntheticData(seed=3, accounts=2, alerts_per_account=4,
+                             mentions_per_alert=200)
+        queries = {}
+        mentions = []
+        for account_id in data.account_ids:
+            for alert_id in data.alert_ids(account_id):
+                alert = data.alert(account_id, alert_id)
+                queries[alert_id] = compile_query(alert.alert["query"])
+                mentions.extend(alert.mentions.values())
+        keyword_filter = KeywordFilter(queries)
+
+        matched = 0
+        for mention_ in mentions:
+            expected = dict((alert_id, query.match(mention_))
+                            for alert_id, query in queries.items())
+            expected = dict((alert_id, result)
+                            for alert_id, result in expected.items()
+                            if result.matched)
+            self.assertEqual(keyword_filter.match(mention_), expected)
+            matched += len(expected)
+        self.assertGreater(matched, 0)
+
+    def test_add_and_remove(self):
+        keyword_filter = KeywordFilter({"1": QUERYD})
+        keyword_filter.add("2", {"type": "basic",
+                                 "included_keywords": ["mars"],
+                                 "excluded_keywords": ["NASA"]})
+        mention_ = {"title": "SpaceX on Mars"}
+
+        self.assertEqual(sorted(keyword_filter.match(mention_)), ["1", "2"])
+        keyword_filter.remove("1")
+        self.assertEqual(sorted(keyword_filter.match(mention_)), ["2"])
+        self.assertEqual(keyword_filter.match({"title": "NASA on Mars"}),
+                         {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import unittest
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, "mention")
+
+sys.path.insert(0, PACKAGE)
+
+import mention
+
+
+def loaded_modules(statement):
+    output = subprocess.check_output(
+        [sys.executable, "-c",
+         statement + "\nimport sys\nprint(' '.join(sys.modules))"],
+        cwd=PACKAGE, universal_newlines=True)
+    return set(output.split())
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_is_lazy(self):
+        modules = loaded_modules("import mention")
+
+        self.assertNotIn("mention.base", modules)
+        self.assertNotIn("requests", modules)
+
+    def test_endpoints_do_not_import_requests(self):
+        modules = loaded_modules("from mention import FetchAllMentionsAPI")
+
+        self.assertIn("mention.base", modules)
+        self.assertNotIn("requests", modules)
+
+    def test_exports(self):
+        self.assertIs(mention.FetchAllMentionsAPI,
+                      mention.base.FetchAllMentionsAPI)
+        self.assertIn("CurateAMentionAPI", dir(mention))
+        self.assertRaises(AttributeError, getattr, mention, "Missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
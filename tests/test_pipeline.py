@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import operations
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.pipeline import DecodePipeline, Fields
+
+
+def _titles_with_a(mention_):
+    if "a" not in mention_["title"]:
+        return None
+    return {"id": mention_["id"], "title": mention_["title"].upper()}
+
+
+class TestDecodePipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=5, mentions_per_alert=120)
+        cls.server = FakeMentionServer(cls.data).start()
+        cls.redirect = cls.server.redirect().start()
+        account_id = cls.data.account_ids[0]
+        cls.clients = [mention.FetchAllMentionsAPI("a", account_id, alert_id,
+                                                   limit="50")
+                       for alert_id in cls.data.alert_ids(account_id)[:2]]
+        cls.expected = [operations.fetch_all_mentions(client).items
+                        for client in cls.clients]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    def backfill(self, transform, **kwargs):
+        sink = io.BytesIO()
+        with DecodePipeline(transform, processes=2, **kwargs) as pipeline:
+            stats = pipeline.backfill(self.clients, sink)
+        rows = [json.loads(line) for line in sink.getvalue().splitlines()]
+        return stats, rows
+
+    def test_rows_match_the_pages(self):
+        stats, rows = self.backfill(Fields(("id", "title")))
+
+        expected = [{"id": m["id"], "title": m["title"]}
+                    for mentions in self.expected for m in mentions]
+        self.assertEqual(sorted(rows, key=lambda row: row["id"]),
+                         sorted(expected, key=lambda row: row["id"]))
+        self.assertEqual(stats["mentions"], len(expected))
+        self.assertEqual(stats["rows"], len(expected))
+        self.assertEqual(stats["pages"], sum(len(mentions) // 50 + 1
+                                             for mentions in self.expected))
+
+    def test_pages_of_a_client_are_written_in_order(self):
+        _, rows = self.backfill(None, io_workers=1)
+
+        self.assertEqual(rows, self.expected[0] + self.expected[1])
+
+    def test_transform_drops_rows(self):
+        stats, rows = self.backfill(_titles_with_a, io_workers=1)
+
+        self.assertEqual(rows, [_titles_with_a(m)
+                                for mentions in self.expected
+                                for m in mentions
+                                if _titles_with_a(m) is not None])
+        self.assertLess(stats["rows"], stats["mentions"])
+
+    def test_pages_larger_than_the_slots(self):
+        stats, rows = self.backfill(None, io_workers=1, slot_size=4096)
+
+        self.assertEqual(rows, self.expected[0] + self.expected[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
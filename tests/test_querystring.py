@@ -0,0 +1,155 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention.exceptions import InvalidQueryException
+from mention.fakeserver import SyntheticData
+from mention.journal import JournalReader, JournalWriter
+from mention.querystring import (AdvancedQuery, And, InvertedIndex, Not, Or,
+                                 Term, compile_query, parse, probability)
+
+
+def _term(text):
+    return Term(text.split())
+
+
+class TestParse(unittest.TestCase):
+
+    def test_precedence(self):
+        self.assertEqual(
+            parse('(NASA AND Discovery) OR Arianespace "Ariane 6" NOT x'),
+            Or([And([_term("nasa"), _term("discovery")]),
+                And([_term("arianespace"), _term("ariane 6"),
+                     Not(_term("x"))])]))
+        self.assertEqual(parse("a OR (b OR c) AND NOT NOT d"),
+                         Or([_term("a"),
+                             And([Or([_term("b"), _term("c")]),
+                                  Not(Not(_term("d")))])]))
+        self.assertEqual(parse(u"Élysée-Palace"), _term("elysee palace"))
+
+    def test_invalid(self):
+        for query_string in ("", "(a", "a)", "a AND", '"a', "OR b", "NOT",
+                             "a AND ()", '"!!"'):
+            with self.assertRaises(InvalidQueryException):
+                parse(query_string)
+
+    def test_compile_query(self):
+        with self.assertRaises(InvalidQueryException):
+            compile_query({"type": "basic", "included_keywords": ["a"]})
+        query = compile_query({"type": "advanced", "query_string": "a"})
+        self.assertEqual(query.tree, _term("a"))
+
+    def test_probability(self):
+        frequencies = {"a": 0.5, "b": 0.1, "c": 0.2}
+
+        def frequency(term):
+            return frequencies[term.words[0]]
+
+        self.assertAlmostEqual(
+            probability(parse("a AND (b OR NOT c)"), frequency),
+            0.5 * (1 - 0.9 * 0.2))
+
+
+class TestAdvancedQuery(unittest.TestCase):
+
+    def match(self, query_string, title, description=""):
+        return AdvancedQuery(query_string).match(
+            {"title": title, "description": description})
+
+    def test_match(self):
+        query_string = '(NASA AND Discovery) OR (Arianespace AND "Ariane 6")'
+
+        self.assertTrue(self.match(query_string, "NASA", "The Discovery"))
+        self.assertTrue(self.match(query_string, "Arianespace",
+                                   "The ARIANE 6 rocket"))
+        self.assertFalse(self.match(query_string, "Arianespace",
+                                    "Ariane 5 and 6"))
+        self.assertFalse(self.match(query_string, "Arianespace Ariane",
+                                    "6 rockets"))
+        self.assertFalse(self.match(query_string, "NASA discovers"))
+        self.assertTrue(self.match("mars NOT rover", "Mars"))
+        self.assertFalse(self.match("mars NOT rover", "Mars", "Rover"))
+
+
+class TestInvertedIndex(unittest.TestCase):
+
+    QUERIES = [
+        "nasa",
+        "nasa AND mars",
+        "nasa OR mars OR nike",
+        "(nasa AND mars) OR (nike AND NOT store)",
+        "NOT the",
+        "NOT (rocket OR launch) AND NOT crew",
+        '"the latest"',
+        '"launch the rocket"',
+        '"new first" OR (week "live story" NOT today)',
+        "unknownword OR nasa",
+        "unknownword AND nasa",
+    ]
+
+    def setUp(self):
+        data = SyntheticData(seed=5, alerts_per_account=2,
+                             mentions_per_alert=500)
+        self.mentions = []
+        for account_id in data.account_ids:
+            for alert_id in data.alert_ids(account_id):
+                alert = data.alert(account_id, alert_id)
+                self.mentions.extend(alert.mentions[mention_id]
+                                     for mention_id in alert.ids)
+        # Mentions of the longest phrase for which the pairs of words are
+        # not enough.
+        self.mentions.append({"id": "1", "title": "launch the",
+                              "description": "the rocket"})
+        self.mentions.append({"id": "2", "title": "to launch the rocket",
+                              "description": ""})
+        random.Random(5).shuffle(self.mentions)
+
+    def expected(self, query_string):
+        query = AdvancedQuery(query_string)
+        return [doc for doc, mention_ in enumerate(self.mentions)
+                if query.match(mention_)]
+
+    def check(self, index):
+        self.assertEqual(len(index), len(self.mentions))
+        for query_string in self.QUERIES:
+            expected = self.expected(query_string)
+            self.assertEqual(index.search(query_string), expected,
+                             query_string)
+            query = AdvancedQuery(query_string, frequency=index.frequency)
+            self.assertEqual(index.search(query), expected, query_string)
+            self.assertEqual([doc for doc, mention_ in
+                              enumerate(self.mentions)
+                              if query.match(mention_)], expected)
+
+    def test_search(self):
+        documents = self.mentions.__getitem__
+        index = InvertedIndex(documents=documents)
+        for mention_ in self.mentions:
+            index.add(mention_)
+
+        self.check(index)
+        self.assertEqual(index.ids,
+                         [mention_["id"] for mention_ in self.mentions])
+        self.assertEqual(index.frequency(_term("unknownword")), 0.0)
+        self.assertGreater(index.frequency(_term("the")),
+                           index.frequency(_term("nasa")))
+
+    def test_from_journal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with JournalWriter(directory, segment_bytes=65536) as writer:
+            for mention_ in self.mentions:
+                writer.append(mention_)
+
+        with JournalReader(directory) as reader:
+            self.check(InvertedIndex.from_journal(reader))
+
+
+if __name__ == '__main__':
+    unittest.main()
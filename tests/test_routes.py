@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+import unittest
+
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.base import Mention
+from mention.routes import Route, encode
+
+
+class FetchAlertTasksAPI(Mention):
+    route = Route("GET", "/accounts/{account_id}/alerts/{alert_id}/tasks",
+                  query=("limit",), items="tasks")
+
+    def __init__(self, access_token, account_id, alert_id, limit=None):
+        self.account_id = account_id
+        self.alert_id = alert_id
+        self.limit = limit
+        super(FetchAlertTasksAPI, self).__init__(access_token)
+
+
+def client_with_response(client, body):
+    response = Mock(status_code=200, content=json.dumps(body).encode(),
+                    wire_size=None)
+    response.json.return_value = body
+    client.transport = Mock()
+    client.transport.request.return_value = response
+    return client
+
+
+class TestRoute(unittest.TestCase):
+
+    def test_fields(self):
+        route = Route("GET", "/accounts/{account_id}/alerts", query=("limit",))
+
+        self.assertEqual(route.path_fields, ("account_id",))
+        self.assertEqual(route.fields, ("account_id", "limit"))
+
+    def test_build_url_skips_empty_values(self):
+        route = Route("GET", "/x", query=("a", "b", "c"))
+
+        self.assertEqual(route.build_url("", {"a": "1", "b": "", "c": "3"}),
+                         "/x?a=1&c=3")
+        self.assertEqual(route.build_url("", {"a": None}), "/x")
+
+    def test_encode(self):
+        self.assertEqual(encode("1849001"), "1849001")
+        self.assertEqual(encode(5), "5")
+        self.assertEqual(encode("a b/c&d=e+f"), "a%20b%2Fc%26d%3De%2Bf")
+        self.assertEqual(encode(["en", "fr"]), "en%2Cfr")
+        self.assertEqual(encode(u"caf\u00e9"), "caf%C3%A9")
+
+    def test_build_url(self):
+        route = Route("GET", "/alerts/{alert_id}/mentions",
+                      query=("q", "limit", "cursor"))
+        url = route.build_url("http://h/api", {"alert_id": "1", "q": "a b",
+                                               "limit": None, "cursor": "x="})
+
+        self.assertEqual(url, "http://h/api/alerts/1/mentions?q=a%20b&"
+                              "cursor=x%3D")
+
+
+class TestEngine(unittest.TestCase):
+
+    def test_new_endpoint(self):
+        client = client_with_response(FetchAlertTasksAPI("a", "acc", "12",
+                                                         limit="5"),
+                                      {"tasks": []})
+
+        self.assertEqual(client.query(), {"tasks": []})
+        client.transport.request.assert_called_once_with(
+            "GET", Mention.base_url + "/accounts/acc/alerts/12/tasks?limit=5",
+            "a", None, stream=False, timeout=Mention.timeout)
+
+    def test_body(self):
+        client = mention.CreateAnAlertAPI("a", "acc", "name",
+                                          {"type": "basic"}, ["en"],
+                                          noise_detection=False)
+
+        self.assertEqual(json.loads(client.data),
+                         {"name": "name", "query": {"type": "basic"},
+                          "languages": ["en"], "noise_detection": "0"})
+
+    def test_create_returns_json(self):
+        client = client_with_response(
+            mention.CreateAnAlertAPI("a", "acc", "name", {}, ["en"]),
+            {"alert": {"id": "1"}})
+
+        self.assertEqual(client.query(), {"alert": {"id": "1"}})
+        self.assertEqual(client.transport.request.call_args[0][0], "POST")
+
+    def test_mentions_params(self):
+        client = mention.FetchAllMentionsAPI("a", "acc", "12", since_id="9",
+                                             cursor="c", limit="5000",
+                                             favorite=True, folder="spam")
+
+        self.assertEqual(client.url.split("?")[1],
+                         "since_id=9&folder=spam&limit=1000")
+
+    def test_dates_are_encoded_once(self):
+        client = mention.FetchAllMentionsAPI(
+            "a", "acc", "12", not_before_date="2018-11-25 12:00")
+
+        self.assertIn("not_before_date=2018-11-25T12%3A00%3A00%2B00%3A00",
+                      client.url)
+
+    def test_children_url(self):
+        client = mention.FetchMentionChildrenAPI("a", "acc", "12", "7")
+
+        self.assertTrue(client.url.endswith("/mentions/7/children"))
+
+    def test_curate_tone(self):
+        client = mention.CurateAMentionAPI("a", "acc", "12", "7", read=True,
+                                           tone="neutral")
+
+        self.assertEqual(json.loads(client.data), {"read": "1", "tone": "0"})
+
+    def test_not_streamable(self):
+        self.assertRaises(TypeError, mention.AppDataAPI("a").query_stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+from mention import transport
+from mention.dedupe import SeenIds
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.scheduler import AdaptiveInterval, PollingScheduler, Target
+
+
+class _DelayingTransport(transport.Transport):
+    """Delays the requests of one account."""
+
+    def __init__(self, account_id, delay):
+        self.account_id = account_id
+        self.delay = delay
+        self.transport = transport.RequestsTransport()
+
+    def request(self, method, url, access_token, data=None, stream=False,
+                timeout=None):
+        if "/accounts/{0}/".format(self.account_id) in url:
+            time.sleep(self.delay)
+        return self.transport.request(method, url, access_token, data,
+                                      stream=stream, timeout=timeout)
+
+    def close(self):
+        self.transport.close()
+
+
+class TestPollingScheduler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = SyntheticData(seed=4, accounts=2, alerts_per_account=4,
+                                 mentions_per_alert=40)
+        cls.server = FakeMentionServer(cls.data).start()
+        cls.redirect = cls.server.redirect().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.redirect.stop()
+        cls.server.stop()
+
+    def targets(self, account_index, weights=(1, 1, 1, 1)):
+        account_id = self.data.account_ids[account_index]
+        return [Target("token{0}".format(account_index), account_id,
+                       alert_id, weight=weight)
+                for alert_id, weight in zip(self.data.alert_ids(account_id),
+                                            weights)]
+
+    def test_new_mentions_are_fetched_once(self):
+        received = defaultdict(list)
+        lock = threading.Lock()
+
+        def on_mentions(target, mentions):
+            with lock:
+                received[target.key].extend(m["id"] for m in mentions)
+
+        targets = self.targets(0)
+        scheduler = PollingScheduler(targets, rate=100, burst=10, interval=0,
+                                     limit="5", on_mentions=on_mentions)
+        scheduler.run(duration=0.3)
+
+        for target in targets:
+            ids = received[target.key]
+            self.assertGreater(target.polls, 1)
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(target.mentions, len(ids))
+
+    def test_failing_callback(self):
+        targets = self.targets(0)
+
+        def on_mentions(target, mentions):
+            if target is targets[0]:
+                raise ValueError(target.key)
+
+        scheduler = PollingScheduler(targets, rate=100, burst=10, interval=0,
+                                     limit="5", on_mentions=on_mentions)
+        scheduler.run(duration=0.3)
+
+        # The mentions are handed over again until the callback succeeds.
+        self.assertGreater(targets[0].errors, 1)
+        self.assertIsInstance(targets[0].last_error, ValueError)
+        self.assertEqual((targets[0].polls, targets[0].since_id), (0, None))
+        for target in targets[1:]:
+            self.assertGreater(target.polls, 1)
+            self.assertEqual(target.errors, 0)
+        self.assertEqual(scheduler._in_flight, 0)
+
+    def test_mentions_are_delivered_again_after_a_failed_callback(self):
+        targets = self.targets(0)
+        calls = []
+
+        def on_mentions(target, mentions):
+            if target is targets[0]:
+                calls.append([mention_["id"] for mention_ in mentions])
+                if len(calls) == 1:
+                    raise ValueError(target.key)
+
+        scheduler = PollingScheduler(targets, rate=100, burst=10, interval=0,
+                                     limit="5", on_mentions=on_mentions,
+                                     seen=SeenIds())
+        scheduler.run(duration=0.3)
+
+        self.assertGreaterEqual(len(calls), 2)
+        self.assertEqual(calls[1], calls[0])
+        self.assertEqual(targets[0].errors, 1)
+        self.assertEqual(targets[0].mentions, len(calls[0]))
+
+    def test_weights_share_the_budget(self):
+        targets = self.targets(0, weights=(3, 1, 1, 1))
+        scheduler = PollingScheduler(targets, rate=60, burst=1, interval=0)
+        scheduler.run(duration=1.0)
+
+        polls = [target.polls for target in targets]
+        self.assertGreater(polls[0], 2 * max(polls[1:]))
+        self.assertLess(polls[0], 4 * min(polls[1:]))
+        self.assertLess(sum(polls), 70)
+
+    def test_slow_account_does_not_starve_the_others(self):
+        slow = _DelayingTransport(self.data.account_ids[0], 0.5)
+        targets = self.targets(0) + self.targets(1)
+        scheduler = PollingScheduler(targets, rate=1000, burst=10,
+                                     interval=0, workers=4, per_token=2,
+                                     transport=slow)
+        scheduler.start()
+        time.sleep(0.4)
+        report = scheduler.report()
+        scheduler.stop()
+        slow.close()
+
+        for target in targets[4:]:
+            self.assertGreater(report[target.key]["polls"], 5)
+            self.assertLess(report[target.key]["lag"], 0.2)
+        for target in targets[:4]:
+            self.assertEqual(report[target.key]["polls"], 0)
+            self.assertGreater(report[target.key]["lag"], 0.3)
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = AdaptiveInterval(budget=1.0, min_interval=1.0,
+                                       max_interval=1000.0, half_life=60.0,
+                                       initial_interval=5.0)
+        self.hot = Target("t", "a", "hot")
+        self.cold = Target("t", "a", "cold")
+
+    def test_interval_is_inversely_proportional_to_the_root_of_the_rate(
+            self):
+        self.assertEqual(self.policy.update(self.hot, 50, None, False), 5.0)
+        self.policy.update(self.hot, 100, 10.0, False)
+        self.policy.update(self.cold, 1, 10.0, False)
+
+        self.assertAlmostEqual(self.hot.rate, 10.0)
+        self.assertAlmostEqual(self.cold.rate, 0.1)
+        hot = self.policy.interval(self.hot)
+        cold = self.policy.interval(self.cold)
+        self.assertAlmostEqual(cold / hot, 10.0)
+        # The intervals spend the whole budget.
+        self.assertAlmostEqual(1 / hot + 1 / cold, self.policy.budget)
+
+    def test_bounds(self):
+        self.policy.update(self.hot, 10000, 1.0, False)
+        self.policy.update(self.cold, 0, 1.0, False)
+
+        self.assertEqual(self.policy.interval(self.hot), 1.0)
+        self.assertEqual(self.policy.interval(self.cold), 1000.0)
+        self.assertEqual(self.policy.update(self.cold, 100, 1.0, True), 1.0)
+
+    def test_rate_follows_recent_polls(self):
+        for _ in range(10):
+            self.policy.update(self.hot, 60, 60.0, False)
+        self.assertAlmostEqual(self.hot.rate, 1.0)
+
+        self.policy.update(self.hot, 0, 60.0, False)
+        self.assertAlmostEqual(self.hot.rate, 0.5)
+        self.policy.update(self.hot, 0, 600.0, False)
+        self.assertLess(self.hot.rate, 0.001)
+
+    def test_busy_alert_is_polled_more_often(self):
+        data = SyntheticData(seed=6, alerts_per_account=2,
+                             mentions_per_alert=5)
+        account_id = data.account_ids[0]
+        hot, cold = data.alert_ids(account_id)
+        targets = [Target("t", account_id, hot), Target("t", account_id, cold)]
+        policy = AdaptiveInterval(budget=20, min_interval=0.01,
+                                  max_interval=0.5, initial_interval=0.05)
+        stop = threading.Event()
+
+        def publish():
+            while not stop.wait(0.005):
+                data.generate_mention(hot)
+
+        with FakeMentionServer(data) as server, server.redirect():
+            publisher = threading.Thread(target=publish)
+            publisher.start()
+            try:
+                PollingScheduler(targets, rate=100, burst=1, interval=policy,
+                                 limit="1000").run(duration=1.5)
+            finally:
+                stop.set()
+                publisher.join()
+
+        self.assertGreater(targets[0].rate, 50)
+        self.assertEqual(targets[1].rate, 0)
+        self.assertEqual(targets[1].interval, 0.5)
+        self.assertGreater(targets[0].polls, 3 * targets[1].polls)
+        self.assertLess(sum(t.polls for t in targets), 1.5 * 20 + 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention.fakeserver import FakeMentionServer, SyntheticData
+from mention.streaming import JSONArrayStream
+
+
+def chunked(document, size):
+    data = document.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestJSONArrayStream(unittest.TestCase):
+
+    document = json.dumps({
+        "mentions": [{"id": str(i), "title": u"café " * i,
+                      "score": i * 1.5e-3, "tags": None}
+                     for i in range(30)],
+        "_links": {"more": {"params": {"cursor": "abc"}}},
+        "total": -12.5e3,
+    })
+
+    def test_every_chunk_size(self):
+        expected = json.loads(self.document)
+        for size in (1, 2, 3, 7, 100, len(self.document)):
+            stream = JSONArrayStream(chunked(self.document, size),
+                                     "mentions")
+
+            self.assertEqual(list(stream), expected["mentions"])
+            self.assertEqual(stream.metadata["_links"], expected["_links"])
+            self.assertEqual(stream.metadata["total"], expected["total"])
+            self.assertTrue(stream.complete)
+
+    def test_error_response(self):
+        stream = JSONArrayStream([b'{"code": 404, "message": "Not Found"}'],
+                                 "mentions")
+
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.metadata["code"], 404)
+
+    def test_truncated(self):
+        stream = JSONArrayStream([b'{"mentions": [{"id": 1}, {"id"'],
+                                 "mentions")
+
+        self.assertEqual(next(stream), {"id": 1})
+        self.assertRaises(ValueError, next, stream)
+
+    def test_extra_data(self):
+        stream = JSONArrayStream([b'{"mentions": [1]} ', b'{}'], "mentions")
+
+        self.assertEqual(next(stream), 1)
+        self.assertRaises(ValueError, next, stream)
+
+
+class TestQueryStream(unittest.TestCase):
+
+    def test_matches_query(self):
+        data = SyntheticData(seed=4, mentions_per_alert=100)
+        with FakeMentionServer(data) as server, server.redirect():
+            account_id = data.account_ids[0]
+            client = mention.FetchAllMentionsAPI(
+                "a", account_id, data.alert_ids(account_id)[0], limit="50")
+            expected = client.query()
+            stream = client.query_stream()
+            mentions = list(stream)
+
+        self.assertEqual(mentions, expected["mentions"])
+        self.assertEqual(stream.metadata["_links"], expected["_links"])
+
+
+if __name__ == '__main__':
+    unittest.main()
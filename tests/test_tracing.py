@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import hedging, operations, tracing
+from mention.accountstream import AccountStream
+from mention.base import StreamMentionsAPI
+from mention.fakeserver import FakeMentionServer, SyntheticData
+
+
+class RecordingSpan(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.attributes = {}
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class RecordingTracer(object):
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        span = RecordingSpan(name)
+        self.spans.append(span)
+        yield span
+
+
+class TestNoopTracer(unittest.TestCase):
+
+    def setUp(self):
+        tracing.set_tracer(tracing._NoopTracer())
+
+    def tearDown(self):
+        tracing.set_tracer(None)
+
+    def test_span_is_noop(self):
+        with tracing.span("backfill", alert_id="c") as span:
+            span.set_attribute("mention.page", 1)
+
+
+class TestQuerySpan(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = RecordingTracer()
+        tracing.set_tracer(self.tracer)
+
+    def tearDown(self):
+        tracing.set_tracer(None)
+
+    def test_skips_empty_attributes(self):
+        with tracing.span("backfill", alert_id=None, page=2):
+            pass
+
+        self.assertEqual(self.tracer.spans[0].attributes,
+                         {"mention.page": 2})
+
+    def test_query_records_span(self):
+        response = Mock(status_code=200, content=b'{"mentions": []}',
+                        wire_size=None, attempts=None, circuit_probe=None)
+        response.json.return_value = {"mentions": []}
+        client = mention.FetchAllMentionsAPI("a", "b", "c")
+        client.transport = Mock()
+        client.transport.request.return_value = response
+
+        with tracing.span("backfill"):
+            client.query()
+
+        parent, child = self.tracer.spans
+        self.assertEqual(parent.name, "backfill")
+        self.assertEqual(child.name, "mention.FetchAllMentionsAPI")
+        self.assertEqual(child.attributes["mention.alert_id"], "c")
+        self.assertEqual(child.attributes["mention.status_code"], 200)
+        self.assertEqual(child.attributes["mention.response_size"], 16)
+
+
+class TestOperationSpans(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = RecordingTracer()
+        tracing.set_tracer(self.tracer)
+        self.addCleanup(tracing.set_tracer, None)
+        self.data = SyntheticData(seed=6, alerts_per_account=1,
+                                  mentions_per_alert=25)
+        self.server = FakeMentionServer(self.data).start()
+        self.addCleanup(self.server.stop)
+        self.account_id = self.data.account_ids[0]
+        self.alert_id = self.data.alert_ids(self.account_id)[0]
+
+    def spans(self, name):
+        return [span.attributes for span in self.tracer.spans
+                if span.name == name]
+
+    def test_pages_and_attempts(self):
+        client = mention.FetchAllMentionsAPI("a", self.account_id,
+                                             self.alert_id, limit="10")
+        client.base_url = self.server.base_url
+        client.transport = hedging.HedgingTransport()
+        self.addCleanup(client.transport.close)
+
+        operations.fetch_all_mentions(client)
+
+        pages = self.spans("mention.FetchAllMentionsAPI")
+        self.assertEqual([page["mention.page"] for page in pages], [0, 1, 2])
+        self.assertEqual([page["mention.attempts"] for page in pages],
+                         [1, 1, 1])
+
+    def test_reconnection_attempts(self):
+        self.server.throttle_rate = 1.0
+        stream = AccountStream("a", self.account_id, [self.alert_id],
+                               backoff=0.001, max_backoff=0.001)
+        self.addCleanup(self.server.redirect(StreamMentionsAPI).start().stop)
+        thread = threading.Thread(target=list, args=(stream,))
+        thread.start()
+        while stream.connections < 3:
+            time.sleep(0.01)
+        stream.stop()
+        thread.join()
+
+        attempts = [span["mention.attempt"] for span
+                    in self.spans("mention.StreamMentionsAPI")]
+        self.assertEqual(attempts[:3], [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "mention"))
+
+import mention
+from mention import transport
+from mention.exceptions import (RequestTimeoutException,
+                                UnrecordedRequestException)
+from mention.fakeserver import FakeMentionServer, Redirect, SyntheticData
+
+
+class TestRecordReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cassette = os.path.join(self.directory, "test.cassette")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _record(self, limit="5", stream=False):
+        with FakeMentionServer(
+                SyntheticData(seed=2, mentions_per_alert=300)) as server:
+            # The replayed calls keep the url of the recording.
+            self.addCleanup(server.redirect().start().stop)
+            account_id = server.data.account_ids[0]
+            alert_id = server.data.alert_ids(account_id)[0]
+            with transport.RecordingTransport(self.cassette) as recorder:
+                client = mention.FetchAllMentionsAPI("a", account_id,
+                                                     alert_id, limit=limit)
+                client.transport = recorder
+                if not stream:
+                    return client, client.query()
+                return client, list(client.query_stream())
+
+    def test_replay(self):
+        client, recorded = self._record()
+        client.transport = transport.ReplayTransport(self.cassette)
+
+        with Redirect("http://127.0.0.1:1/api"):
+            self.assertEqual(client.query(), recorded)
+            self.assertEqual(client.query(), recorded)
+
+    def test_replay_async(self):
+        client, recorded = self._record()
+        client.transport = transport.ReplayTransport(self.cassette)
+
+        self.assertEqual(asyncio.run(client.aquery()), recorded)
+
+    def test_replay_stream(self):
+        client, recorded = self._record(limit="300", stream=True)
+        with gzip.open(self.cassette, "rt") as cassette:
+            record = json.loads(cassette.readline())
+        sizes = [size for _, size in record["chunks"]]
+        client.transport = transport.ReplayTransport(self.cassette)
+
+        self.assertGreater(len(sizes), 1)
+        self.assertNotIn("Content-Length", record["headers"])
+        self.assertEqual(list(client.query_stream()), recorded)
+        response = client.transport.request("GET", client.url, "a",
+                                            stream=True)
+        self.assertEqual([len(chunk) for chunk
+                          in response.iter_content(65536)], sizes)
+        self.assertEqual(client.query()["mentions"], recorded)
+
+    def test_unrecorded_request(self):
+        client, _ = self._record()
+        client.transport = transport.ReplayTransport(self.cassette,
+                                                     loop=False)
+        client.query()
+
+        self.assertRaises(UnrecordedRequestException, client.query)
+        client.limit = "6"
+        self.assertRaises(UnrecordedRequestException, client.query)
+
+
+class TestReplayTiming(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cassette = os.path.join(directory, "test.cassette")
+        with gzip.open(self.cassette, "wt") as cassette:
+            cassette.write(json.dumps({
+                "method": "GET", "url": "http://h/api/app/data",
+                "data": None, "status": 200, "headers": {}, "body": "abcdef",
+                "elapsed": 0.05, "chunks": [[0.1, 2], [0.3, 4]]}))
+        self.transport = transport.ReplayTransport(self.cassette,
+                                                   realtime=True)
+
+    def test_chunks_arrive_at_their_recorded_time(self):
+        started = time.perf_counter()
+        response = self.transport.request("GET", "http://other/api/app/data",
+                                          "a", stream=True)
+        arrivals = [time.perf_counter() - started]
+        chunks = []
+        for chunk in response.iter_content(1024):
+            chunks.append(chunk)
+            arrivals.append(time.perf_counter() - started)
+
+        self.assertEqual(chunks, [b"ab", b"cdef"])
+        for arrival, expected in zip(arrivals, (0.05, 0.1, 0.3)):
+            self.assertGreaterEqual(arrival, expected)
+            self.assertLess(arrival, expected + 0.05)
+
+    def test_read_timeout_between_chunks(self):
+        response = self.transport.request("GET", "http://h/api/app/data",
+                                          "a", stream=True,
+                                          timeout=(1.0, 0.15))
+        chunks = response.iter_content(1024)
+
+        self.assertEqual(next(chunks), b"ab")
+        self.assertRaises(RequestTimeoutException, next, chunks)
+
+    def test_buffered_response_waits_for_the_whole_body(self):
+        started = time.perf_counter()
+        response = self.transport.request("GET", "http://h/api/app/data",
+                                          "a")
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.3)
+        self.assertEqual(response.content, b"abcdef")
+
+
+if __name__ == '__main__':
+    unittest.main()